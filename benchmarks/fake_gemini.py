@@ -0,0 +1,213 @@
+"""Local stand-in for ``google.generativeai.GenerativeModel``.
+
+Answers ``generate_content`` like Gemini would, without network or quota:
+every field the prompt asks for (or the response schema, in structured
+mode) is filled in, multi-image requests get one block per filename, and
+``usage_metadata`` carries token counts billed the way Gemini bills
+images. Latency follows a configurable distribution, and a share of the
+calls can fail with a 429 or return malformed output.
+
+    from fake_gemini import FakeBackend
+    backend = FakeBackend(latency='lognormal:0.8,0.3', throttle_rate=0.02)
+    backend.install()   # engines built from now on talk to the fake
+"""
+import importlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from google.api_core.exceptions import ResourceExhausted
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from rate_limiter import image_tokens  # noqa: E402
+
+# "Title: [...]" lines of the text prompts name the fields to answer
+PROMPT_FIELD = re.compile(r'^([A-Z][A-Za-z ]*): \[')
+FILENAME_LINE = re.compile(r'^Filename: (.+)$')
+
+ENGINE_MODULES = ('image_engine', 'video_engine')
+
+
+class FakeQuotaError(ResourceExhausted):
+    """What the SDK raises when the quota is exhausted"""
+
+    def __init__(self):
+        super().__init__("Resource has been exhausted (e.g. check quota).")
+
+
+def parse_latency(spec):
+    """``fixed:S``, ``uniform:LOW,HIGH`` or ``lognormal:MEDIAN,SIGMA`` in seconds"""
+    kind, _, values = spec.partition(':')
+    numbers = [float(value) for value in values.split(',') if value]
+    if kind == 'fixed' and len(numbers) == 1:
+        return lambda rng: numbers[0]
+    if kind == 'uniform' and len(numbers) == 2:
+        return lambda rng: rng.uniform(*numbers)
+    if kind == 'lognormal' and len(numbers) == 2:
+        median, sigma = numbers
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, response_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+    def resolve(self):
+        pass
+
+
+class FakeBackend:
+    """Shared state of every fake model: call counts, randomness, failures.
+
+    ``latency`` is a distribution spec (see ``parse_latency``) for one call,
+    plus ``per_image`` seconds for every image in the request. Calls fail
+    with a 429 with probability ``throttle_rate`` and return output that
+    does not parse with probability ``malformed_rate``.
+    """
+
+    def __init__(self, latency='lognormal:0.8,0.3', per_image=0.05, throttle_rate=0.0,
+                 malformed_rate=0.0, seed=0):
+        self.latency = parse_latency(latency)
+        self.per_image = per_image
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.images = 0
+        self.throttled = 0
+        self.malformed = 0
+        self.tokens = 0
+
+    def install(self):
+        """Make the engine modules build fake models instead of real ones"""
+        backend = self
+
+        class Model(FakeGenerativeModel):
+            def __init__(self, model_name='gemini-1.5-flash', **kwargs):
+                super().__init__(backend, model_name)
+
+        for name in ENGINE_MODULES:
+            importlib.import_module(name).GenerativeModel = Model
+
+    def draw(self, image_count):
+        """Latency, whether to throttle and whether to garble one call"""
+        with self.lock:
+            self.calls += 1
+            self.images += image_count
+            latency = self.latency(self.random) + self.per_image * image_count
+            throttle = self.random.random() < self.throttle_rate
+            malformed = not throttle and self.random.random() < self.malformed_rate
+            if throttle:
+                self.throttled += 1
+                # A quota error comes back quickly
+                latency *= 0.1
+            if malformed:
+                self.malformed += 1
+            return latency, throttle, malformed, self.random.random()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'images': self.images,
+            'throttled': self.throttled,
+            'malformed': self.malformed,
+            'tokens': self.tokens,
+        }
+
+
+class FakeGenerativeModel:
+    """Answers ``generate_content`` from the prompt, through a FakeBackend"""
+
+    def __init__(self, backend, model_name='gemini-1.5-flash'):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None):
+        texts = [part for part in contents if isinstance(part, str)]
+        images = [part for part in contents if isinstance(part, dict)]
+        latency, throttle, malformed, pick = self.backend.draw(len(images))
+        time.sleep(latency)
+        if throttle:
+            raise FakeQuotaError()
+
+        filenames = [match.group(1) for match in map(FILENAME_LINE.match, texts[1:]) if match]
+        schema = (generation_config or {}).get('response_schema')
+        if malformed:
+            text = self.malformed_answer(schema, pick)
+        elif schema:
+            text = self.json_answer(schema, filenames)
+        else:
+            text = self.text_answer(texts[0], filenames)
+
+        prompt_tokens = sum(len(part) for part in texts) // 4
+        for part in images:
+            prompt_tokens += image_tokens(Image.open(io.BytesIO(part['data'])).size)
+        usage = FakeUsage(prompt_tokens, len(text) // 4)
+        with self.backend.lock:
+            self.backend.tokens += usage.total_token_count
+        return FakeResponse(text, usage)
+
+    @staticmethod
+    def field_value(name, index):
+        if name == 'Title':
+            return f"Synthetic test image {index} with soft gradient colors and fine texture"
+        if name == 'Keywords':
+            return ', '.join(f'keyword{k}' for k in range(40))
+        if name == 'Category':
+            return '8'
+        if name == 'Releases':
+            return ''
+        return f"Generated {name.lower()} for file {index}"
+
+    def text_answer(self, prompt, filenames):
+        fields = [match.group(1) for match in map(PROMPT_FIELD.match, prompt.split('\n'))
+                  if match and match.group(1) != 'Filename']
+        blocks = []
+        for index, filename in enumerate(filenames or [None]):
+            lines = [f"Filename: {filename}"] if filename else []
+            lines += [f"{name}: {self.field_value(name, index)}" for name in fields]
+            blocks.append('\n'.join(lines))
+        return '\n\n'.join(blocks)
+
+    def json_answer(self, schema, filenames):
+        def answer(properties, filename, index):
+            row = {}
+            for name, field_schema in properties.items():
+                if name == 'Filename':
+                    row[name] = filename
+                elif field_schema['type'] == 'array':
+                    row[name] = self.field_value(name, index).split(', ')
+                elif field_schema['type'] == 'integer':
+                    row[name] = int(self.field_value(name, index))
+                else:
+                    row[name] = self.field_value(name, index)
+            return row
+
+        if schema['type'] == 'array':
+            properties = schema['items']['properties']
+            return json.dumps([answer(properties, filename, index) for index, filename in enumerate(filenames)])
+        return json.dumps(answer(schema['properties'], None, 0))
+
+    @staticmethod
+    def malformed_answer(schema, pick):
+        if schema:
+            # Cut off mid-object, or valid JSON without the fields
+            return '{"Title": "Synthetic' if pick < 0.5 else '{"answer": "no"}'
+        return "I'm sorry, I can't describe this image." if pick < 0.5 else "Title:\nKeywords:"
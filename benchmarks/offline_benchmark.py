@@ -0,0 +1,286 @@
+"""Measure analysis throughput offline, against a fake Gemini backend.
+
+Runs the image, Freepik, combined and video batch pipelines over a
+synthetic corpus with fake_gemini answering every request, so no API key
+or quota is needed. Each pipeline runs in a fresh interpreter and
+reports files/sec, p95 request latency, API calls per file, retries and
+429s, and the peak resident memory of the main process and of the
+preprocessing workers.
+
+    python benchmarks/offline_benchmark.py [--pipelines images freepik videos]
+        [--images N] [--videos N] [--latency lognormal:0.8,0.3]
+        [--throttle-rate 0.02] [--malformed-rate 0.02] [--no-backoff]
+        [--set max_concurrent_requests=8 --set multi_image_requests=true ...]
+        [--json results.json]
+
+Every --set is passed to the engines as a setting, so any performance
+option can be compared against the same corpus and backend. Without
+--input a corpus is generated in a temporary folder; every fifth image
+is a rescaled copy of the one before it, for the near-duplicate mode.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows, peak memory is then not reported
+    resource = None
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from vector_images import IMAGE_EXTENSIONS  # noqa: E402
+
+PIPELINES = ('images', 'freepik', 'combined', 'videos')
+
+# Generous quota, so the rate limiter only matters when --set lowers it
+DEFAULT_SETTINGS = {
+    'requests_per_minute': 100000,
+    'tokens_per_minute': 1000000000,
+    'max_concurrent_requests': 8,
+    'cache_enabled': False,
+}
+
+
+def make_images(folder, count, size):
+    rng = np.random.default_rng(0)
+    width, height = size
+    y, x = np.mgrid[0:height:8, 0:width:8]
+    previous = None
+    for i in range(count):
+        if previous is not None and i % 5 == 4:
+            # A near-duplicate: the previous image, rescaled and recompressed
+            image = previous.resize((width * 9 // 10, height * 9 // 10), Image.BILINEAR)
+        else:
+            # Smooth gradients plus noise, so JPEG sizes look like real photos
+            base = np.stack([(x + i * 50) % 256, (y + i * 30) % 256, (x + y + i * 70) % 256], axis=-1)
+            small = Image.fromarray(base.astype(np.uint8)).resize((width, height), Image.BILINEAR)
+            pixels = np.asarray(small).astype(np.int16) + rng.integers(-12, 12, (height, width, 3))
+            image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        extension = 'png' if i % 8 == 7 else 'jpg'
+        image.save(os.path.join(folder, f'synthetic_{i:04d}.{extension}'), quality=92)
+        previous = image
+
+
+def make_videos(folder, count, size=(1280, 720), seconds=6, fps=30):
+    import cv2
+
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    for i in range(count):
+        writer = cv2.VideoWriter(
+            os.path.join(folder, f'synthetic_{i:03d}.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), fps, size
+        )
+        for index in range(seconds * fps):
+            # A new scene every two seconds
+            scene = index // (fps * 2)
+            base = np.stack([(x + scene * 80 + i * 20) % 256, (y + scene * 40) % 256,
+                             (x + y) // 8 % 256], axis=-1).astype(np.uint8)
+            writer.write(np.roll(base, index * 3, axis=1))
+        writer.release()
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its largest child, in MB"""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return own, children
+
+
+def build_engine(pipeline, config):
+    settings = dict(DEFAULT_SETTINGS, **config['settings'])
+    output = config['output']
+    if pipeline == 'images':
+        from image_engine import ImageAnalysisEngine
+        return ImageAnalysisEngine(config['images'], output, 'offline', settings)
+    if pipeline == 'freepik':
+        from freepik_engine import FreepikAnalysisEngine
+        return FreepikAnalysisEngine(config['images'], output, 'Midjourney 6', 'offline', settings)
+    if pipeline == 'combined':
+        from combined_engine import CombinedAnalysisEngine
+        return CombinedAnalysisEngine(config['images'], output, 'Midjourney 6', 'offline', settings)
+    from video_engine import VideoBatchEngine
+    videos = sorted(os.path.join(config['videos'], name) for name in os.listdir(config['videos']))
+    return VideoBatchEngine(videos, output, 'offline', settings)
+
+
+def run_child(config):
+    """One pipeline run, in this process; prints a RESULT line"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    from fake_gemini import FakeBackend
+
+    backend = FakeBackend(
+        latency=config['latency'], per_image=config['per_image'],
+        throttle_rate=config['throttle_rate'], malformed_rate=config['malformed_rate']
+    )
+    backend.install()
+    pipeline = config['pipeline']
+    engine = build_engine(pipeline, config)
+    if config['no_backoff']:
+        # Retries still happen and are counted, without the real waits
+        if pipeline == 'videos':
+            from video_engine import VideoAnalysisEngine
+            VideoAnalysisEngine.request_analysis.retry.sleep = lambda seconds: None
+        else:
+            type(engine).request_analysis.retry.sleep = lambda seconds: None
+
+    errors = []
+    engine.error_occurred.connect(errors.append)
+    start = time.perf_counter()
+    rows = sum(1 for _ in engine.iter_results())
+    elapsed = time.perf_counter() - start
+
+    metrics_name = {
+        'images': 'analysis_results', 'freepik': 'Freepik_Image_analysis',
+        'combined': 'combined_analysis', 'videos': 'batch_video_analysis',
+    }[pipeline]
+    metrics_path = os.path.join(config['output'], f'{metrics_name}_metrics.json')
+    report = {}
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            report = json.load(f)
+    own_rss, worker_rss = peak_rss_mb()
+    print('RESULT ' + json.dumps({
+        'pipeline': pipeline,
+        'files': config['files'],
+        'rows': rows,
+        'seconds': elapsed,
+        'backend': backend.stats(),
+        'errors': len(errors),
+        'peak_rss_mb': own_rss,
+        'peak_worker_rss_mb': worker_rss,
+        'metrics': report,
+    }), flush=True)
+
+
+def run_pipeline(config):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    for line in process.stdout.splitlines():
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    raise RuntimeError(f"{config['pipeline']} run failed:\n{process.stderr[-2000:]}")
+
+
+def summarize(result):
+    stages = result['metrics'].get('stages', {})
+    counters = result['metrics'].get('counters', {})
+    files = result['files'] or 1
+    return {
+        'pipeline': result['pipeline'],
+        'files': result['files'],
+        'files_per_sec': result['rows'] / result['seconds'] if result['seconds'] else 0.0,
+        'p95_api_seconds': stages.get('api', {}).get('p95_seconds', 0.0),
+        'calls_per_file': result['backend']['calls'] / files,
+        'retries': counters.get('retries', 0),
+        'throttled': counters.get('throttled_429', 0),
+        'failed': result['files'] - result['rows'],
+        'peak_rss_mb': result['peak_rss_mb'],
+        'peak_worker_rss_mb': result['peak_worker_rss_mb'],
+    }
+
+
+def print_table(summaries):
+    print(f"{'pipeline':<10} {'files':>6} {'files/s':>8} {'p95 api':>8} {'calls/file':>10} "
+          f"{'retries':>7} {'429s':>5} {'failed':>6} {'peak RSS':>9} {'workers':>8}")
+    for s in summaries:
+        rss = f"{s['peak_rss_mb']:.0f} MB" if s['peak_rss_mb'] is not None else 'n/a'
+        workers = f"{s['peak_worker_rss_mb']:.0f} MB" if s['peak_worker_rss_mb'] is not None else 'n/a'
+        print(f"{s['pipeline']:<10} {s['files']:>6} {s['files_per_sec']:>8.2f} "
+              f"{s['p95_api_seconds']:>7.2f}s {s['calls_per_file']:>10.2f} {s['retries']:>7} "
+              f"{s['throttled']:>5} {s['failed']:>6} {rss:>9} {workers:>8}")
+
+
+def parse_setting(value):
+    key, _, raw = value.partition('=')
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=['images', 'freepik', 'videos'])
+    parser.add_argument('--input', help='folder of images to use instead of a synthetic corpus')
+    parser.add_argument('--images', type=int, default=40, help='synthetic images to generate')
+    parser.add_argument('--image-size', default='3000x2000', help='synthetic image size, WIDTHxHEIGHT')
+    parser.add_argument('--videos', type=int, default=6, help='synthetic videos to generate')
+    parser.add_argument('--latency', default='lognormal:0.8,0.3',
+                        help='fake call latency: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--per-image', type=float, default=0.05, help='extra fake latency per image')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of calls failing with a 429')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='share of calls answered badly')
+    parser.add_argument('--no-backoff', action='store_true', help='retry without the real backoff waits')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='engine setting, the value parsed as JSON if possible; repeatable')
+    parser.add_argument('--json', help='also write the results, with full stage metrics, to this file')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    settings = dict(parse_setting(value) for value in args.set)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        images = args.input
+        image_count = 0
+        if any(pipeline != 'videos' for pipeline in args.pipelines):
+            if not images:
+                images = os.path.join(workdir, 'images')
+                os.makedirs(images)
+                size = tuple(int(value) for value in args.image_size.split('x'))
+                print(f"Generating {args.images} images of {size[0]}x{size[1]}...")
+                make_images(images, args.images, size)
+            image_count = sum(1 for name in os.listdir(images) if name.lower().endswith(IMAGE_EXTENSIONS))
+        videos = os.path.join(workdir, 'videos')
+        if 'videos' in args.pipelines:
+            os.makedirs(videos)
+            print(f"Generating {args.videos} videos...")
+            make_videos(videos, args.videos)
+
+        for pipeline in args.pipelines:
+            output = os.path.join(workdir, f'output_{pipeline}')
+            print(f"Running {pipeline}...")
+            results.append(run_pipeline({
+                'pipeline': pipeline,
+                'images': images,
+                'videos': videos,
+                'files': args.videos if pipeline == 'videos' else image_count,
+                'output': output,
+                'settings': settings,
+                'latency': args.latency,
+                'per_image': args.per_image,
+                'throttle_rate': args.throttle_rate,
+                'malformed_rate': args.malformed_rate,
+                'no_backoff': args.no_backoff,
+            }))
+
+    summaries = [summarize(result) for result in results]
+    print()
+    print_table(summaries)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': settings, 'results': results, 'summary': summaries}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
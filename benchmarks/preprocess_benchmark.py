@@ -0,0 +1,113 @@
+"""Compare the standard and fast image preprocessing paths.
+
+Reports images/sec for every mode and how far its output is from the
+standard LANCZOS path (mean absolute difference and PSNR, in 8-bit units).
+
+    python benchmarks/preprocess_benchmark.py [--input FOLDER] [--count N]
+
+Without --input a synthetic corpus of large JPEG and PNG files is generated
+in a temporary folder.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from image_preprocessing import preprocess_image, shrink_array, MAX_IMAGE_SIZE  # noqa: E402
+
+MODES = [
+    ('standard', {}),
+    ('fast-pillow', {'fast': True, 'backend': 'pillow'}),
+    ('fast-opencv', {'fast': True, 'backend': 'opencv'}),
+]
+
+
+def make_corpus(folder, count):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        width, height = (6000, 4000) if i % 2 == 0 else (4000, 6000)
+        # Smooth gradients plus noise, so JPEG sizes look like real photos
+        y, x = np.mgrid[0:height:8, 0:width:8]
+        base = np.stack([(x + i * 50) % 256, (y + i * 30) % 256, (x + y) % 256], axis=-1)
+        small = Image.fromarray(base.astype(np.uint8)).resize((width, height), Image.BILINEAR)
+        pixels = np.asarray(small).astype(np.int16) + rng.integers(-12, 12, (height, width, 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        extension = 'png' if i % 4 == 3 else 'jpg'
+        image.save(os.path.join(folder, f'synthetic_{i:03d}.{extension}'), quality=92)
+
+
+def compare(reference, image):
+    a = np.asarray(reference, dtype=np.float64)
+    b = np.asarray(image.resize(reference.size), dtype=np.float64)
+    mse = np.mean((a - b) ** 2)
+    psnr = float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+    return np.mean(np.abs(a - b)), psnr
+
+
+def bench_images(paths, repeat):
+    references = [preprocess_image(path) for path in paths]
+    for name, options in MODES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [preprocess_image(path, **options) for path in paths]
+        elapsed = time.perf_counter() - start
+        diffs = [compare(ref, out) for ref, out in zip(references, outputs)]
+        mean_abs = sum(d[0] for d in diffs) / len(diffs)
+        min_psnr = min(d[1] for d in diffs)
+        print(f"{name:<14} {len(paths) * repeat / elapsed:8.2f} images/sec   "
+              f"mean abs diff {mean_abs:5.2f}   worst PSNR {min_psnr:6.2f} dB")
+
+
+def bench_frames(repeat):
+    # A 4K video frame as cv2 returns it (BGR ndarray)
+    rng = np.random.default_rng(1)
+    y, x = np.mgrid[0:2160, 0:3840]
+    frame = np.stack([x % 256, y % 256, (x + y) // 24 % 256], axis=-1)
+    frame = np.clip(frame + rng.integers(-12, 12, frame.shape), 0, 255).astype(np.uint8)
+
+    def standard():
+        ratio = MAX_IMAGE_SIZE / max(frame.shape[:2])
+        new_size = (int(frame.shape[1] * ratio), int(frame.shape[0] * ratio))
+        return Image.fromarray(frame[:, :, ::-1]).resize(new_size, Image.LANCZOS)
+
+    def fast():
+        return Image.fromarray(shrink_array(frame, MAX_IMAGE_SIZE)[:, :, ::-1])
+
+    reference = standard()
+    for name, func in [('frame-standard', standard), ('frame-fast', fast)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            output = func()
+        elapsed = time.perf_counter() - start
+        mean_abs, psnr = compare(reference, output)
+        print(f"{name:<14} {repeat / elapsed:8.2f} frames/sec   "
+              f"mean abs diff {mean_abs:5.2f}   PSNR {psnr:6.2f} dB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', help='folder of images to benchmark')
+    parser.add_argument('--count', type=int, default=8, help='synthetic images to generate')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        folder = args.input
+        if not folder:
+            folder = temp_folder
+            make_corpus(folder, args.count)
+        paths = sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                       if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')))
+        bench_images(paths, args.repeat)
+    bench_frames(args.repeat * 5)
+
+
+if __name__ == '__main__':
+    main()
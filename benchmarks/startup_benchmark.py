@@ -0,0 +1,126 @@
+"""Measure GUI cold start: time until the main window is shown.
+
+Each run starts a fresh interpreter with ``-X importtime`` that does what
+main.py does (import, create the QApplication, build and show the
+MainWindow) and reports how long that took from process start. Prints
+the median over all runs and the slowest imports, then checks that
+neither the budget is exceeded nor any heavy module (Gemini client,
+OpenCV, numpy, ...) was imported before the window appeared. The exit
+status is 1 when a check fails, so it can guard against regressions.
+
+    python benchmarks/startup_benchmark.py [--runs N] [--budget SECONDS] [--top N]
+
+Runs offscreen unless QT_QPA_PLATFORM is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Only needed once an analysis starts
+HEAVY_MODULES = (
+    'google.generativeai', 'cv2', 'numpy', 'pandas', 'PIL.Image', 'tenacity',
+    'image_engine', 'freepik_engine', 'video_engine',
+)
+
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+import main
+from PyQt6.QtWidgets import QApplication, QStyleFactory
+app = QApplication(sys.argv)
+app.setStyle(QStyleFactory.create('Fusion'))
+main.load_stylesheet(app)
+imported = time.perf_counter()
+window = main.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print('STARTUP ' + json.dumps({{
+    'imports': imported - start,
+    'window': shown - imported,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}), flush=True)
+"""
+
+
+def run_once(workdir):
+    """One cold start: wall time to window shown, child timings and import log"""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    code = CHILD.format(src=os.path.abspath(SRC), heavy=HEAVY_MODULES)
+    # The import log goes to a file, a full stderr pipe would block the child
+    with tempfile.TemporaryFile('w+') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=log, text=True
+        )
+        report = None
+        for line in process.stdout:
+            if line.startswith('STARTUP '):
+                wall = time.perf_counter() - start
+                report = json.loads(line[len('STARTUP '):])
+                report['wall'] = wall
+        process.wait()
+        log.seek(0)
+        stderr = log.read()
+    if report is None:
+        raise RuntimeError(f"Window was not shown:\n{stderr[-2000:]}")
+    return report, stderr
+
+
+def slowest_imports(importtime_log, top):
+    """Modules by cumulative import microseconds, from -X importtime output"""
+    imports = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help='maximum median seconds to window shown')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports listed')
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # The window writes settings.json into the working folder
+        for run in range(args.runs):
+            report, importtime_log = run_once(workdir)
+            reports.append(report)
+            print(f"run {run + 1}: window shown after {report['wall']:.3f} s "
+                  f"(imports {report['imports']:.3f} s, window {report['window']:.3f} s)")
+
+    wall = statistics.median(report['wall'] for report in reports)
+    print(f"\nmedian time to window shown: {wall:.3f} s (budget {args.budget:.3f} s)")
+    print("slowest imports (last run):")
+    for cumulative, name in slowest_imports(importtime_log, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if wall > args.budget:
+        print(f"FAIL: startup is over budget by {wall - args.budget:.3f} s")
+        failed = True
+    heavy = sorted(set(name for report in reports for name in report['heavy']))
+    if heavy:
+        print(f"FAIL: imported before the window was shown: {', '.join(heavy)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
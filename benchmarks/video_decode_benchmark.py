@@ -0,0 +1,139 @@
+"""Compare per-call VideoCapture seeking with the shared VideoDecoder.
+
+For every sample clip, frames at several positions are read once by
+opening a new capture per frame and seeking with CAP_PROP_POS_FRAMES (the
+old extract_frame path), and once through a single VideoDecoder. Reports
+seconds per clip and how many returned frames are the exact frame asked
+for; every synthetic frame carries its own index as a binary stripe.
+
+    python benchmarks/video_decode_benchmark.py [--input FOLDER] [--positions N]
+
+Without --input a 4K clip and a long-GOP 1080p clip are generated in a
+temporary folder.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from video_decoder import VideoDecoder  # noqa: E402
+from frame_sampling import sample_scene_frames  # noqa: E402
+
+INDEX_BITS = 16
+
+SAMPLES = [
+    # name, size, seconds, fps, keyframe interval (None = encoder default)
+    ('4k', (3840, 2160), 4, 30, None),
+    ('long-gop', (1920, 1080), 40, 30, 300),
+]
+
+
+def stamp_index(frame, index):
+    # A row of black/white blocks survives lossy compression
+    width = frame.shape[1] // INDEX_BITS
+    for bit in range(INDEX_BITS):
+        value = 255 if index >> bit & 1 else 0
+        frame[:width, bit * width:(bit + 1) * width] = value
+    return frame
+
+
+def read_index(frame):
+    width = frame.shape[1] // INDEX_BITS
+    index = 0
+    for bit in range(INDEX_BITS):
+        block = frame[width // 4:width * 3 // 4, bit * width + width // 4:bit * width + width * 3 // 4]
+        if block.mean() > 127:
+            index |= 1 << bit
+    return index
+
+
+def make_clip(path, size, seconds, fps, keyframe_interval):
+    params = []
+    if keyframe_interval and hasattr(cv2, 'VIDEOWRITER_PROP_KEY_INTERVAL'):
+        params = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, keyframe_interval]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size, params)
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    base = np.stack([x % 256, y % 256, (x + y) // 16 % 256], axis=-1).astype(np.uint8)
+    for index in range(seconds * fps):
+        frame = np.roll(base, index * 4, axis=1)
+        writer.write(stamp_index(frame, index))
+    writer.release()
+
+
+def read_reopening(path, positions):
+    frames = []
+    for position in positions:
+        cap = cv2.VideoCapture(path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * position))
+        _, frame = cap.read()
+        cap.release()
+        frames.append(frame)
+    return frames
+
+
+def read_decoder(path, positions):
+    with VideoDecoder(path) as decoder:
+        return decoder.read_positions(positions)
+
+
+def expected_indices(path, positions):
+    with VideoDecoder(path) as decoder:
+        return [decoder.frame_at(position) for position in positions], decoder.info
+
+
+def bench_clip(path, positions, stamped, repeat):
+    expected, info = expected_indices(path, positions)
+    print(f"{os.path.basename(path)}: {info['width']}x{info['height']} {info['codec']} "
+          f"{info['frame_count']} frames @ {info['fps']:.0f} fps")
+    for name, func in [('reopen+seek', read_reopening), ('decoder', read_decoder)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            frames = func(path, positions)
+        elapsed = (time.perf_counter() - start) / repeat
+        line = f"  {name:<12} {elapsed:7.3f} s/clip"
+        if stamped:
+            exact = sum(frame is not None and read_index(frame) == index
+                        for frame, index in zip(frames, expected))
+            line += f"   exact frames {exact}/{len(positions)}"
+        print(line)
+
+    with VideoDecoder(path) as decoder:
+        decoder.read_positions(positions)
+        print(f"  estimated keyframe interval {decoder.keyframe_interval} frames")
+
+    start = time.perf_counter()
+    sample_scene_frames(path, count=4)
+    print(f"  scene sampling {time.perf_counter() - start:7.3f} s/clip")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', help='folder of videos to benchmark')
+    parser.add_argument('--positions', type=int, default=5, help='frames read per clip')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    positions = [(i + 0.5) / args.positions for i in range(args.positions)]
+    with tempfile.TemporaryDirectory() as temp_folder:
+        if args.input:
+            paths = sorted(os.path.join(args.input, f) for f in os.listdir(args.input)
+                           if f.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')))
+        else:
+            paths = []
+            for name, size, seconds, fps, keyframe_interval in SAMPLES:
+                path = os.path.join(temp_folder, f'{name}.mp4')
+                make_clip(path, size, seconds, fps, keyframe_interval)
+                paths.append(path)
+        for path in paths:
+            bench_clip(path, positions, stamped=not args.input, repeat=args.repeat)
+
+
+if __name__ == '__main__':
+    main()
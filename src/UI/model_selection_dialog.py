@@ -2,7 +2,6 @@ from PyQt6.QtWidgets import (QVBoxLayout,
                             QPushButton, QLabel, QMessageBox, QDialog,
                             QDialogButtonBox, QListWidget,
                             QGroupBox, QApplication)
-import google.generativeai as genai
 
 
 class ModelSelectionDialog(QDialog):
@@ -62,6 +61,9 @@ class ModelSelectionDialog(QDialog):
                 QMessageBox.warning(self, "Warning", "Please set API key first.")
                 return
 
+            # The Gemini client is slow to import, so only on refresh
+            import google.generativeai as genai
+
             genai.configure(api_key=self.parent.api_key)
             self.available_models = []
             
@@ -5,12 +5,13 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QGroupBox, QApplication, QComboBox)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QAction
-from freepik_image_analzyer import FreepikImageAnalyzer
+from model_sources import FREEPIK_MODEL_SOURCES
 
 class FreepikImageAnalysisTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        self.seed_csv = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -39,18 +40,44 @@ class FreepikImageAnalysisTab(QWidget):
         output_layout.addWidget(self.output_path)
         output_layout.addWidget(output_button)
         layout.addLayout(output_layout)
+
+        # Previous results to seed the response cache with
+        seed_layout = QHBoxLayout()
+        seed_label = QLabel("Previous Results:")
+        self.seed_path = QLabel("Not selected")
+        seed_button = QPushButton("Import CSV")
+        seed_button.setObjectName("browseButton")
+        seed_button.clicked.connect(self.select_seed_csv)
+        seed_layout.addWidget(seed_label)
+        seed_layout.addWidget(self.seed_path)
+        seed_layout.addWidget(seed_button)
+        layout.addLayout(seed_layout)
         
         # Model source selection
-        model_source = [
-            "Adobe Firefly", "Dall-e 1", "Dall-e 2", "Dall-e 3", "Freepik Classic", "Freepik Classic Fast", "Freepik Flux",
-            "Freepik Flux Fast", "Freepik Flux Realism", "Freepik Mystic 1.0", "Freepik Mystic 2.5", "Freepik Mystic 2.5 Flexible", "Freepik Pikaso",
-            "Ideogram 1.0","Leonardo","Midjourney 1","Midjourney 2","Midjourney 4","Midjourney 5","Midjourney 5.1", "Midjourney 5.2", "Midjourney 6",
-            "niji", "Stable Diffusion 1.4", "Stable Diffusion 1.5", "Stable Diffusion 2.0", "Stable Diffusion 2.1", "Stable Diffusion XL", "Wepik"]
         self.combo_box = QComboBox()
         layout.addWidget(QLabel("Select Model Source:"))
-        self.combo_box.addItems(model_source)
+        self.combo_box.addItems(FREEPIK_MODEL_SOURCES)
         layout.addWidget(self.combo_box)
 
+        # Resume a crashed or stopped run from its journal
+        self.resume_checkbox = QCheckBox("Resume previous run")
+        layout.addWidget(self.resume_checkbox)
+
+        # Which files of the input folder are analyzed
+        self.recursive_checkbox = QCheckBox("Include subfolders")
+        self.recursive_checkbox.setChecked(True)
+        layout.addWidget(self.recursive_checkbox)
+        filter_layout = QHBoxLayout()
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText("e.g. *.jpg, 2024/*")
+        self.exclude_input = QLineEdit()
+        self.exclude_input.setPlaceholderText("e.g. thumbs, *_small.*")
+        filter_layout.addWidget(QLabel("Include:"))
+        filter_layout.addWidget(self.include_input)
+        filter_layout.addWidget(QLabel("Exclude:"))
+        filter_layout.addWidget(self.exclude_input)
+        layout.addLayout(filter_layout)
+
         # Progress bar
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
@@ -92,6 +119,17 @@ class FreepikImageAnalysisTab(QWidget):
             self.output_path.setText(folder)
             self.check_start_button()
 
+    def select_seed_csv(self):
+        file, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select Previous Results",
+            "",
+            "CSV Files (*.csv);;All Files (*.*)"
+        )
+        if file:
+            self.seed_csv = file
+            self.seed_path.setText(file)
+
     def check_start_button(self):
         if (self.input_path.text() != "Not selected" and 
             self.output_path.text() != "Not selected"):
@@ -110,12 +148,22 @@ class FreepikImageAnalysisTab(QWidget):
         self.status_text.clear()
         self.progress_bar.setValue(0)
 
+        # Imported on first use, it loads the Gemini client and image libraries
+        from freepik_image_analzyer import FreepikImageAnalyzer
+
         self.analyzer = FreepikImageAnalyzer(
             input_folder=self.input_path.text(),
             output_folder=self.output_path.text(),
             model_source=self.combo_box.currentText(),
             api_key=self.parent.api_key,
-            settings=self.parent.settings
+            settings=dict(
+                self.parent.settings,
+                recursive_input=self.recursive_checkbox.isChecked(),
+                include_patterns=self.include_input.text(),
+                exclude_patterns=self.exclude_input.text()
+            ),
+            seed_csv=self.seed_csv,
+            resume=self.resume_checkbox.isChecked()
         )
         self.analyzer.progress_updated.connect(self.update_progress)
         self.analyzer.analysis_complete.connect(self.analysis_completed)
@@ -142,7 +190,7 @@ class FreepikImageAnalysisTab(QWidget):
         self.progress_bar.setValue(value)
         self.status_text.append(message)
 
-    def analysis_completed(self, df):
+    def analysis_completed(self, csv_path):
         self.status_text.append("\nAnalysis completed successfully!")
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
@@ -2,15 +2,16 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QFileDialog, QProgressBar,
                             QTextEdit, QMessageBox, QDialog, QLineEdit,
                             QDialogButtonBox, QCheckBox, QStyleFactory, QTabWidget, QSlider, QListWidget,
-                            QGroupBox, QApplication)
+                            QGroupBox, QApplication, QComboBox)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QAction
-from analyzer import ImageAnalyzer
+from model_sources import FREEPIK_MODEL_SOURCES
 
 class ImageAnalysisTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        self.seed_csv = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -40,6 +41,49 @@ class ImageAnalysisTab(QWidget):
         output_layout.addWidget(output_button)
         layout.addLayout(output_layout)
 
+        # Previous results to seed the response cache with
+        seed_layout = QHBoxLayout()
+        seed_label = QLabel("Previous Results:")
+        self.seed_path = QLabel("Not selected")
+        seed_button = QPushButton("Import CSV")
+        seed_button.setObjectName("browseButton")
+        seed_button.clicked.connect(self.select_seed_csv)
+        seed_layout.addWidget(seed_label)
+        seed_layout.addWidget(self.seed_path)
+        seed_layout.addWidget(seed_button)
+        layout.addLayout(seed_layout)
+
+        # Freepik CSV from the same requests, one pass for both platforms
+        combined_layout = QHBoxLayout()
+        self.combined_checkbox = QCheckBox("Also create Freepik CSV")
+        self.model_source_combo = QComboBox()
+        self.model_source_combo.addItems(FREEPIK_MODEL_SOURCES)
+        self.model_source_combo.setEnabled(False)
+        self.combined_checkbox.toggled.connect(self.model_source_combo.setEnabled)
+        combined_layout.addWidget(self.combined_checkbox)
+        combined_layout.addWidget(QLabel("Model Source:"))
+        combined_layout.addWidget(self.model_source_combo)
+        layout.addLayout(combined_layout)
+
+        # Resume a crashed or stopped run from its journal
+        self.resume_checkbox = QCheckBox("Resume previous run")
+        layout.addWidget(self.resume_checkbox)
+
+        # Which files of the input folder are analyzed
+        self.recursive_checkbox = QCheckBox("Include subfolders")
+        self.recursive_checkbox.setChecked(True)
+        layout.addWidget(self.recursive_checkbox)
+        filter_layout = QHBoxLayout()
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText("e.g. *.jpg, 2024/*")
+        self.exclude_input = QLineEdit()
+        self.exclude_input.setPlaceholderText("e.g. thumbs, *_small.*")
+        filter_layout.addWidget(QLabel("Include:"))
+        filter_layout.addWidget(self.include_input)
+        filter_layout.addWidget(QLabel("Exclude:"))
+        filter_layout.addWidget(self.exclude_input)
+        layout.addLayout(filter_layout)
+
         # Progress bar
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
@@ -81,6 +125,17 @@ class ImageAnalysisTab(QWidget):
             self.output_path.setText(folder)
             self.check_start_button()
 
+    def select_seed_csv(self):
+        file, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select Previous Results",
+            "",
+            "CSV Files (*.csv);;All Files (*.*)"
+        )
+        if file:
+            self.seed_csv = file
+            self.seed_path.setText(file)
+
     def check_start_button(self):
         if (self.input_path.text() != "Not selected" and 
             self.output_path.text() != "Not selected"):
@@ -99,12 +154,28 @@ class ImageAnalysisTab(QWidget):
         self.status_text.clear()
         self.progress_bar.setValue(0)
 
-        self.analyzer = ImageAnalyzer(
+        options = dict(
             input_folder=self.input_path.text(),
             output_folder=self.output_path.text(),
             api_key=self.parent.api_key,
-            settings=self.parent.settings
+            settings=dict(
+                self.parent.settings,
+                recursive_input=self.recursive_checkbox.isChecked(),
+                include_patterns=self.include_input.text(),
+                exclude_patterns=self.exclude_input.text()
+            ),
+            seed_csv=self.seed_csv,
+            resume=self.resume_checkbox.isChecked()
         )
+        # Imported on first use, it loads the Gemini client and image libraries
+        if self.combined_checkbox.isChecked():
+            from combined_analyzer import CombinedImageAnalyzer
+            self.analyzer = CombinedImageAnalyzer(
+                model_source=self.model_source_combo.currentText(), **options
+            )
+        else:
+            from analyzer import ImageAnalyzer
+            self.analyzer = ImageAnalyzer(**options)
         self.analyzer.progress_updated.connect(self.update_progress)
         self.analyzer.analysis_complete.connect(self.analysis_completed)
         self.analyzer.error_occurred.connect(self.handle_error)
@@ -130,7 +201,7 @@ class ImageAnalysisTab(QWidget):
         self.progress_bar.setValue(value)
         self.status_text.append(message)
 
-    def analysis_completed(self, df):
+    def analysis_completed(self, csv_path):
         self.status_text.append("\nAnalysis completed successfully!")
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
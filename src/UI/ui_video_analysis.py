@@ -2,10 +2,9 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QFileDialog, QProgressBar,
                             QTextEdit, QMessageBox, QDialog, QLineEdit,
                             QDialogButtonBox, QCheckBox, QStyleFactory, QTabWidget, QSlider, QListWidget,
-                            QGroupBox, QApplication)
+                            QGroupBox, QApplication, QSpinBox)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QAction
-from video_analyzer import VideoBatchAnalyzer
 
 import os     
           
@@ -75,9 +74,30 @@ class VideoAnalysisTab(QWidget):
         slider_layout.addWidget(self.frame_position_label)
         frame_layout.addLayout(slider_layout)
 
+        # Several frames from different scenes instead of one fixed position
+        scene_layout = QHBoxLayout()
+        self.scene_checkbox = QCheckBox("Sample frames from different scenes")
+        self.scene_checkbox.toggled.connect(self.update_frame_sampling)
+        self.scene_frames_input = QSpinBox()
+        self.scene_frames_input.setRange(1, 16)
+        self.scene_frames_input.setValue(4)
+        self.scene_frames_input.setEnabled(False)
+        scene_layout.addWidget(self.scene_checkbox)
+        scene_layout.addWidget(QLabel("Frames:"))
+        scene_layout.addWidget(self.scene_frames_input)
+        frame_layout.addLayout(scene_layout)
+
+        # All sampled frames tiled into one image, billed like a single frame
+        self.contact_sheet_checkbox = QCheckBox("Send frames as one contact sheet")
+        frame_layout.addWidget(self.contact_sheet_checkbox)
+
         frame_group.setLayout(frame_layout)
         layout.addWidget(frame_group)
 
+        # Resume a crashed or stopped batch from its journal
+        self.resume_checkbox = QCheckBox("Resume previous run")
+        layout.addWidget(self.resume_checkbox)
+
         # Progress information
         progress_group = QGroupBox("Progress")
         progress_layout = QVBoxLayout()
@@ -170,6 +190,10 @@ class VideoAnalysisTab(QWidget):
         value = self.frame_slider.value()
         self.frame_position_label.setText(f"{value}%")
 
+    def update_frame_sampling(self, checked):
+        """Scene sampling replaces the fixed frame position"""
+        self.scene_frames_input.setEnabled(checked)
+        self.frame_slider.setEnabled(not checked)
 
     def start_analysis(self):
         if not self.parent.api_key:
@@ -177,11 +201,15 @@ class VideoAnalysisTab(QWidget):
             self.parent.show_settings_dialog()
             return
 
-        settings = {
-            'frame_position': self.frame_slider.value() / 100,
-            'request_delay': 2,
-            'max_retries': 3
-        }
+        # Shared settings (rate limits, metadata, keywords...) plus the video tab's own
+        settings = dict(
+            self.parent.settings,
+            frame_position=self.frame_slider.value() / 100,
+            frame_sampling='scenes' if self.scene_checkbox.isChecked() else 'position',
+            scene_frames=self.scene_frames_input.value(),
+            frame_layout='contact_sheet' if self.contact_sheet_checkbox.isChecked() else 'separate',
+            max_retries=3
+        )
 
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
@@ -189,11 +217,15 @@ class VideoAnalysisTab(QWidget):
         self.overall_progress.setValue(0)
         self.current_progress.setValue(0)
 
+        # Imported on first use, it loads the Gemini client and image libraries
+        from video_analyzer import VideoBatchAnalyzer
+
         self.batch_analyzer = VideoBatchAnalyzer(
             video_files=self.video_files,
             output_folder=self.output_path.text(),
             api_key=self.parent.api_key,
-            settings=settings
+            settings=settings,
+            resume=self.resume_checkbox.isChecked()
         )
 
         self.batch_analyzer.overall_progress_updated.connect(self.update_overall_progress)
@@ -201,6 +233,8 @@ class VideoAnalysisTab(QWidget):
         self.batch_analyzer.status_updated.connect(self.update_status)
         self.batch_analyzer.analysis_complete.connect(self.analysis_completed)
         self.batch_analyzer.error_occurred.connect(self.handle_error)
+        # Buttons come back also when the batch ends in an error
+        self.batch_analyzer.finished.connect(self.reset_buttons)
         self.batch_analyzer.start()
 
     def stop_analysis(self):
@@ -219,6 +253,11 @@ class VideoAnalysisTab(QWidget):
                 self.stop_button.setEnabled(False)
                 self.stop_button.setText("Stopping...")
 
+    def reset_buttons(self):
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.stop_button.setText("Stop")
+
     def update_overall_progress(self, value):
         self.overall_progress.setValue(value)
 
@@ -0,0 +1,139 @@
+import time
+from google.api_core.exceptions import ResourceExhausted
+from tenacity import retry, stop_after_attempt, wait_exponential
+from rate_limiter import estimate_request_tokens, response_token_count
+from multi_image import split_response_blocks
+from metadata_repair import repair_row
+from run_metrics import record_retry
+from structured_output import (
+    StructuredOutputError, generation_config, decode_response, validate_fields, split_json_rows
+)
+
+
+class AnalysisEngine:
+    """Request, parse and repair steps shared by the image and video engines.
+
+    Subclasses set the fields they ask for, the platform whose limits rows
+    are repaired to and what errors call a file, and provide ``settings``,
+    ``model``, ``rate_limiter``, ``metrics``, ``structured_output``,
+    ``flagged``, the signals and ``percent_done``.
+    """
+
+    # Output fields and their kind, see structured_output.FIELD_SCHEMAS
+    fields = {}
+    platform = 'adobe'
+    subject = 'image'
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        before_sleep=record_retry
+    )
+    def request_analysis(self, contents, payloads, filenames):
+        try:
+            # Wait for a slot in the shared RPM/TPM budget
+            tokens = estimate_request_tokens(contents[0], len(payloads))
+            start = time.perf_counter()
+            self.rate_limiter.acquire(tokens)
+            self.metrics.since('rate_limit_wait', start, filenames)
+
+            self.metrics.count('requests')
+            self.metrics.count('bytes_sent', sum(len(payload.data) for payload in payloads))
+
+            # The same encoded bytes are sent again on every retry
+            config = None
+            if self.structured_output:
+                config = generation_config(self.fields, multi=len(payloads) > 1)
+            start = time.perf_counter()
+            try:
+                response = self.model.generate_content(contents, generation_config=config)
+                response.resolve()
+            finally:
+                # Failed attempts took their time too
+                self.metrics.since('api', start, filenames)
+            tokens_used = response_token_count(response)
+            self.rate_limiter.record_success(tokens_used, tokens)
+            self.metrics.count('tokens', tokens_used or 0)
+            return response.text
+
+        except ResourceExhausted:
+            # A 429 from the API, not just any message mentioning 429
+            self.metrics.count('api_errors')
+            self.metrics.count('throttled_429')
+            # Slow the shared limiter down, tenacity handles the retry
+            self.rate_limiter.record_throttle()
+            self.error_occurred.emit("API quota exceeded, slowing down before retry...")
+            raise  # Retry
+        except Exception as e:
+            self.metrics.count('api_errors')
+            self.error_occurred.emit(f"Error analyzing {self.subject}: {str(e)}")
+            return None
+
+    def complete_row(self, row):
+        # Columns that do not come from the model
+        return row
+
+    def parse_analysis(self, filename, analysis_text):
+        """Row from a free text answer of ``Field: value`` lines"""
+        try:
+            result = {'Filename': filename, **{name: '' for name in self.fields}}
+            for line in analysis_text.split('\n'):
+                name, separator, value = line.strip().partition(':')
+                if separator and name in self.fields:
+                    result[name] = value.strip()
+            return self.complete_row(result)
+
+        except Exception as e:
+            self.error_occurred.emit(f"Error parsing analysis: {str(e)}")
+            return None
+
+    def repair_result(self, filename, result):
+        """Fix keywords, title and category locally instead of asking again.
+
+        Rows with problems the repair cannot fix are kept, and listed in
+        ``self.flagged`` for review.
+        """
+        if not result:
+            return result
+        repaired, problems = repair_row(
+            result, self.platform, self.settings.get('singularize_keywords', False)
+        )
+        if repaired != result:
+            self.metrics.count('rows_repaired')
+        if problems:
+            self.flagged[filename] = problems
+        else:
+            # A retried file may have been flagged before
+            self.flagged.pop(filename, None)
+        return repaired
+
+    def parse_response(self, filename, analysis):
+        """Parse a response, or one block of a multi-image response, and repair it"""
+        if not self.structured_output:
+            return self.repair_result(filename, self.parse_analysis(filename, analysis))
+        try:
+            data = decode_response(analysis) if isinstance(analysis, str) else analysis
+            row = self.complete_row({'Filename': filename, **validate_fields(data, self.fields)})
+            return self.repair_result(filename, row)
+        except StructuredOutputError as e:
+            self.metrics.count('invalid_responses')
+            # Reported without a dialog, the file just counts as failed
+            self.progress_updated.emit(
+                self.percent_done(),
+                f"Invalid response for {filename}: {str(e)}"
+            )
+            return None
+
+    def split_response(self, analysis, filenames):
+        """Map a multi-image response to ``{filename: block}``, plus rejects"""
+        if not self.structured_output:
+            return split_response_blocks(analysis, filenames)
+        try:
+            return split_json_rows(analysis, filenames)
+        except StructuredOutputError as e:
+            self.metrics.count('invalid_responses')
+            self.progress_updated.emit(
+                self.percent_done(),
+                f"Invalid multi-image response: {str(e)}"
+            )
+            return {}, []
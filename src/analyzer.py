@@ -1,269 +1,29 @@
-import os
-import time
-import io
-from PIL import Image
-import pandas as pd
-import google.generativeai as genai
-from google.generativeai import GenerativeModel
 from PyQt6.QtCore import QThread, pyqtSignal
-from tenacity import retry, stop_after_attempt, wait_exponential
+from events import relay
+from image_engine import ImageAnalysisEngine, ANALYSIS_PROMPT, ANALYSIS_CSV_COLUMNS, ANALYSIS_FIELDS
+
+SIGNALS = ('progress_updated', 'analysis_complete', 'error_occurred')
+
 
 class ImageAnalyzer(QThread):
+    """Runs an ImageAnalysisEngine in a thread, relaying its signals to Qt"""
+
     progress_updated = pyqtSignal(int, str)
     analysis_complete = pyqtSignal(object)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, input_folder, output_folder, api_key=None, settings=None):
+    def __init__(self, input_folder, output_folder, api_key=None, settings=None, seed_csv=None, resume=False):
         super().__init__()
-        self.input_folder = input_folder
-        self.output_folder = output_folder
-        self.api_key = api_key or ""
-        self.settings = settings or {
-            'batch_size': 5,
-            'request_delay': 2,
-            'max_retries': 3
-        }
-        self.stop_requested = False
-        self.model = None
-        self.setup_api()
-
-    def setup_api(self):
-        try:
-            if not self.api_key:
-                raise ValueError("API Key tidak ditemukan!")
-            
-            genai.configure(api_key=self.api_key)
-            self.model = GenerativeModel(self.settings.get('selected_model', 'gemini-1.5-flash'))
-            self.progress_updated.emit(0, "API initialized successfully")
-        except Exception as e:
-            self.error_occurred.emit(f"API Setup Error: {str(e)}")
-
-    def process_image(self, image_path):
-        try:
-            # Open and process image
-            img = Image.open(image_path)
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize if too large
-            max_size = 1024
-            if max(img.size) > max_size:
-                ratio = max_size / max(img.size)
-                new_size = tuple([int(x * ratio) for x in img.size])
-                img = img.resize(new_size, Image.LANCZOS)
-            
-            return img
-
-        except Exception as e:
-            self.error_occurred.emit(f"Error processing image: {str(e)}")
-            return None
-
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    def analyze_image(self, image):
-        try:
-            # Add delay between requests
-            time.sleep(self.settings.get('request_delay', 2))
-
-            prompt = """Analyze this image and provide details in the exact format below:
-            Filename: [original filename]
-            Title: [descriptive title and decide is it Illustration or photos, max 200 characters]
-            Keywords: [relevant keywords, minimum 35 keywords and max 50 keywords, separated by commas]
-            Category: [numerical category code based on:
-            Choose a category that describes your content as accurately as possible. Here is some more information about each category:
-            1. Animals: This is the best category for files related to animals, insects, or pets at home or in the wild.
-            2. Buildings and Architecture: This category is for all structures like homes, interiors, offices, temples, barns, factories, or shelters.
-            3. Business: includes business people, business offices, business concepts, finance, and money.
-            4. Drinks: includes the objects and culture of beer, wine, spirits, and other drinks.
-            5. The Environment: includes anything depicting nature or the surroundings we work and live in.
-            6. States of Mind: this category highlights content about our emotions and inner voice.
-            7. Food: any subject matter that focuses on food.
-            8. Graphic Resources: includes backgrounds, textures, and symbols.
-            9. Hobbies and Leisure: this category includes pastime activities that bring joy and/or relaxation, such as knitting, model airplanes, and sailing.
-            10. Industry: this category highlights work and manufacturing like building cars, forging steel, production of clothing, or production of energy.
-            11. Landscape: includes vistas, cities, nature, and other locations.
-            12. Lifestyle: highlights the environment and activity of people at home, work, and play.
-            13. People: displays all types of people—young, old, and ethnically diverse.
-            14. Plants and Flowers: features close-ups of the natural world.
-            15. Culture and Religion: depicts the traditions, beliefs, and cultures of people around the world.
-            16. Science: showcases content with a scientific focus on the applied, natural, medical, and theoretical sciences.
-            17. Social Issues: captures social issues like poverty, politics, and violence.
-            18. Sports: includes football, basketball, hunting, yoga, and skiing.
-            19. Technology: includes computers, smartphones, virtual reality, and tools to increase productivity.
-            20. Transport: highlights different types of transportation, including cars, buses, trains, planes, and highway systems.
-            21. Travel: features local and worldwide travel, culture, and lifestyle.
-            Choose the most appropriate category number]
-            Releases: [leave empty if no model/property releases needed]
-            """
+        self.engine = ImageAnalysisEngine(input_folder, output_folder, api_key, settings, seed_csv, resume)
+        relay(self.engine, self, SIGNALS)
 
-            response = self.model.generate_content([prompt, image])
-            response.resolve()
-            return response.text
+    @property
+    def stop_requested(self):
+        return self.engine.stop_requested
 
-        except Exception as e:
-            if "429" in str(e):
-                self.error_occurred.emit("API quota exceeded, waiting before retry...")
-                time.sleep(60)  # Wait for 1 minute
-                raise  # Retry
-            else:
-                self.error_occurred.emit(f"Error analyzing image: {str(e)}")
-                return None
-
-    def parse_analysis(self, filename, analysis_text):
-        try:
-            lines = [line.strip() for line in analysis_text.split('\n') if line.strip()]
-            result = {
-                'Filename': filename,
-                'Title': '',
-                'Keywords': '',
-                'Category': '',
-                'Releases': ''
-            }
-
-            for line in lines:
-                if line.startswith('Title:'):
-                    result['Title'] = line.replace('Title:', '').strip()[:200]
-                elif line.startswith('Keywords:'):
-                    result['Keywords'] = line.replace('Keywords:', '').strip()
-                elif line.startswith('Category:'):
-                    result['Category'] = line.replace('Category:', '').strip()
-                elif line.startswith('Releases:'):
-                    result['Releases'] = line.replace('Releases:', '').strip()
-
-            return result
-
-        except Exception as e:
-            self.error_occurred.emit(f"Error parsing analysis: {str(e)}")
-            return None
+    @stop_requested.setter
+    def stop_requested(self, value):
+        self.engine.stop_requested = value
 
     def run(self):
-        try:
-            data = []
-            image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
-            image_files = [f for f in os.listdir(self.input_folder) 
-                         if f.lower().endswith(image_extensions)]
-            
-            total_files = len(image_files)
-            if total_files == 0:
-                self.error_occurred.emit("No image files found in the input folder")
-                return
-
-            # Create output folder if it doesn't exist
-            os.makedirs(self.output_folder, exist_ok=True)
-
-            # Progress tracking
-            processed_count = 0
-            batch = []
-            batch_size = self.settings.get('batch_size', 5)
-
-            for filename in image_files:
-                if self.stop_requested:
-                    self.progress_updated.emit(
-                        int(processed_count / total_files * 100),
-                        "Analysis stopped by user."
-                    )
-                    break
-
-                try:
-                    image_path = os.path.join(self.input_folder, filename)
-                    self.progress_updated.emit(
-                        int(processed_count / total_files * 100),
-                        f"Processing {filename}..."
-                    )
-
-                    # Process image
-                    image = self.process_image(image_path)
-                    if image:
-                        batch.append((filename, image))
-
-                        # Process batch when full or last item
-                        if len(batch) >= batch_size or filename == image_files[-1]:
-                            for batch_filename, batch_image in batch:
-                                if self.stop_requested:
-                                    break
-
-                                analysis = self.analyze_image(batch_image)
-                                if analysis:
-                                    result = self.parse_analysis(batch_filename, analysis)
-                                    if result:
-                                        data.append(result)
-                                        processed_count += 1
-                                        self.progress_updated.emit(
-                                            int(processed_count / total_files * 100),
-                                            f"Successfully analyzed {batch_filename}"
-                                        )
-
-                            # Clear batch and wait before next batch
-                            batch = []
-                            if not self.stop_requested and filename != image_files[-1]:
-                                time.sleep(self.settings.get('request_delay', 2))
-
-                except Exception as e:
-                    self.error_occurred.emit(f"Error processing {filename}: {str(e)}")
-                    continue
-
-            # Save results
-            if data:
-                df = pd.DataFrame(data)
-                csv_path = os.path.join(self.output_folder, 'analysis_results.csv')
-                df.to_csv(csv_path, index=False)
-                
-                # Save progress file
-                progress_path = os.path.join(self.output_folder, 'analysis_progress.json')
-                with open(progress_path, 'w') as f:
-                    import json
-                    json.dump({
-                        'completed': [d['Filename'] for d in data],
-                        'total': total_files,
-                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-                    }, f)
-
-                self.analysis_complete.emit(df)
-            else:
-                self.error_occurred.emit("No data was processed successfully")
-
-        except Exception as e:
-            self.error_occurred.emit(f"An error occurred: {str(e)}")
-
-    def validate_api_key(self):
-        if not self.api_key:
-            return False
-        # Add additional validation if needed
-        return True
-
-    def get_supported_formats(self):
-        return ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
-
-    def estimate_processing_time(self, file_count):
-        # Rough estimation based on settings
-        time_per_image = self.settings.get('request_delay', 2) + 5  # 5 seconds for processing
-        batch_size = self.settings.get('batch_size', 5)
-        total_batches = file_count // batch_size + (1 if file_count % batch_size else 0)
-        
-        return total_batches * (time_per_image * batch_size + 10)  # 10 seconds between batches
-
-    def check_output_path(self):
-        try:
-            os.makedirs(self.output_folder, exist_ok=True)
-            test_file = os.path.join(self.output_folder, 'test.txt')
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
-            return True
-        except Exception:
-            return False
-        
-    def get_supported_formats(self):
-        """Return supported image formats"""
-        return ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
-
-    def validate_file(self, file_path):
-        """Validate if file is supported"""
-        return file_path.lower().endswith(self.get_supported_formats())
-    
-    
-    
+        self.engine.run()
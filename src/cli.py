@@ -0,0 +1,256 @@
+"""Headless analysis, without PyQt6 or a display.
+
+Run from the src folder:
+
+    python -m cli images INPUT_FOLDER -o OUTPUT_FOLDER
+    python -m cli freepik INPUT_FOLDER -o OUTPUT_FOLDER --model-source "Midjourney 6"
+    python -m cli combined INPUT_FOLDER -o OUTPUT_FOLDER --model-source "Midjourney 6"
+    python -m cli videos VIDEO_OR_FOLDER [...] -o OUTPUT_FOLDER --scenes 4
+    python -m cli repair CSV [--platform adobe|freepik]
+
+Performance settings and the API key are read from settings.json, like the
+GUI, and can be overridden on the command line; the key can also come from
+the GEMINI_API_KEY environment variable. Progress goes to stderr, and with
+--jsonl every finished row is printed to stdout as one JSON line. SIGINT
+and SIGTERM stop after the requests in flight, keeping the journal for
+--resume. The exit status is 0 when a CSV was written. The repair command
+fixes the keywords, titles and categories of an exported CSV in place,
+without the API.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+from file_discovery import walk_files
+from model_sources import FREEPIK_MODEL_SOURCES
+from platform_limits import PLATFORM_LIMITS
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def load_settings(path):
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def apply_overrides(settings, args):
+    """Settings file values, overridden by the options given"""
+    settings = dict(settings)
+    overrides = {
+        'selected_model': args.model,
+        'max_concurrent_requests': args.concurrency,
+        'requests_per_minute': args.rpm,
+        'tokens_per_minute': args.tpm,
+        'preprocess_workers': args.workers,
+        'batch_size': args.batch_size,
+        'memory_budget_mb': args.memory_budget,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            settings[key] = value
+    if args.batch_size:
+        settings['multi_image_requests'] = args.batch_size > 1
+    if args.structured:
+        settings['structured_output'] = True
+    if args.dedupe:
+        settings['dedupe_enabled'] = True
+    if args.no_cache:
+        settings['cache_enabled'] = False
+    if args.embed_metadata:
+        settings['embed_metadata'] = True
+    if args.singular_keywords:
+        settings['singularize_keywords'] = True
+    if args.no_recursive:
+        settings['recursive_input'] = False
+    # Patterns from settings.json stay unless replaced on the command line
+    if args.include:
+        settings['include_patterns'] = args.include
+    if args.exclude:
+        settings['exclude_patterns'] = args.exclude
+    return settings
+
+
+def video_settings(settings, args):
+    """Frame options of the video tab on top of the shared settings"""
+    settings = dict(settings, frame_position=args.frame_position)
+    if args.scenes:
+        settings['frame_sampling'] = 'scenes'
+        settings['scene_frames'] = args.scenes
+    if args.contact_sheet:
+        settings['frame_layout'] = 'contact_sheet'
+    return settings
+
+
+def find_videos(inputs, settings):
+    video_files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            video_files.extend(
+                os.path.join(path, relative_path) for relative_path in walk_files(
+                    path, VIDEO_EXTENSIONS,
+                    include=settings.get('include_patterns'),
+                    exclude=settings.get('exclude_patterns'),
+                    recursive=settings.get('recursive_input', True)
+                )
+            )
+        else:
+            video_files.append(path)
+    return video_files
+
+
+def build_engine(args, settings, api_key):
+    # Only the pipeline that runs is imported
+    if args.command == 'images':
+        from image_engine import ImageAnalysisEngine
+        return ImageAnalysisEngine(
+            args.input, args.output, api_key, settings, seed_csv=args.seed_csv, resume=args.resume
+        )
+    if args.command == 'freepik':
+        from freepik_engine import FreepikAnalysisEngine
+        return FreepikAnalysisEngine(
+            args.input, args.output, args.model_source, api_key, settings,
+            seed_csv=args.seed_csv, resume=args.resume
+        )
+    if args.command == 'combined':
+        from combined_engine import CombinedAnalysisEngine
+        return CombinedAnalysisEngine(
+            args.input, args.output, args.model_source, api_key, settings,
+            seed_csv=args.seed_csv, resume=args.resume
+        )
+    from video_engine import VideoBatchEngine
+    return VideoBatchEngine(
+        find_videos(args.inputs, settings), args.output, api_key, video_settings(settings, args), resume=args.resume
+    )
+
+
+def connect_output(engine, args, outcome):
+    def report(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    def error(message):
+        print(f"Error: {message}", file=sys.stderr, flush=True)
+
+    def complete(result):
+        outcome['complete'] = True
+
+    engine.error_occurred.connect(error)
+    engine.analysis_complete.connect(complete)
+    if hasattr(engine, 'status_updated'):
+        engine.status_updated.connect(lambda message: report(message.strip()))
+    else:
+        engine.progress_updated.connect(lambda percent, message: report(f"[{percent:3d}%] {message}"))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cli', description=__doc__.split('\n')[0])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-o', '--output', required=True, help='output folder')
+    common.add_argument('--model', help='Gemini model, default from settings or gemini-1.5-flash')
+    common.add_argument('--concurrency', type=int, help='requests in flight at once')
+    common.add_argument('--rpm', type=int, help='requests per minute')
+    common.add_argument('--tpm', type=int, help='tokens per minute')
+    common.add_argument('--workers', type=int, help='preprocessing worker processes')
+    common.add_argument('--batch-size', type=int, help='files per multi-image request, 1 turns it off')
+    common.add_argument('--structured', action='store_true', help='structured JSON output')
+    common.add_argument('--resume', action='store_true', help='continue a previous run from its journal')
+    common.add_argument('--include', action='append', help='only files matching this glob, repeatable')
+    common.add_argument('--exclude', action='append', help='skip files and folders matching this glob, repeatable')
+    common.add_argument('--no-recursive', action='store_true', help='ignore subfolders')
+    common.add_argument('--settings', default='settings.json', help='settings file, default %(default)s')
+    common.add_argument('--api-key', help='Gemini API key')
+    common.add_argument('--embed-metadata', action='store_true',
+                        help='write title and keywords into the files (XMP sidecars for videos)')
+    common.add_argument('--singular-keywords', action='store_true',
+                        help='make plural one-word keywords singular (cats becomes cat)')
+    common.add_argument('--jsonl', action='store_true', help='print each finished row as a JSON line')
+    common.add_argument('-q', '--quiet', action='store_true', help='only report errors')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    image_options = argparse.ArgumentParser(add_help=False)
+    image_options.add_argument('input', help='folder of images')
+    image_options.add_argument('--seed-csv', help='previously exported CSV to reuse')
+    image_options.add_argument('--dedupe', action='store_true', help='analyze one image per group of near-duplicates')
+    image_options.add_argument('--no-cache', action='store_true', help='do not use the response cache')
+    image_options.add_argument('--memory-budget', type=int, metavar='MB',
+                               help='decode images larger than this in memory band by band')
+
+    commands.add_parser('images', parents=[common, image_options], help='Adobe Stock image metadata')
+    freepik = commands.add_parser('freepik', parents=[common, image_options], help='Freepik image metadata')
+    combined = commands.add_parser('combined', parents=[common, image_options],
+                                   help='Adobe Stock and Freepik image metadata from one request per image')
+    for command in (freepik, combined):
+        command.add_argument('--model-source', required=True, choices=FREEPIK_MODEL_SOURCES,
+                             metavar='SOURCE', help='generator the images are credited to')
+
+    videos = commands.add_parser('videos', parents=[common], help='Adobe Stock video metadata')
+    videos.add_argument('inputs', nargs='+', help='video files or folders of videos')
+    videos.add_argument('--frame-position', type=float, default=0.5, help='frame position, 0.0 - 1.0')
+    videos.add_argument('--scenes', type=int, help='sample this many frames from different scenes')
+    videos.add_argument('--contact-sheet', action='store_true', help='send the frames as one contact sheet')
+    videos.set_defaults(dedupe=False, no_cache=False, memory_budget=None)
+
+    repair = commands.add_parser('repair', help='fix keywords, titles and categories of an exported CSV')
+    repair.add_argument('csv', help='analysis_results.csv or Freepik_Image_analysis.csv')
+    repair.add_argument('--platform', choices=sorted(PLATFORM_LIMITS),
+                        help='limits to apply, by default guessed from the columns')
+    repair.add_argument('--singular-keywords', action='store_true',
+                        help='make plural one-word keywords singular (cats becomes cat)')
+    return parser.parse_args(argv)
+
+
+def repair_command(args):
+    from metadata_repair import flagged_path, repair_csv
+
+    try:
+        count, flagged = repair_csv(args.csv, args.platform, singularize=args.singular_keywords)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Repaired {count} rows", file=sys.stderr)
+    if flagged:
+        print(f"{len(flagged)} rows need review, listed in {flagged_path(args.csv)}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'repair':
+        # Local only, no API key needed
+        return repair_command(args)
+    settings = load_settings(args.settings)
+    api_key = args.api_key or os.environ.get('GEMINI_API_KEY') or settings.get('api_key', '')
+    if not api_key:
+        print("Error: no API key, use --api-key or GEMINI_API_KEY", file=sys.stderr)
+        return 2
+    settings = apply_overrides(settings, args)
+
+    engine = build_engine(args, settings, api_key)
+    # Setup errors are emitted before anything can be connected
+    if getattr(engine, 'model', True) is None:
+        print("Error: could not initialize the API", file=sys.stderr)
+        return 1
+    outcome = {'complete': False}
+    connect_output(engine, args, outcome)
+
+    def request_stop(signum, frame):
+        # A second signal ends the process right away
+        engine.stop_requested = True
+        signal.signal(signum, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for row in engine.iter_results():
+        if args.jsonl:
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+    return 0 if outcome['complete'] else 1
+
+
+if __name__ == '__main__':
+    # Needed by the preprocess process pool in a frozen executable
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,31 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+from events import relay
+from combined_engine import CombinedAnalysisEngine, COMBINED_ANALYSIS_PROMPT, COMBINED_FIELDS
+
+SIGNALS = ('progress_updated', 'analysis_complete', 'error_occurred')
+
+
+class CombinedImageAnalyzer(QThread):
+    """Runs a CombinedAnalysisEngine in a thread, relaying its signals to Qt"""
+
+    progress_updated = pyqtSignal(int, str)
+    analysis_complete = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, input_folder, output_folder, model_source, api_key=None, settings=None, seed_csv=None, resume=False):
+        super().__init__()
+        self.engine = CombinedAnalysisEngine(
+            input_folder, output_folder, model_source, api_key, settings, seed_csv, resume
+        )
+        relay(self.engine, self, SIGNALS)
+
+    @property
+    def stop_requested(self):
+        return self.engine.stop_requested
+
+    @stop_requested.setter
+    def stop_requested(self, value):
+        self.engine.stop_requested = value
+
+    def run(self):
+        self.engine.run()
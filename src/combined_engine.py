@@ -0,0 +1,57 @@
+import os
+from csv_writer import StreamingCSVWriter, MultiCSVWriter
+from image_engine import ImageAnalysisEngine, ANALYSIS_PROMPT, ANALYSIS_CSV_COLUMNS, ANALYSIS_FIELDS
+from freepik_engine import FREEPIK_ANALYSIS_PROMPT, FREEPIK_CSV_COLUMNS
+from platform_limits import apply_limits
+
+# The Adobe Stock prompt plus the Freepik generation prompt. The title is
+# cut to 100 characters for Freepik, so its start has to stand on its own
+COMBINED_ANALYSIS_PROMPT = ANALYSIS_PROMPT.replace(
+    "max 200 characters]",
+    "max 200 characters, most important words first]"
+) + next(
+    line for line in FREEPIK_ANALYSIS_PROMPT.splitlines() if line.startswith('Prompt:')
+) + "\n"
+
+COMBINED_FIELDS = {**ANALYSIS_FIELDS, 'Prompt': 'text'}
+
+
+class CombinedAnalysisEngine(ImageAnalysisEngine):
+    """Adobe Stock and Freepik metadata from one request per image.
+
+    Asks for the union of both platforms' fields and writes
+    analysis_results.csv and Freepik_Image_analysis.csv from the same rows,
+    each cut to that platform's title and keyword limits. The journal keeps
+    the full rows, so a resumed run rebuilds both files.
+    """
+
+    base_prompt = COMBINED_ANALYSIS_PROMPT
+    fields = COMBINED_FIELDS
+    output_name = 'combined_analysis'
+
+    def __init__(self, input_folder, output_folder, model_source, api_key=None, settings=None, seed_csv=None, resume=False):
+        self.model_source = model_source
+        super().__init__(input_folder, output_folder, api_key, settings, seed_csv, resume)
+
+    def seed_cache(self, csv_path):
+        # Rows of a single-platform CSV lack fields the other one needs
+        self.progress_updated.emit(0, "Previous results are not imported in combined mode")
+
+    def adobe_row(self, row):
+        return apply_limits(row, 'adobe')
+
+    def freepik_row(self, row):
+        return dict(apply_limits(row, 'freepik'), Model=self.model_source)
+
+    def embedded_row(self, row):
+        # Adobe's limits are the looser ones
+        return self.adobe_row(row)
+
+    def open_output(self):
+        adobe_path = os.path.join(self.output_folder, 'analysis_results.csv')
+        freepik_path = os.path.join(self.output_folder, 'Freepik_Image_analysis.csv')
+        writer = MultiCSVWriter([
+            (StreamingCSVWriter(adobe_path, ANALYSIS_CSV_COLUMNS), self.adobe_row),
+            (StreamingCSVWriter(freepik_path, FREEPIK_CSV_COLUMNS, sep=';'), self.freepik_row),
+        ])
+        return adobe_path, writer
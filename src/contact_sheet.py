@@ -0,0 +1,59 @@
+import math
+from PIL import Image, ImageDraw, ImageFont
+from rate_limiter import IMAGE_TILE_SIZE
+
+# One billing tile, so a whole sheet costs as much as a small single frame
+CONTACT_SHEET_SIZE = IMAGE_TILE_SIZE
+
+CONTACT_SHEET_PROMPT = (
+    "Each video is shown as a contact sheet: a grid of frames from different "
+    "scenes, numbered in playback order from left to right and top to bottom, "
+    "each labeled with its timestamp. Describe the video as a whole, not the "
+    "grid or the labels.\n"
+)
+
+
+def sheet_layout(frame_size, count, max_size=CONTACT_SHEET_SIZE):
+    """Grid ``(columns, rows)`` and tile size for ``count`` frames of ``frame_size``"""
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    aspect = frame_size[0] / frame_size[1]
+    tile_width = max_size // columns
+    tile_height = round(tile_width / aspect)
+    if tile_height * rows > max_size:
+        tile_height = max_size // rows
+        tile_width = round(tile_height * aspect)
+    return (columns, rows), (max(1, tile_width), max(1, tile_height))
+
+
+def sheet_size(frame_size, count, max_size=CONTACT_SHEET_SIZE):
+    (columns, rows), (tile_width, tile_height) = sheet_layout(frame_size, count, max_size)
+    return columns * tile_width, rows * tile_height
+
+
+def format_timestamp(seconds):
+    # Rounded before splitting, so 59.96 s is 1:00.0 and not 0:60.0
+    tenths = round(seconds * 10)
+    minutes, tenths = divmod(tenths, 600)
+    return f"{minutes}:{tenths // 10:02d}.{tenths % 10}"
+
+
+def build_contact_sheet(timed_frames, max_size=CONTACT_SHEET_SIZE):
+    """Tile ``[(timestamp, image)]`` into one labeled grid image"""
+    count = len(timed_frames)
+    (columns, _), (tile_width, tile_height) = sheet_layout(timed_frames[0][1].size, count, max_size)
+    sheet = Image.new('RGB', sheet_size(timed_frames[0][1].size, count, max_size))
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+
+    for number, (timestamp, frame) in enumerate(timed_frames):
+        left = number % columns * tile_width
+        top = number // columns * tile_height
+        sheet.paste(frame.resize((tile_width, tile_height), Image.LANCZOS), (left, top))
+
+        # Label in the top left corner, on a dark box so it stays readable
+        label = f"{number + 1}  {format_timestamp(timestamp)}"
+        box = draw.textbbox((left + 4, top + 4), label, font=font)
+        draw.rectangle((box[0] - 3, box[1] - 2, box[2] + 3, box[3] + 2), fill=(0, 0, 0))
+        draw.text((left + 4, top + 4), label, fill=(255, 255, 255), font=font)
+    return sheet
@@ -0,0 +1,106 @@
+import csv
+import os
+
+
+class StreamingCSVWriter:
+    """Write result rows to CSV as they complete.
+
+    Rows go to ``<path>.tmp`` and are flushed every ``flush_every`` rows;
+    ``close`` fsyncs and renames the file into place, so readers only ever
+    see a complete CSV. The dialect matches ``DataFrame.to_csv(index=False)``.
+    """
+
+    def __init__(self, path, fieldnames, sep=',', flush_every=20):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.flush_every = flush_every
+        self.rows_written = 0
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(
+            self.file,
+            fieldnames=fieldnames,
+            delimiter=sep,
+            lineterminator=os.linesep,
+            extrasaction='ignore'
+        )
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.rows_written += 1
+        if self.rows_written % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        """Finish the file and atomically replace ``path`` with it"""
+        self.flush()
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Drop the partial file without touching an existing ``path``"""
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+class MultiCSVWriter:
+    """Write every row to several CSV files, each through its own transform.
+
+    Takes ``[(StreamingCSVWriter, transform)]`` and has the same interface
+    as a single StreamingCSVWriter, so it can stand in for one.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.rows_written = 0
+
+    def write(self, row):
+        for writer, transform in self.targets:
+            writer.write(transform(row))
+        self.rows_written += 1
+
+    def flush(self):
+        for writer, _ in self.targets:
+            writer.flush()
+
+    def close(self):
+        for writer, _ in self.targets:
+            writer.close()
+
+    def abort(self):
+        for writer, _ in self.targets:
+            writer.abort()
+
+
+class OrderedRowWriter:
+    """Put rows that finish out of order back into input order.
+
+    Each input index is reported once, with its row or None if it failed.
+    Rows are written as soon as every earlier index has been reported, so
+    only the out-of-order tail is held in memory.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.next_index = 0
+        self.pending = {}
+
+    def add(self, index, row):
+        self.pending[index] = row
+        while self.next_index in self.pending:
+            row = self.pending.pop(self.next_index)
+            if row is not None:
+                self.writer.write(row)
+            self.next_index += 1
+
+    def finish(self):
+        """Write whatever is still buffered, skipping indices never reported"""
+        for index in sorted(self.pending):
+            row = self.pending[index]
+            if row is not None:
+                self.writer.write(row)
+        self.pending.clear()
@@ -0,0 +1,40 @@
+class Signal:
+    """Qt-free stand-in for ``pyqtSignal``, declared on the class the same way.
+
+    ``connect`` and ``emit`` work like their Qt counterparts, but slots are
+    called directly in the emitting thread, so the analysis engines run
+    without PyQt6 or an event loop.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance.__dict__.setdefault(self.name, BoundSignal())
+
+
+class BoundSignal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def disconnect(self, slot):
+        self.slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in list(self.slots):
+            slot(*args)
+
+
+def relay(source, target, names):
+    """Re-emit the ``names`` signals of ``source`` on ``target``.
+
+    The QThread adapters relay engine events to their ``pyqtSignal``s, which
+    Qt queues into the GUI thread.
+    """
+    for name in names:
+        getattr(source, name).connect(getattr(target, name).emit)
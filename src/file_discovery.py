@@ -0,0 +1,138 @@
+import os
+import queue
+import threading
+from fnmatch import fnmatch
+
+# Most paths handed from the walking thread to the consumer at once
+MAX_CHUNK = 512
+
+
+def parse_patterns(value):
+    """Glob patterns from a list or a comma/semicolon separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace(';', ',').split(',')
+    return [pattern.strip() for pattern in value if pattern.strip()]
+
+
+def matches(relative_path, patterns):
+    # A pattern matches the path below the root or just the name
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(fnmatch(relative_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def walk_files(root, extensions, include=None, exclude=None, recursive=True, onerror=None):
+    """Yield paths relative to ``root`` (with ``/``) of matching files, as found.
+
+    Directories are read with ``os.scandir`` one at a time, so the first
+    files come out before the rest of the tree has been listed. A file is
+    kept when its extension is in ``extensions``, it matches an
+    ``include`` glob (if any) and no ``exclude`` glob. Excluded directories
+    are not entered, and neither are symlinked ones, so links cannot loop.
+    ``onerror(path, error)`` is called for unreadable directories.
+    """
+    include = parse_patterns(include)
+    exclude = parse_patterns(exclude)
+    extensions = tuple(extension.lower() for extension in extensions)
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        subdirs = []
+        try:
+            with os.scandir(os.path.join(root, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = relative_dir + entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and not matches(relative_path, exclude):
+                                subdirs.append(relative_path + '/')
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    if not entry.name.lower().endswith(extensions):
+                        continue
+                    if include and not matches(relative_path, include):
+                        continue
+                    if exclude and matches(relative_path, exclude):
+                        continue
+                    yield relative_path
+        except OSError as e:
+            if onerror:
+                onerror(relative_dir or root, e)
+        # Depth first, subfolders in the order they were listed
+        pending.extend(reversed(subdirs))
+
+
+class FileDiscovery:
+    """Walk an input tree in a background thread and stream what it finds.
+
+    Iterating yields the relative paths in discovery order while the walk
+    continues, so processing starts as soon as the first file is found.
+    ``found`` counts the files so far and ``total`` is filled in once the
+    walk completes. ``stop()`` ends the walk early.
+    """
+
+    def __init__(self, root, extensions, include=None, exclude=None, recursive=True, onerror=None):
+        self.root = root
+        self.extensions = extensions
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
+        self.onerror = onerror
+        self.found = 0
+        self.total = None
+        self.stop_requested = False
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.walk, daemon=True)
+        self.thread.start()
+        return self
+
+    def walk(self):
+        error = None
+        # Paths are handed over in chunks that grow from one, so the first
+        # file is available at once and large trees cost few queue operations
+        chunk = []
+        chunk_size = 1
+        try:
+            for relative_path in walk_files(self.root, self.extensions, self.include,
+                                            self.exclude, self.recursive, self.onerror):
+                if self.stop_requested:
+                    return
+                chunk.append(relative_path)
+                if len(chunk) >= chunk_size:
+                    self.found += len(chunk)
+                    self.queue.put(chunk)
+                    chunk = []
+                    chunk_size = min(chunk_size * 2, MAX_CHUNK)
+            self.found += len(chunk)
+            self.queue.put(chunk)
+            self.total = self.found
+        except Exception as e:
+            error = e
+        finally:
+            # End marker, carrying the error if the walk failed
+            self.queue.put(error or StopIteration)
+
+    def stop(self):
+        self.stop_requested = True
+
+    @property
+    def finished(self):
+        return self.total is not None
+
+    def __iter__(self):
+        if self.thread is None:
+            self.start()
+        while True:
+            item = self.queue.get()
+            if item is StopIteration:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield from item
@@ -0,0 +1,222 @@
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from image_preprocessing import shrink_array, encode_payload, MAX_IMAGE_SIZE
+from video_decoder import VideoDecoder
+from contact_sheet import build_contact_sheet, sheet_size, CONTACT_SHEET_SIZE
+from rate_limiter import image_tokens
+
+# Frames compared per minute of footage, independent of how many are picked
+ANALYSIS_RATE = 120
+
+# Frames are compared as tiny thumbnails
+THUMB_SIZE = (64, 36)
+HIST_BINS = 16
+
+
+def frame_signature(frame):
+    """Downscaled thumbnail and normalized color histogram of a BGR frame"""
+    thumb = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    bins = (thumb // (256 // HIST_BINS)).reshape(-1, 3).astype(np.intp)
+    hist = np.concatenate([
+        np.bincount(bins[:, channel], minlength=HIST_BINS) for channel in range(3)
+    ]).astype(np.float32)
+    return thumb.astype(np.int16), hist / hist.sum()
+
+
+def change_score(previous, current):
+    """0.0 for identical frames up to 1.0 for completely different ones.
+
+    Averages the histogram distance (robust to motion) and the mean pixel
+    difference (catches cuts between scenes with similar colors).
+    """
+    hist_distance = np.abs(previous[1] - current[1]).sum() / 6
+    pixel_distance = np.abs(previous[0] - current[0]).mean() / 255
+    return float(hist_distance + pixel_distance) / 2
+
+
+class SceneSampler:
+    """Split a stream of sampled frames into scenes, one candidate each.
+
+    Each scene keeps only its steadiest frame (least change from the frame
+    before it), shrunk to ``max_size``, and at most ``max_scenes`` scenes
+    are held, merging the shortest ones, so memory stays bounded for any
+    clip length.
+    """
+
+    def __init__(self, threshold=0.3, min_scene=0.5, max_scenes=16, max_size=MAX_IMAGE_SIZE):
+        self.threshold = threshold
+        self.min_scene = min_scene
+        self.max_scenes = max(1, max_scenes)
+        self.max_size = max_size
+        self.scenes = []
+        self.previous = None
+
+    def add(self, timestamp, frame):
+        signature = frame_signature(frame)
+        score = 1.0 if self.previous is None else change_score(self.previous, signature)
+        self.previous = signature
+
+        scene = self.scenes[-1] if self.scenes else None
+        if scene is None or (score >= self.threshold
+                             and timestamp - scene['start'] >= self.min_scene):
+            # The first frame of a scene is only a fallback candidate
+            self.scenes.append({
+                'start': timestamp,
+                'end': timestamp,
+                'steadiness': 2.0,
+                'timestamp': timestamp,
+                'frame': shrink_array(frame, self.max_size),
+            })
+            if len(self.scenes) > self.max_scenes:
+                self.merge_shortest()
+            return
+
+        scene['end'] = timestamp
+        if score < scene['steadiness']:
+            scene['steadiness'] = score
+            scene['timestamp'] = timestamp
+            scene['frame'] = shrink_array(frame, self.max_size)
+
+    def merge_shortest(self):
+        # Fold the shortest finished scene into its shorter neighbour,
+        # keeping the candidate of whichever of the two is longer
+        finished = self.scenes[:-1]
+        index = min(range(len(finished)), key=lambda i: self.duration(finished[i]))
+        neighbours = [i for i in (index - 1, index + 1) if 0 <= i < len(self.scenes)]
+        neighbour = min(neighbours, key=lambda i: self.duration(self.scenes[i]))
+        first, second = sorted((index, neighbour))
+        keep = max(self.scenes[first], self.scenes[second], key=self.duration)
+        keep = dict(keep, start=self.scenes[first]['start'], end=self.scenes[second]['end'])
+        self.scenes[first:second + 1] = [keep]
+
+    @staticmethod
+    def duration(scene):
+        return scene['end'] - scene['start']
+
+    def pick(self, count):
+        """Candidates of the ``count`` longest scenes, in playback order"""
+        longest = sorted(self.scenes, key=self.duration, reverse=True)[:max(1, count)]
+        return sorted(longest, key=lambda scene: scene['start'])
+
+
+def sample_scene_frames(video_path, count=4, threshold=0.3, max_size=MAX_IMAGE_SIZE,
+                        analysis_rate=ANALYSIS_RATE):
+    """Pick up to ``count`` representative frames from different scenes.
+
+    The clip is opened once and read from start to end. Only
+    ``analysis_rate`` frames per minute are retrieved and compared (the
+    decoder grabs or seeks between them, whichever is cheaper), so the cost
+    grows with the clip length and not with ``count``. Returns
+    ``[(timestamp, PIL.Image)]`` in playback order.
+    """
+    with VideoDecoder(video_path) as decoder:
+        fps = decoder.info['fps']
+        step = max(1, int(round(fps * 60 / analysis_rate)))
+        sampler = SceneSampler(threshold=threshold, max_scenes=max(8, count * 4), max_size=max_size)
+        for frame_number, frame in decoder.scan(step):
+            sampler.add(frame_number / fps, frame)
+
+    if not sampler.scenes:
+        raise Exception("Error reading frames")
+    return [
+        (scene['timestamp'], Image.fromarray(cv2.cvtColor(scene['frame'], cv2.COLOR_BGR2RGB)))
+        for scene in sampler.pick(count)
+    ]
+
+
+def extract_position_frames(video_path, positions, fast=False, max_size=MAX_IMAGE_SIZE):
+    """Frames at several positions (0.0 - 1.0) of the clip.
+
+    The file is opened once for all positions. Returns
+    ``[(timestamp, PIL.Image)]`` in the order of ``positions``.
+    """
+    with VideoDecoder(video_path) as decoder:
+        frames = decoder.read_positions(positions)
+        timestamps = [decoder.frame_at(position) / decoder.info['fps'] for position in positions]
+
+    images = []
+    for timestamp, frame in zip(timestamps, frames):
+        if frame is None:
+            raise Exception("Error reading frame")
+
+        # Fast mode: shrink with INTER_AREA before any other work
+        if fast:
+            frame = shrink_array(frame, max_size)
+
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if max(image.size) > max_size:
+            ratio = max_size / max(image.size)
+            new_size = tuple([int(x * ratio) for x in image.size])
+            image = image.resize(new_size, Image.LANCZOS)
+        images.append((timestamp, image))
+    return images
+
+
+def extract_position_frame(video_path, position=0.5, fast=False, max_size=MAX_IMAGE_SIZE):
+    """The frame at ``position`` (0.0 - 1.0) of the clip, as an RGB image"""
+    return extract_position_frames(video_path, [position], fast, max_size)[0][1]
+
+
+def sample_video_frames(video_path, options):
+    """Frames sampled from one video, as ``[(timestamp, PIL.Image)]``.
+
+    With ``frame_sampling`` set to ``scenes`` these are up to
+    ``scene_frames`` representatives of different scenes, otherwise the
+    single frame at ``frame_position``.
+    """
+    if options.get('frame_sampling', 'position') == 'scenes':
+        return sample_scene_frames(
+            video_path,
+            count=options.get('scene_frames', 4),
+            threshold=options.get('scene_threshold', 0.3)
+        )
+    return extract_position_frames(
+        video_path,
+        [options.get('frame_position', 0.5)],
+        fast=options.get('fast_preprocess', False)
+    )
+
+
+def layout_frames(timed_frames, options):
+    """Images sent for the sampled frames: the frames or one contact sheet"""
+    if options.get('frame_layout', 'separate') == 'contact_sheet':
+        return [build_contact_sheet(
+            timed_frames, options.get('contact_sheet_size', CONTACT_SHEET_SIZE)
+        )]
+    return [frame for _, frame in timed_frames]
+
+
+def image_token_estimates(timed_frames, options):
+    """Image tokens one video costs with each way of sending its frames"""
+    frame_size = timed_frames[0][1].size
+    size = options.get('contact_sheet_size', CONTACT_SHEET_SIZE)
+    return {
+        'single_frame': image_tokens(frame_size),
+        'multi_image': sum(image_tokens(frame.size) for _, frame in timed_frames),
+        'contact_sheet': image_tokens(sheet_size(frame_size, len(timed_frames), size)),
+    }
+
+
+def sample_video_payloads(video_path, options):
+    """Sample, lay out and encode a video's frames, in a worker process.
+
+    Returns the payloads to send, the image token estimates and the
+    seconds spent in each step.
+    """
+    start = time.perf_counter()
+    timed_frames = sample_video_frames(video_path, options)
+    sampled = time.perf_counter()
+    images = layout_frames(timed_frames, options)
+    laid_out = time.perf_counter()
+    payloads = [
+        encode_payload(image, options.get('payload_format', 'JPEG'), options.get('payload_quality', 90))
+        for image in images
+    ]
+    timings = {
+        'decode': sampled - start,
+        'layout': laid_out - sampled,
+        'encode': time.perf_counter() - laid_out,
+    }
+    return payloads, image_token_estimates(timed_frames, options), timings
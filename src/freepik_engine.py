@@ -0,0 +1,41 @@
+from image_engine import ImageAnalysisEngine
+from model_sources import FREEPIK_MODEL_SOURCES  # noqa: F401, re-exported for freepik_image_analzyer
+
+FREEPIK_ANALYSIS_PROMPT = """Analyze this image and provide details in the exact format below:
+Filename: [original filename]
+Title: [give the descriptive title max 100 characters, Titles must be coherent and relevant.]
+Keywords: [coherent and relevant keywords, minimum 35 keywords and max 45 keywords, separated by commas. Do not repeat the same keywords over and over.]
+Prompt: [describe the image in a few sentences, be as detailed as possible and optimized when used in another generative AI. 500 characters max Enter the details and specs used to create the AI-generated image]
+"""
+
+FREEPIK_CSV_COLUMNS = ['Filename', 'Title', 'Keywords', 'Prompt', 'Model']
+
+# Output fields and their kind, for structured JSON output
+FREEPIK_FIELDS = {
+    'Title': 'title',
+    'Keywords': 'keywords',
+    'Prompt': 'text',
+}
+
+
+class FreepikAnalysisEngine(ImageAnalysisEngine):
+    """Analyzes every image in a folder into a Freepik CSV, without Qt.
+
+    The image engine with Freepik's prompt, fields and limits, and the
+    generator the images are credited to in the Model column. The GUI runs
+    it in a QThread through ``freepik_image_analzyer.FreepikImageAnalyzer``.
+    """
+
+    base_prompt = FREEPIK_ANALYSIS_PROMPT
+    fields = FREEPIK_FIELDS
+    output_name = 'Freepik_Image_analysis'
+    platform = 'freepik'
+    csv_columns = FREEPIK_CSV_COLUMNS
+    csv_sep = ';'
+
+    def __init__(self, input_folder, output_folder, model_source, api_key=None, settings=None, seed_csv=None, resume=False):
+        self.model_source = model_source
+        super().__init__(input_folder, output_folder, api_key, settings, seed_csv, resume)
+
+    def complete_row(self, row):
+        return dict(row, Model=self.model_source)
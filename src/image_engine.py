@@ -0,0 +1,642 @@
+import os
+import time
+import itertools
+import json
+import google.generativeai as genai
+from google.generativeai import GenerativeModel
+from analysis_engine import AnalysisEngine
+from rate_limiter import get_rate_limiter
+from request_engine import ConcurrentRequestEngine, batched
+from response_cache import open_response_cache
+from run_journal import RunJournal
+from csv_writer import StreamingCSVWriter, OrderedRowWriter
+from image_preprocessing import prepare_payload
+from preprocess_pool import PreprocessPipeline, process_ahead
+from large_images import (
+    large_image_slots, set_large_image_slots,
+    DEFAULT_MEMORY_BUDGET_MB, DEFAULT_MAX_IMAGE_PIXELS, DEFAULT_LARGE_IN_FLIGHT
+)
+from vector_images import IMAGE_EXTENSIONS, raster_cache_dir
+from metadata_writer import open_metadata_writer
+from metadata_repair import flagged_path, write_flagged
+from near_duplicates import image_hash, group_near_duplicates
+from multi_image import build_multi_image_contents
+from events import Signal
+from file_discovery import FileDiscovery, walk_files
+from run_metrics import RunMetrics, stage_summary
+from structured_output import structured_prompt
+
+ANALYSIS_PROMPT = """Analyze this image and provide details in the exact format below:
+Filename: [original filename]
+Title: [descriptive title and decide is it Illustration or photos, max 200 characters]
+Keywords: [relevant keywords, minimum 35 keywords and max 50 keywords, separated by commas]
+Category: [numerical category code based on:
+Choose a category that describes your content as accurately as possible. Here is some more information about each category:
+1. Animals: This is the best category for files related to animals, insects, or pets at home or in the wild.
+2. Buildings and Architecture: This category is for all structures like homes, interiors, offices, temples, barns, factories, or shelters.
+3. Business: includes business people, business offices, business concepts, finance, and money.
+4. Drinks: includes the objects and culture of beer, wine, spirits, and other drinks.
+5. The Environment: includes anything depicting nature or the surroundings we work and live in.
+6. States of Mind: this category highlights content about our emotions and inner voice.
+7. Food: any subject matter that focuses on food.
+8. Graphic Resources: includes backgrounds, textures, and symbols.
+9. Hobbies and Leisure: this category includes pastime activities that bring joy and/or relaxation, such as knitting, model airplanes, and sailing.
+10. Industry: this category highlights work and manufacturing like building cars, forging steel, production of clothing, or production of energy.
+11. Landscape: includes vistas, cities, nature, and other locations.
+12. Lifestyle: highlights the environment and activity of people at home, work, and play.
+13. People: displays all types of people—young, old, and ethnically diverse.
+14. Plants and Flowers: features close-ups of the natural world.
+15. Culture and Religion: depicts the traditions, beliefs, and cultures of people around the world.
+16. Science: showcases content with a scientific focus on the applied, natural, medical, and theoretical sciences.
+17. Social Issues: captures social issues like poverty, politics, and violence.
+18. Sports: includes football, basketball, hunting, yoga, and skiing.
+19. Technology: includes computers, smartphones, virtual reality, and tools to increase productivity.
+20. Transport: highlights different types of transportation, including cars, buses, trains, planes, and highway systems.
+21. Travel: features local and worldwide travel, culture, and lifestyle.
+Choose the most appropriate category number]
+Releases: [leave empty if no model/property releases needed]
+"""
+
+ANALYSIS_CSV_COLUMNS = ['Filename', 'Title', 'Keywords', 'Category', 'Releases']
+
+# Output fields and their kind, for structured JSON output
+ANALYSIS_FIELDS = {
+    'Title': 'title',
+    'Keywords': 'keywords',
+    'Category': 'category',
+    'Releases': 'optional',
+}
+
+
+def output_row(row):
+    # Files from subfolders are listed by name, which is what uploads match
+    return dict(row, Filename=os.path.basename(row['Filename']))
+
+
+class ImageAnalysisEngine(AnalysisEngine):
+    """Analyzes every image in a folder into a CSV, without Qt.
+
+    Progress and errors are reported through the signals, and
+    ``iter_results`` yields each row as it completes. The GUI runs it in a
+    QThread through ``analyzer.ImageAnalyzer``.
+    """
+
+    # Overridden by engines that ask for other fields or write other files
+    base_prompt = ANALYSIS_PROMPT
+    fields = ANALYSIS_FIELDS
+    output_name = 'analysis_results'
+    csv_columns = ANALYSIS_CSV_COLUMNS
+    csv_sep = ','
+
+    progress_updated = Signal()
+    analysis_complete = Signal()
+    error_occurred = Signal()
+
+    def __init__(self, input_folder, output_folder, api_key=None, settings=None, seed_csv=None, resume=False):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.api_key = api_key or ""
+        self.seed_csv = seed_csv
+        self.resume = resume
+        self.settings = settings or {
+            'batch_size': 5,
+            'requests_per_minute': 15,
+            'tokens_per_minute': 1000000,
+            'max_retries': 3,
+            'max_concurrent_requests': 1,
+            'multi_image_requests': False,
+            'preprocess_workers': os.cpu_count() or 1
+        }
+        self.stop_requested = False
+        self.processed_count = 0
+        self.discovery = None
+        # Rows the local repair could not fix, by filename
+        self.flagged = {}
+        # Stage timings and counters, saved next to the CSV
+        self.metrics = RunMetrics(self.output_name)
+        self.model = None
+        self.model_name = self.settings.get('selected_model', 'gemini-1.5-flash')
+        # JSON output constrained by a response schema instead of free text
+        self.structured_output = self.settings.get('structured_output', False)
+        self.prompt = structured_prompt(self.base_prompt) if self.structured_output else self.base_prompt
+        self.rate_limiter = get_rate_limiter(self.settings)
+        self.cache = None
+        self.setup_api()
+        self.setup_cache()
+
+    def setup_api(self):
+        try:
+            if not self.api_key:
+                raise ValueError("API Key tidak ditemukan!")
+            
+            genai.configure(api_key=self.api_key)
+            self.model = GenerativeModel(self.model_name)
+            self.progress_updated.emit(0, "API initialized successfully")
+        except Exception as e:
+            self.error_occurred.emit(f"API Setup Error: {str(e)}")
+
+    def setup_cache(self):
+        try:
+            self.cache = open_response_cache(self.settings, self.output_folder)
+        except Exception as e:
+            self.error_occurred.emit(f"Cache Setup Error: {str(e)}")
+
+    def cache_key(self, payload):
+        return self.cache.make_key(payload, self.prompt, self.model_name)
+
+    def seed_cache(self, csv_path):
+        """Import a previously exported CSV so matching images skip the API.
+
+        Exported CSVs list files by name, so a name that is not a path in
+        the input folder is looked up among the files of its subfolders;
+        one found in several of them is ambiguous and skipped.
+        """
+        by_name = {}
+        for relative_path in walk_files(
+                self.input_folder, IMAGE_EXTENSIONS,
+                include=self.settings.get('include_patterns'),
+                exclude=self.settings.get('exclude_patterns'),
+                recursive=self.settings.get('recursive_input', True)):
+            by_name.setdefault(os.path.basename(relative_path), []).append(relative_path)
+
+        def key_for_filename(filename):
+            relative_path = filename.replace('\\', '/')
+            if not os.path.isfile(os.path.join(self.input_folder, relative_path)):
+                found = by_name.get(os.path.basename(relative_path), [])
+                if len(found) != 1:
+                    return None
+                relative_path = found[0]
+            payload = self.process_image(os.path.join(self.input_folder, relative_path))
+            return self.cache_key(payload) if payload else None
+
+        imported = self.cache.import_csv(csv_path, key_for_filename, sep=self.csv_sep)
+        self.progress_updated.emit(0, f"Imported {imported} cached results from {os.path.basename(csv_path)}")
+
+    def preprocess_options(self):
+        return {
+            'fast': self.settings.get('fast_preprocess', False),
+            'backend': self.settings.get('resize_backend', 'pillow'),
+            'payload_format': self.settings.get('payload_format', 'JPEG'),
+            'payload_quality': self.settings.get('payload_quality', 90),
+            'memory_budget_mb': self.settings.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB),
+            'max_image_pixels': self.settings.get('max_image_pixels', DEFAULT_MAX_IMAGE_PIXELS),
+            'raster_cache': raster_cache_dir(self.settings, self.output_folder)
+        }
+
+    def embedded_row(self, row):
+        # The row whose title and keywords go into the source file
+        return row
+
+    def cached_result(self, filename, payload):
+        """Return the cache key for a payload and its cached row, if any"""
+        if not self.cache:
+            return None, None
+        start = time.perf_counter()
+        key = self.cache_key(payload)
+        cached = self.cache.get(key)
+        self.metrics.since('cache_lookup', start, [filename])
+        if cached:
+            self.metrics.count('cache_hits')
+            cached['Filename'] = filename
+            cached = self.repair_result(filename, self.complete_row(cached))
+        return key, cached
+
+    def store_result(self, key, result):
+        # Only complete answers are worth reusing
+        if key and result and result['Title'] and result['Keywords']:
+            self.cache.put(key, result)
+
+    def process_image(self, image_path):
+        try:
+            return prepare_payload(image_path, **self.preprocess_options())
+
+        except Exception as e:
+            self.error_occurred.emit(f"Error processing image: {str(e)}")
+            return None
+
+    def analyze_image(self, filename, payload):
+        return self.request_analysis([self.prompt, payload.as_part()], [payload], [filename])
+
+    def analyze_images(self, named_payloads):
+        """One request for several images, answered with a block per filename"""
+        contents = build_multi_image_contents(self.prompt, named_payloads)
+        return self.request_analysis(
+            contents, [payload for _, payload in named_payloads], [filename for filename, _ in named_payloads]
+        )
+
+    def analyze_file(self, filename, payload=None):
+        try:
+            image_path = os.path.join(self.input_folder, filename)
+            self.progress_updated.emit(
+                self.percent_done(),
+                f"Processing {filename}..."
+            )
+
+            # Process image, unless the preprocess pipeline already did
+            if payload is None:
+                payload = self.process_image(image_path)
+            if not payload:
+                return None
+
+            # Reuse an earlier answer for the same payload, prompt and model
+            key, cached = self.cached_result(filename, payload)
+            if cached:
+                return cached
+
+            analysis = self.analyze_image(filename, payload)
+            if not analysis:
+                return None
+
+            start = time.perf_counter()
+            result = self.parse_response(filename, analysis)
+            self.metrics.since('parse', start, [filename])
+            self.store_result(key, result)
+            return result
+
+        except Exception as e:
+            self.error_occurred.emit(f"Error processing {filename}: {str(e)}")
+            return None
+
+    def analyze_batch(self, entries):
+        """Analyze preprocessed ``((index, filename), payload, error)`` entries.
+
+        Returns one result (or None) per entry. Images the cache cannot
+        answer share one multi-image request; any file the response does not
+        map back to cleanly is retried on its own.
+        """
+        results = [None] * len(entries)
+        pending = []
+        for position, ((_, filename), payload, error) in enumerate(entries):
+            if error:
+                self.error_occurred.emit(f"Error processing image: {str(error)}")
+                continue
+            # Decode, resize and encode ran in a worker process
+            self.metrics.observe_all(payload.timings, [filename])
+            if len(entries) == 1:
+                results[position] = self.analyze_file(filename, payload)
+            else:
+                key, cached = self.cached_result(filename, payload)
+                if cached:
+                    results[position] = cached
+                else:
+                    pending.append((position, filename, payload, key))
+
+        blocks = {}
+        if len(pending) > 1:
+            filenames = [filename for _, filename, _, _ in pending]
+            try:
+                self.progress_updated.emit(
+                    self.percent_done(),
+                    f"Processing {len(pending)} images in one request: {', '.join(filenames)}..."
+                )
+                analysis = self.analyze_images([(filename, payload) for _, filename, payload, _ in pending])
+                start = time.perf_counter()
+                blocks, rejected = self.split_response(analysis or '', filenames)
+                self.metrics.since('parse', start, filenames)
+                if rejected:
+                    self.progress_updated.emit(
+                        self.percent_done(),
+                        f"Ignored response blocks for unexpected files: {', '.join(rejected)}"
+                    )
+            except Exception as e:
+                self.error_occurred.emit(f"Error analyzing images: {str(e)}")
+
+        for position, filename, payload, key in pending:
+            result = None
+            if filename in blocks:
+                start = time.perf_counter()
+                result = self.parse_response(filename, blocks[filename])
+                self.metrics.since('parse', start, [filename])
+            if result and result['Title'] and result['Keywords']:
+                self.store_result(key, result)
+                results[position] = result
+            else:
+                # Fall back to a single-image request for anything not mapped
+                results[position] = self.analyze_file(filename, payload)
+        return results
+
+    def group_duplicates(self, pending):
+        """Keep one image per cluster of near-duplicates.
+
+        Returns the representatives to analyze and, for each representative
+        filename, the ``(index, filename)`` members that reuse its row.
+        """
+        method = self.settings.get('dedupe_hash', 'dhash')
+        self.progress_updated.emit(
+            self.percent_done(),
+            f"Hashing {len(pending)} images to find near-duplicates..."
+        )
+
+        hashes = []
+        representatives = []
+        workers = min(self.settings.get('preprocess_workers', os.cpu_count() or 1), len(pending))
+        options = self.preprocess_options()
+        # Huge files are hashed from a band-by-band reduction, a few at a time
+        slots = large_image_slots(self.settings.get('large_images_in_flight', DEFAULT_LARGE_IN_FLIGHT))
+        for item, value, error in process_ahead(
+                image_hash, pending,
+                lambda item: (os.path.join(self.input_folder, item[1]), method, options['raster_cache'],
+                              options['memory_budget_mb'], options['max_image_pixels']),
+                workers=workers, initializer=set_large_image_slots, initargs=(slots,)):
+            if error:
+                # Unreadable here, so analyzed (and reported) on its own
+                representatives.append(item)
+            else:
+                hashes.append((item, value))
+
+        groups = group_near_duplicates(hashes, self.settings.get('dedupe_threshold', 6))
+        representatives = sorted(representatives + list(groups))
+        duplicates = {filename: members for (_, filename), members in groups.items() if members}
+        self.progress_updated.emit(
+            self.percent_done(),
+            f"Near-duplicates: {len(pending)} images in {len(representatives)} groups, "
+            f"up to {len(pending) - len(representatives)} API calls saved"
+        )
+        return representatives, duplicates
+
+    def open_output(self):
+        """The CSV writer rows go to, and the path reported when done"""
+        csv_path = os.path.join(self.output_folder, f'{self.output_name}.csv')
+        return csv_path, StreamingCSVWriter(csv_path, self.csv_columns, sep=self.csv_sep)
+
+    def percent_done(self):
+        """Progress against the files found so far, until the walk completes"""
+        found = self.discovery.found if self.discovery else 0
+        if not found:
+            return 0
+        percent = int(self.processed_count / found * 100)
+        return percent if self.discovery.finished else min(99, percent)
+
+    def run(self):
+        for _ in self.iter_results():
+            pass
+
+    def iter_results(self):
+        """Analyze the folder, yielding each newly analyzed row.
+
+        Rows come in completion order and are also written to the CSV and
+        journal. Set ``stop_requested`` to stop after the requests in
+        flight; closing the generator early discards the CSV, but the
+        journal keeps every finished row for a resumed run.
+        """
+        self.metrics = RunMetrics(self.metrics.pipeline)
+        self.flagged = {}
+        try:
+            # Files stream in from a background walk of the input tree
+            self.discovery = FileDiscovery(
+                self.input_folder, IMAGE_EXTENSIONS,
+                include=self.settings.get('include_patterns'),
+                exclude=self.settings.get('exclude_patterns'),
+                recursive=self.settings.get('recursive_input', True),
+                onerror=lambda path, e: self.progress_updated.emit(
+                    self.percent_done(), f"Skipped unreadable folder {path}: {str(e)}"
+                )
+            ).start()
+            image_files = iter(self.discovery)
+            first_file = next(image_files, None)
+            if first_file is None:
+                self.error_occurred.emit("No image files found in the input folder")
+                return
+            image_files = itertools.chain([first_file], image_files)
+
+            # Create output folder if it doesn't exist
+            os.makedirs(self.output_folder, exist_ok=True)
+
+            if self.seed_csv and self.cache:
+                self.seed_cache(self.seed_csv)
+
+            # Every finished image is journaled, so a crashed run can resume
+            journal = RunJournal(os.path.join(self.output_folder, f'{self.output_name}.journal'))
+            completed = journal.load() if self.resume else {}
+            journal.open(resume=self.resume)
+
+            # Rows are streamed to the CSV in input order as they finish
+            csv_path, writer = self.open_output()
+            ordered = OrderedRowWriter(writer)
+
+            # Title and keywords are written into the source files as rows finish
+            embedder = open_metadata_writer(
+                self.settings,
+                on_error=lambda path, e: self.error_occurred.emit(
+                    f"Error writing metadata to {os.path.basename(path)}: {str(e)}"
+                ),
+                metrics=self.metrics
+            )
+
+            # Progress tracking
+            completed_files = []
+            self.processed_count = 0
+
+            def pending_files():
+                # Files a resumed run already finished are written as found
+                for index, filename in enumerate(image_files):
+                    if filename in completed:
+                        ordered.add(index, output_row(completed[filename]))
+                        completed_files.append(filename)
+                        self.processed_count += 1
+                    else:
+                        yield index, filename
+
+            pending = pending_files()
+            if completed:
+                self.progress_updated.emit(
+                    0, f"Resuming: {len(completed)} images already analyzed"
+                )
+
+            # Analyze one representative per cluster of near-duplicates,
+            # which needs the whole tree walked first
+            duplicates = {}
+            if self.settings.get('dedupe_enabled', False):
+                pending = list(pending)
+                if len(pending) > 1:
+                    pending, duplicates = self.group_duplicates(pending)
+            reused = 0
+            total_files = None
+
+            # Keep up to max_concurrent_requests calls in flight
+            concurrency = self.settings.get('max_concurrent_requests', 1)
+            engine = ConcurrentRequestEngine(
+                concurrency,
+                stop_check=lambda: self.stop_requested
+            )
+
+            # In multi-image mode each request carries batch_size images
+            batch_size = 1
+            if self.settings.get('multi_image_requests', False):
+                batch_size = max(1, self.settings.get('batch_size', 5))
+
+            # Decode and resize in worker processes ahead of the requests
+            workers = self.settings.get('preprocess_workers', os.cpu_count() or 1)
+            if isinstance(pending, list):
+                workers = min(workers, len(pending))
+            pipeline = PreprocessPipeline(
+                workers=workers,
+                prefetch=concurrency * batch_size + 2 * workers,
+                options=self.preprocess_options(),
+                large_in_flight=self.settings.get('large_images_in_flight', DEFAULT_LARGE_IN_FLIGHT)
+            )
+            preprocessed = pipeline.imap(
+                pending, lambda item: os.path.join(self.input_folder, item[1])
+            )
+
+            try:
+                for _, batch, batch_results in engine.map(
+                        self.analyze_batch, batched(preprocessed, batch_size)):
+                    for ((index, filename), _, _), result in zip(batch, batch_results):
+                        start = time.perf_counter()
+                        ordered.add(index, output_row(result) if result else None)
+                        if result:
+                            journal.record(filename, result)
+                            if embedder:
+                                embedder.submit(os.path.join(self.input_folder, filename), self.embedded_row(result))
+                            self.metrics.since('write', start, [filename])
+                            self.metrics.count('files_analyzed')
+                            completed_files.append(filename)
+                            self.processed_count += 1
+                            self.progress_updated.emit(
+                                self.percent_done(),
+                                f"Successfully analyzed {filename}"
+                            )
+                            yield output_row(result)
+                        else:
+                            self.metrics.count('files_failed')
+
+                        # Near-duplicates get a copy of the representative's row
+                        for member_index, member in duplicates.get(filename, []):
+                            copy = dict(result, Filename=member) if result else None
+                            ordered.add(member_index, output_row(copy) if copy else None)
+                            if copy:
+                                journal.record(member, copy)
+                                if embedder:
+                                    embedder.submit(os.path.join(self.input_folder, member), self.embedded_row(copy))
+                                completed_files.append(member)
+                                self.processed_count += 1
+                                reused += 1
+                                self.metrics.count('duplicates_reused')
+                                self.progress_updated.emit(
+                                    self.percent_done(),
+                                    f"Copied metadata of {filename} to near-duplicate {member}"
+                                )
+                                yield output_row(copy)
+
+                    if total_files is None and self.discovery.finished:
+                        total_files = self.discovery.total
+                        self.progress_updated.emit(self.percent_done(), f"Found {total_files} images")
+                ordered.finish()
+            except BaseException:
+                # Including a generator closed before the end
+                writer.abort()
+                raise
+            finally:
+                preprocessed.close()
+                journal.close()
+                self.discovery.stop()
+                # Waits for the writes still queued
+                embedded = embedder.close() if embedder else None
+
+            if self.stop_requested:
+                self.progress_updated.emit(
+                    self.percent_done(),
+                    "Analysis stopped by user."
+                )
+
+            if duplicates:
+                self.progress_updated.emit(
+                    self.percent_done(),
+                    f"Near-duplicates: reused metadata for {reused} images, saving {reused} API calls"
+                )
+
+            if self.metrics.counter('requests'):
+                self.progress_updated.emit(
+                    self.percent_done(),
+                    f"Sent {self.metrics.counter('requests')} requests with "
+                    f"{self.metrics.counter('bytes_sent') / 1024 / 1024:.1f} MB of image payload"
+                )
+
+            if embedded:
+                self.progress_updated.emit(
+                    self.percent_done(),
+                    f"Metadata written into {embedded['embedded']} files, "
+                    f"{embedded['sidecar']} XMP sidecars, {embedded['failed']} failed"
+                )
+
+            # Rows the local repair could not fix, for a look before uploading.
+            # Named after the run, so a combined run lists its rows for both
+            # CSVs without replacing the list of an Adobe Stock only run
+            if self.flagged:
+                self.metrics.count('rows_flagged', len(self.flagged))
+                flagged_csv = flagged_path(os.path.join(self.output_folder, f'{self.output_name}.csv'))
+                try:
+                    write_flagged(flagged_csv, sorted(self.flagged.items()))
+                    self.progress_updated.emit(
+                        self.percent_done(),
+                        f"{len(self.flagged)} rows need review, listed in {os.path.basename(flagged_csv)}"
+                    )
+                except OSError as e:
+                    self.error_occurred.emit(f"Error saving flagged rows: {str(e)}")
+
+            # Stage timings as JSON and for Prometheus (node exporter textfile)
+            try:
+                report = self.metrics.write(self.output_folder)
+                if report['stages']:
+                    self.progress_updated.emit(self.percent_done(), stage_summary(report))
+            except OSError as e:
+                self.error_occurred.emit(f"Error saving metrics: {str(e)}")
+
+            # Save results
+            if writer.rows_written:
+                writer.close()
+                
+                # Save progress file
+                progress_path = os.path.join(self.output_folder, f'{self.output_name}_progress.json')
+                with open(progress_path, 'w') as f:
+                    json.dump({
+                        'completed': completed_files,
+                        'total': self.discovery.found,
+                        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+                    }, f)
+
+                self.analysis_complete.emit(csv_path)
+            else:
+                writer.abort()
+                self.error_occurred.emit("No data was processed successfully")
+
+        except Exception as e:
+            self.error_occurred.emit(f"An error occurred: {str(e)}")
+
+    def validate_api_key(self):
+        if not self.api_key:
+            return False
+        # Add additional validation if needed
+        return True
+
+    def estimate_processing_time(self, file_count):
+        # Rough estimation based on the request quota
+        requests_per_minute = self.settings.get('requests_per_minute', 15)
+        time_per_image = 5  # 5 seconds for processing
+        concurrency = self.settings.get('max_concurrent_requests', 1)
+
+        return max(file_count * 60 / requests_per_minute,
+                   file_count * time_per_image / concurrency)
+
+    def check_output_path(self):
+        try:
+            os.makedirs(self.output_folder, exist_ok=True)
+            test_file = os.path.join(self.output_folder, 'test.txt')
+            with open(test_file, 'w') as f:
+                f.write('test')
+            os.remove(test_file)
+            return True
+        except Exception:
+            return False
+        
+    def get_supported_formats(self):
+        """Return supported image formats"""
+        return IMAGE_EXTENSIONS
+
+    def validate_file(self, file_path):
+        """Validate if file is supported"""
+        return file_path.lower().endswith(self.get_supported_formats())
+    
+    
+    
@@ -0,0 +1,141 @@
+import io
+import time
+from PIL import Image
+from large_images import (
+    open_image, is_large, reduce_large_image, large_image_slot, to_rgb,
+    DEFAULT_MEMORY_BUDGET_MB, DEFAULT_MAX_IMAGE_PIXELS
+)
+from vector_images import is_vector, rasterize_cached
+
+# Longest side of the image sent to the API
+MAX_IMAGE_SIZE = 1024
+
+PAYLOAD_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+}
+
+
+class ImagePayload:
+    """Encoded image bytes exactly as they are sent to the API.
+
+    Built once per image and reused for every retry and for cache hashing.
+    """
+
+    def __init__(self, data, mime_type, size, timings=None):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        # Seconds spent on each preprocessing step, for the run metrics
+        self.timings = timings or {}
+
+    def as_part(self):
+        # Inline blob part understood by GenerativeModel.generate_content
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+
+def encode_payload(img, payload_format='JPEG', payload_quality=90):
+    """Compress a preprocessed image into an ImagePayload"""
+    payload_format = payload_format.upper()
+    buffer = io.BytesIO()
+    if payload_format == 'PNG':
+        img.save(buffer, format='PNG', optimize=False)
+    else:
+        img.save(buffer, format=payload_format, quality=payload_quality)
+    return ImagePayload(buffer.getvalue(), PAYLOAD_MIME_TYPES[payload_format], img.size)
+
+
+def target_size(size, max_size=MAX_IMAGE_SIZE):
+    """Size an image of ``size`` is shrunk to, or None if it already fits"""
+    if max(size) <= max_size:
+        return None
+    ratio = max_size / max(size)
+    return tuple([int(x * ratio) for x in size])
+
+
+def shrink_array(pixels, max_size=MAX_IMAGE_SIZE):
+    """Shrink an OpenCV/NumPy image with area averaging"""
+    import cv2
+
+    height, width = pixels.shape[:2]
+    new_size = target_size((width, height), max_size)
+    if not new_size:
+        return pixels
+    return cv2.resize(pixels, new_size, interpolation=cv2.INTER_AREA)
+
+
+def preprocess_image(image_path, max_size=MAX_IMAGE_SIZE, fast=False, backend='pillow', timings=None,
+                     memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_image_pixels=DEFAULT_MAX_IMAGE_PIXELS,
+                     raster_cache=None):
+    """Open an image, convert it to RGB and shrink it to fit max_size.
+
+    With ``fast`` JPEGs are DCT-scaled while decoding and the remaining
+    reduction uses a box reduce plus bicubic (``backend='pillow'``) or
+    OpenCV's INTER_AREA (``backend='opencv'``) instead of a full LANCZOS.
+    Images that would take more than ``memory_budget_mb`` decoded are
+    reduced band by band (see large_images), and only images above
+    ``max_image_pixels`` are refused. SVG, EPS, AI and PDF files are
+    rendered straight at ``max_size``, through the ``raster_cache`` folder.
+    Seconds spent decoding and resizing are stored in ``timings``, if given.
+    """
+    if is_vector(image_path):
+        return rasterize_cached(image_path, max_size, raster_cache, timings)
+
+    start = time.perf_counter()
+    # Open and process image
+    img = open_image(image_path, max_image_pixels)
+    new_size = target_size(img.size, max_size)
+
+    large = new_size is not None and is_large(img, memory_budget_mb)
+    if large:
+        # Never decoded at full size, and only a few at a time
+        with large_image_slot():
+            img = reduce_large_image(img, new_size, memory_budget_mb)
+    else:
+        if fast and new_size:
+            # Ask the JPEG decoder for 1/2, 1/4 or 1/8 scale, still >= new_size
+            img.draft('RGB', new_size)
+        img.load()
+    decoded = time.perf_counter()
+
+    # Convert to RGB if needed
+    img = to_rgb(img)
+
+    # Resize if too large
+    if new_size:
+        if not fast:
+            img = img.resize(new_size, Image.LANCZOS)
+        elif backend == 'opencv':
+            import numpy as np
+            img = Image.fromarray(shrink_array(np.asarray(img), max_size))
+        else:
+            img = img.resize(new_size, Image.BICUBIC, reducing_gap=2.0)
+
+    if timings is not None:
+        timings['large_decode' if large else 'decode'] = decoded - start
+        timings['resize'] = time.perf_counter() - decoded
+    return img
+
+
+def prepare_payload(image_path, max_size=MAX_IMAGE_SIZE, fast=False, backend='pillow',
+                    payload_format='JPEG', payload_quality=90,
+                    memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_image_pixels=DEFAULT_MAX_IMAGE_PIXELS,
+                    raster_cache=None):
+    """Preprocess an image file and encode the request payload in one step.
+
+    The payload's ``timings`` hold the seconds spent in each step.
+    """
+    timings = {}
+    img = preprocess_image(image_path, max_size, fast=fast, backend=backend, timings=timings,
+                           memory_budget_mb=memory_budget_mb, max_image_pixels=max_image_pixels,
+                           raster_cache=raster_cache)
+    start = time.perf_counter()
+    payload = encode_payload(img, payload_format, payload_quality)
+    timings['encode'] = time.perf_counter() - start
+    payload.timings = timings
+    return payload
@@ -0,0 +1,389 @@
+import io
+import math
+import multiprocessing
+import struct
+import warnings
+import zlib
+from contextlib import contextmanager
+from PIL import Image, TiffImagePlugin, TiffTags
+
+# Memory one image may take while being decoded, before the banded path is used
+DEFAULT_MEMORY_BUDGET_MB = 512
+# Refuse images above this many pixels, Pillow's own limit is ~89 MP
+DEFAULT_MAX_IMAGE_PIXELS = 2_000_000_000
+# Large images decoded at the same time, across all worker processes
+DEFAULT_LARGE_IN_FLIGHT = 2
+
+MB = 1024 * 1024
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Channels per PNG colour type; only 8-bit samples and 16-bit gray are banded
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Tags describing the pixels of a stripped TIFF, copied into each band
+TIFF_BAND_TAGS = (
+    256, 258, 259, 262, 266, 277, 284, 317, 320, 338, 339, 347, 529, 530, 531, 532
+)
+STRIP_OFFSETS, ROWS_PER_STRIP, STRIP_BYTE_COUNTS = 273, 278, 279
+TILE_OFFSETS, PLANAR_CONFIGURATION = 324, 284
+
+# Set in worker processes by set_large_image_slots
+_slots = None
+
+
+def large_image_slots(count=DEFAULT_LARGE_IN_FLIGHT):
+    """Semaphore shared with worker processes through ``set_large_image_slots``"""
+    return multiprocessing.Semaphore(max(1, count))
+
+
+def set_large_image_slots(slots):
+    # ProcessPoolExecutor initializer
+    global _slots
+    _slots = slots
+
+
+@contextmanager
+def large_image_slot():
+    """Wait until fewer than the configured number of large images are decoding"""
+    if _slots is None:
+        yield
+        return
+    with _slots:
+        yield
+
+
+def open_image(image_path, max_pixels=DEFAULT_MAX_IMAGE_PIXELS):
+    """Image.open with Pillow's decompression-bomb limit replaced by ``max_pixels``.
+
+    Pillow warns above ~89 MP and refuses twice that, which rejects
+    legitimate panoramas and print scans. Its global limit is left alone,
+    as changing it around each open would race with the other threads:
+    the warning is silenced here and an image Pillow refuses is opened
+    again without its check. Opening only reads the header, so
+    ``max_pixels`` is checked before any pixel data is decoded. Images
+    Pillow decodes whole (tiled TIFFs, GIFs) are still held to its limit.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            img = Image.open(image_path)
+    except Image.DecompressionBombError:
+        img = open_unchecked(image_path)
+    if max_pixels and img.width * img.height > max_pixels:
+        img.close()
+        raise Image.DecompressionBombError(
+            f"Image size ({img.width}x{img.height} pixels) exceeds the limit of {max_pixels} pixels"
+        )
+    return img
+
+
+def open_unchecked(image_path):
+    """Image.open without the size check, trying each format plugin in turn"""
+    with open(image_path, 'rb') as f:
+        prefix = f.read(16)
+    Image.init()
+    for name in Image.ID:
+        factory, accept = Image.OPEN[name]
+        accepted = accept(prefix) if accept else True
+        # A string is a reason the plugin can't open the file
+        if not accepted or isinstance(accepted, str):
+            continue
+        try:
+            return factory(image_path)
+        except (SyntaxError, IndexError, TypeError, struct.error):
+            continue
+    raise Image.UnidentifiedImageError(f"cannot identify image file {image_path!r}")
+
+
+def decoded_bytes(img):
+    """Estimated memory of decoding ``img`` fully and converting it to RGB"""
+    if img.mode in ('1', 'L', 'P'):
+        per_pixel = 1
+    elif img.mode.startswith('I;16'):
+        per_pixel = 2
+    else:
+        per_pixel = 4
+    if img.mode != 'RGB':
+        # The RGB copy made by convert()
+        per_pixel += 4
+    return img.width * img.height * per_pixel
+
+
+def is_large(img, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    return decoded_bytes(img) > memory_budget_mb * MB
+
+
+def to_8bit(img):
+    """8-bit copy of a 16-bit grayscale image, other images unchanged.
+
+    16-bit grayscale opens as one of the ``I;16`` modes, or as ``I`` for
+    some formats, and convert() would clip it at 255 instead of scaling.
+    """
+    if img.mode == 'I' or img.mode.startswith('I;16'):
+        import numpy as np
+        pixels = np.asarray(img).astype(np.int32) >> 8
+        img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return img
+
+
+def to_rgb(img):
+    """Convert to RGB, scaling 16-bit grayscale down instead of clipping it"""
+    img = to_8bit(img)
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+
+def reduction_factor(size, min_size):
+    """Largest integer box reduction keeping at least twice ``min_size``"""
+    return max(1, min(size[0] // min_size[0], size[1] // min_size[1]) // 2)
+
+
+def reduce_large_image(img, min_size, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """RGB copy of ``img`` box-reduced to about twice ``min_size``.
+
+    The full-size image is never held in memory when the format allows it:
+    JPEGs are DCT-scaled while decoding, non-interlaced PNGs and stripped
+    TIFFs are decoded a band of rows at a time, each band reduced before
+    the next is read. Other images are decoded whole.
+    """
+    factor = reduction_factor(img.size, min_size)
+    if img.format == 'JPEG':
+        img.draft('RGB', (img.width // factor, img.height // factor))
+        img = to_rgb(img)
+        factor = reduction_factor(img.size, min_size)
+        return img.reduce(factor) if factor > 1 else img
+
+    bands = None
+    if img.format == 'PNG':
+        bands = png_bands(img, memory_budget_mb * MB)
+    elif img.format == 'TIFF':
+        bands = tiff_bands(img, memory_budget_mb * MB)
+    if bands is None:
+        img = to_rgb(img)
+        return img.reduce(factor) if factor > 1 else img
+
+    canvas = Image.new('RGB', (math.ceil(img.width / factor), math.ceil(img.height / factor)))
+    top = 0
+    carry = None
+    for band in bands:
+        band = to_rgb(band)
+        if carry is not None:
+            # Rows left over from the previous band, so boxes never straddle bands
+            joined = Image.new('RGB', (band.width, carry.height + band.height))
+            joined.paste(carry, (0, 0))
+            joined.paste(band, (0, carry.height))
+            band = joined
+        usable = band.height - band.height % factor
+        carry = None
+        if usable < band.height:
+            carry = band.crop((0, usable, band.width, band.height))
+            band = band.crop((0, 0, band.width, usable)) if usable else None
+        if band is not None:
+            reduced = band.reduce(factor)
+            del band
+            canvas.paste(reduced, (0, top))
+            top += reduced.height
+    if carry is not None:
+        canvas.paste(carry.reduce(factor), (0, top))
+    return canvas
+
+
+def rows_per_band(row_bytes, width, memory_budget):
+    # The raw rows are held up to three times while being repacked, the
+    # decoded band (4 bytes per pixel) up to three times while being cropped
+    return max(1, memory_budget // (3 * row_bytes + 12 * width))
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def read_png_chunks(f):
+    """Yield ``(type, data)`` for every chunk after the signature"""
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack('>I4s', header)
+        data = f.read(length)
+        f.read(4)
+        yield kind, data
+
+
+def png_bands(img, memory_budget):
+    """Decode a non-interlaced PNG as a series of smaller PNGs, or None.
+
+    The IDAT stream is inflated incrementally. Each band is re-wrapped as a
+    PNG of its own, with the original palette and transparency chunks and
+    the last unfiltered row of the previous band in front, so rows filtered
+    against the row above decode unchanged; that extra row is cropped off.
+    """
+    f = open(img.filename, 'rb')
+    if f.read(8) != PNG_SIGNATURE:
+        f.close()
+        return None
+    chunks = read_png_chunks(f)
+    kind, ihdr = next(chunks, (None, b''))
+    if kind != b'IHDR' or len(ihdr) != 13:
+        f.close()
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', ihdr)
+    supported = bit_depth == 8 and color_type in PNG_CHANNELS or bit_depth == 16 and color_type == 0
+    if interlace or not supported:
+        f.close()
+        return None
+
+    # Palette, transparency, gamma... everything the decoder needs before IDAT
+    header_chunks = []
+    first_idat = None
+    for kind, data in chunks:
+        if kind == b'IDAT':
+            first_idat = data
+            break
+        if kind != b'IEND':
+            header_chunks.append(png_chunk(kind, data))
+    if first_idat is None:
+        f.close()
+        return None
+
+    stride = 1 + width * PNG_CHANNELS[color_type] * bit_depth // 8
+    rows = rows_per_band(stride, width, memory_budget)
+
+    def idat_data():
+        yield first_idat
+        for kind, data in chunks:
+            if kind != b'IDAT':
+                return
+            yield data
+
+    def bands():
+        inflater = zlib.decompressobj()
+        compressed = idat_data()
+        previous_row = None
+        try:
+            for top in range(0, height, rows):
+                count = min(rows, height - top)
+                needed = count * stride
+                raw = bytearray()
+                while len(raw) < needed:
+                    data = inflater.unconsumed_tail or next(compressed, b'')
+                    if not data:
+                        raise ValueError("PNG image data is truncated")
+                    raw += inflater.decompress(data, needed - len(raw))
+                if previous_row is not None:
+                    raw[0:0] = b'\x00' + previous_row
+                band_ihdr = struct.pack('>II', width, count + (previous_row is not None)) + ihdr[8:]
+                idat = zlib.compress(raw, 0)
+                del raw
+                band = Image.open(io.BytesIO(b''.join([
+                    PNG_SIGNATURE,
+                    png_chunk(b'IHDR', band_ihdr),
+                    *header_chunks,
+                    png_chunk(b'IDAT', idat),
+                    png_chunk(b'IEND', b''),
+                ])))
+                del idat
+                band.load()
+                previous_row = png_row_bytes(band, band.height - 1)
+                if band.height > count:
+                    band = band.crop((0, 1, width, band.height))
+                yield band
+        finally:
+            f.close()
+
+    return bands()
+
+
+def png_row_bytes(img, y):
+    """One row of a decoded PNG band, unfiltered, as stored in the file"""
+    row = img.crop((0, y, img.width, y + 1))
+    if img.mode in ('L', 'LA', 'P', 'RGB', 'RGBA'):
+        return row.tobytes()
+    # 16-bit grayscale, stored big-endian
+    import numpy as np
+    return np.asarray(row).astype('>u2').tobytes()
+
+
+def tiff_bands(img, memory_budget):
+    """Decode a stripped TIFF as a series of smaller TIFFs, or None.
+
+    Consecutive strips are copied, still compressed, into an in-memory TIFF
+    with the original pixel format tags, which Pillow (libtiff for the
+    compressed ones) then decodes. Uncompressed strips are also split into
+    shorter ones, as scanners often write the whole image as one strip.
+    Tiled and planar TIFFs return None.
+    """
+    tags = img.tag_v2
+    if TILE_OFFSETS in tags or STRIP_OFFSETS not in tags or tags.get(PLANAR_CONFIGURATION, 1) != 1:
+        return None
+    offsets = tags[STRIP_OFFSETS]
+    byte_counts = tags.get(STRIP_BYTE_COUNTS)
+    if not byte_counts or len(byte_counts) != len(offsets):
+        return None
+    width, height = img.size
+    strip_rows = min(tags.get(ROWS_PER_STRIP, height), height)
+    bits = tags.get(258, 8)
+    bits = sum(bits) if isinstance(bits, tuple) else bits * tags.get(277, 1)
+    row_bytes = math.ceil(width * bits / 8)
+    band_rows = rows_per_band(row_bytes, width, memory_budget)
+
+    # (offset, byte count, rows) of every strip
+    strips = []
+    for index, (offset, count) in enumerate(zip(offsets, byte_counts)):
+        rows = min(strip_rows, height - index * strip_rows)
+        if tags.get(259, 1) == 1 and rows > band_rows:
+            for top in range(0, rows, band_rows):
+                part = min(band_rows, rows - top)
+                strips.append((offset + top * row_bytes, part * row_bytes, part))
+        else:
+            strips.append((offset, count, rows))
+
+    prefix = tags.prefix
+    big_endian = prefix == b'MM'
+    magic = prefix + (b'\x00\x2a' if big_endian else b'\x2a\x00')
+    pack = '>I' if big_endian else '<I'
+
+    def band_tiff(group):
+        data = []
+        with open(img.filename, 'rb') as f:
+            for offset, count, _ in group:
+                f.seek(offset)
+                data.append(f.read(count))
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(ifh=magic + struct.pack(pack, 8), prefix=prefix)
+        for tag in TIFF_BAND_TAGS:
+            if tag in tags:
+                ifd[tag] = tags[tag]
+                ifd.tagtype[tag] = tags.tagtype[tag]
+        ifd[257] = sum(rows for _, _, rows in group)
+        ifd[ROWS_PER_STRIP] = group[0][2]
+        # tobytes() moves the strip offsets past the directory it writes,
+        # so they are given relative to the pixel data that follows it
+        strip_offsets = []
+        position = 0
+        for strip in data:
+            strip_offsets.append(position)
+            position += len(strip)
+        ifd[STRIP_OFFSETS] = tuple(strip_offsets)
+        ifd.tagtype[STRIP_OFFSETS] = TiffTags.LONG
+        ifd[STRIP_BYTE_COUNTS] = tuple(len(strip) for strip in data)
+        ifd.tagtype[STRIP_BYTE_COUNTS] = TiffTags.LONG
+        return b''.join([magic, struct.pack(pack, 8), ifd.tobytes(8), *data])
+
+    def bands():
+        group = []
+        for strip in strips:
+            # Every strip of a band but the last has the same number of rows
+            if group and (sum(rows for _, _, rows in group) + strip[2] > band_rows
+                          or group[-1][2] != group[0][2]):
+                yield decode_tiff(band_tiff(group))
+                group = []
+            group.append(strip)
+        if group:
+            yield decode_tiff(band_tiff(group))
+
+    return bands()
+
+
+def decode_tiff(data):
+    band = Image.open(io.BytesIO(data))
+    band.load()
+    return band
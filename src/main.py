@@ -1,10 +1,10 @@
 import sys
 import os
 import traceback
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMessageBox, QStyleFactory
 from PyQt6.QtCore import Qt
 from ui import MainWindow
-from video_analyzer import VideoAnalyzer
 
 def setup_exception_handler():
     def exception_hook(exctype, value, traceback_obj):
@@ -54,4 +54,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Needed by the preprocess process pool in the frozen exe
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,256 @@
+import csv
+import os
+import re
+import tempfile
+from functools import lru_cache
+from itertools import repeat
+from platform_limits import PLATFORM_LIMITS, trim_title
+
+# Adobe Stock category names, by code
+CATEGORY_NAMES = {
+    1: 'Animals', 2: 'Buildings and Architecture', 3: 'Business', 4: 'Drinks',
+    5: 'The Environment', 6: 'States of Mind', 7: 'Food', 8: 'Graphic Resources',
+    9: 'Hobbies and Leisure', 10: 'Industry', 11: 'Landscape', 12: 'Lifestyle',
+    13: 'People', 14: 'Plants and Flowers', 15: 'Culture and Religion', 16: 'Science',
+    17: 'Social Issues', 18: 'Sports', 19: 'Technology', 20: 'Transport', 21: 'Travel',
+}
+
+# Plurals that are not the singular plus s, es or ies
+IRREGULAR_PLURALS = {
+    'leaves': 'leaf', 'wolves': 'wolf', 'knives': 'knife', 'wives': 'wife', 'lives': 'life',
+    'shelves': 'shelf', 'halves': 'half', 'loaves': 'loaf', 'calves': 'calf', 'scarves': 'scarf',
+    'thieves': 'thief', 'elves': 'elf', 'hooves': 'hoof', 'men': 'man', 'women': 'woman',
+    'children': 'child', 'mice': 'mouse', 'geese': 'goose', 'feet': 'foot', 'teeth': 'tooth',
+}
+
+# Common nouns of stock photo keywords, in the singular. A plural is only
+# made singular when the result is one of these, so verbs ("does"), names
+# and words that just end in s are left alone.
+COMMON_NOUNS = frozenset("""
+    animal ant ape bat bear bee beetle bird bison boar buffalo bull bunny butterfly calf camel
+    cat caterpillar cattle chick chicken cow crab crocodile crow deer dinosaur dog dolphin
+    donkey dove dragon dragonfly duck eagle eel elephant falcon fawn ferret fish flamingo fly
+    fox frog gazelle giraffe goat gorilla hamster hare hawk hedgehog hen heron hippo horse
+    hound insect jellyfish kangaroo kitten koala ladybug lamb leopard lion lizard llama lobster
+    monkey moth octopus ostrich otter owl ox panda parrot peacock pelican penguin pet pig
+    pigeon pony puppy rabbit raccoon rat reptile rhino robin rooster salmon seagull seal shark
+    sheep shrimp snail snake sparrow spider squid squirrel stork swan tiger toad turkey turtle
+    whale worm zebra
+    acorn berry blossom branch bud bush cactus clover daisy fern field flower forest garden
+    grass herb hill ivy lavender lily lotus meadow moss mushroom oak orchid palm petal pine
+    plant pond poppy rose root seed shrub stem sunflower thorn tree tulip vine weed wildflower
+    apple apricot avocado banana bean blueberry bread burger cake candy carrot cherry chili
+    cookie cracker croissant cucumber cupcake dessert donut drink dumpling egg fig fruit grape
+    grapefruit kiwi lemon lime mango melon muffin noodle nut olive onion orange pancake
+    pastry peach peanut pear pea pepper pie pineapple pizza plum potato pumpkin radish raspberry
+    sandwich sausage snack spice strawberry sweet taco tomato vegetable waffle walnut
+    apartment arch balcony barn bench bridge building cabin castle cathedral chimney church
+    city column cottage dome door fence fountain gate house hut lighthouse mansion monument
+    mosque office palace pillar roof ruin shop skyscraper stair statue street temple tent
+    tower town village wall window windmill
+    beach boulder canyon cave cliff cloud coast desert dune glacier island lake landscape
+    mountain ocean peak planet rainbow river rock sea shell shore sky snowflake star stone
+    storm stream sunset sunrise valley volcano wave waterfall
+    actor adult artist athlete baby boy bride businessman businesswoman chef couple customer
+    dancer doctor engineer family farmer friend girl groom guest kid lady musician nurse parent
+    player scientist senior soldier student teacher teenager tourist traveler twin worker
+    arm cheek ear eye face finger hand head heart knee leg lip nose shoulder toe
+    bag ball balloon basket bed bell bicycle bike boat book boot bottle bowl box brush bucket
+    bus button camera candle cap car card chair clock coin computer cup curtain desk diamond
+    dish doll dress drone drum engine fan flag fork frame gift glass glove guitar gun hat
+    headphone helmet jar jewel jug key keyboard kite knife lamp lantern laptop leaf lens letter
+    map mask mirror mug necklace needle newspaper notebook pan paper pen pencil phone piano
+    picture pillow pipe plane plate pot present rope ring robot rug ship shirt shoe sign sock
+    sofa spoon suitcase table tablet tag ticket tire tool towel toy train truck umbrella vase
+    wallet watch wheel wire
+    arrow badge banner border bubble circle cube dot element gradient icon illustration
+    line logo pattern shape sticker stripe symbol texture triangle vector
+    business chart contract dollar graph meeting project team
+    color crystal drop flame gas light ray shadow spark sparkle
+""".split())
+
+# Words ending in s that are not plurals, or mean something else than the singular
+UNCOUNTABLE = frozenset((
+    'news', 'series', 'species', 'means', 'headquarters', 'savings', 'thanks', 'congratulations',
+    'surroundings', 'belongings', 'earnings', 'customs', 'goods', 'remains', 'outskirts',
+    'clothes', 'jeans', 'pants', 'shorts', 'trousers', 'pajamas', 'leggings', 'tights',
+    'scissors', 'glasses', 'sunglasses', 'eyeglasses', 'goggles', 'binoculars', 'headphones',
+    'earphones', 'stairs', 'outdoors', 'sports', 'arms', 'spirits', 'greens',
+))
+
+# Numbering, bullets and hashtags models put in front of keywords
+KEYWORD_PREFIX = re.compile(r'^(?:\d+[.)]\s*|[-*•#]+\s*)+')
+QUOTES = '"\'`“”‘’'
+
+
+def singular(word):
+    """Singular of a lowercase plural noun, or the word itself if it is not one"""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) < 4 or word[-1] != 's' or word in UNCOUNTABLE:
+        return word
+    # boats, boxes, berries; the first one that is a known noun wins
+    candidates = [word[:-1]]
+    if word.endswith('es'):
+        candidates.append(word[:-2])
+    if word.endswith('ies'):
+        candidates.append(word[:-3] + 'y')
+    for candidate in candidates:
+        if candidate in COMMON_NOUNS:
+            return candidate
+    return word
+
+
+@lru_cache(maxsize=65536)
+def normalize_keyword(keyword, singularize=False):
+    """One keyword without numbering, quotes and extra spaces, its case kept.
+
+    With ``singularize`` a single lowercase word is made singular; phrases
+    ("los angeles") and capitalized words (names) are never changed.
+    Results are cached: a result set repeats the same few thousand
+    keywords over and over.
+    """
+    keyword = KEYWORD_PREFIX.sub('', keyword.strip().strip(QUOTES).strip())
+    keyword = ' '.join(keyword.strip(QUOTES + '.').split())
+    if singularize and keyword.isalpha() and keyword.islower():
+        keyword = singular(keyword)
+    return keyword
+
+
+def repair_keywords(keywords, limit, singularize=False):
+    """Deduplicated, normalized keyword list as a string, at most ``limit`` long.
+
+    Accepts a comma separated string or a list, keeping the model's order.
+    Keywords differing only in case count as one, the first spelling is kept.
+    """
+    if isinstance(keywords, str):
+        # Some answers use semicolons or one keyword per line
+        keywords = keywords.replace(';', ',').replace('\n', ',').split(',')
+    else:
+        keywords = [str(keyword) for keyword in keywords]
+    unique = {}
+    for keyword in map(normalize_keyword, keywords, repeat(singularize)):
+        if keyword:
+            unique.setdefault(keyword.casefold(), keyword)
+    return ', '.join(list(unique.values())[:limit])
+
+
+def repair_title(title, limit):
+    """A title without quotes or markdown, cut at a word boundary"""
+    title = ' '.join(str(title).replace('**', '').split()).strip(QUOTES).strip()
+    return trim_title(title, limit)
+
+
+def category_lookup():
+    names = {}
+    for code, name in CATEGORY_NAMES.items():
+        name = name.lower()
+        names[name] = code
+        names[name.replace(' and ', ' & ')] = code
+        if name.startswith('the '):
+            names[name[4:]] = code
+    return names
+
+
+CATEGORY_LOOKUP = category_lookup()
+
+
+def parse_category(value):
+    """Category code 1-21 from a number, "8. Graphic Resources" or a name; None if neither"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if value in CATEGORY_NAMES else None
+    text = str(value or '').strip()
+    number = re.search(r'\d+', text)
+    if number and int(number.group()) in CATEGORY_NAMES:
+        return int(number.group())
+    name = ' '.join(re.sub(r'[^a-z& ]', ' ', text.lower()).split())
+    return CATEGORY_LOOKUP.get(name)
+
+
+def repair_row(row, platform, singularize=False):
+    """Fix a row's title, keywords and category for ``platform``.
+
+    Returns the repaired copy and the problems it could not fix: an empty
+    title, too few keywords or an unknown category, which is then left
+    empty. Only those need another look, or another request.
+    """
+    limits = PLATFORM_LIMITS[platform]
+    row = dict(row)
+    problems = []
+    row['Title'] = repair_title(row.get('Title', ''), limits['title'])
+    if not row['Title']:
+        problems.append("empty title")
+    row['Keywords'] = repair_keywords(row.get('Keywords', ''), limits['keywords'], singularize)
+    count = row['Keywords'].count(',') + 1 if row['Keywords'] else 0
+    if count < limits['min_keywords']:
+        problems.append(f"{count} keywords")
+    if 'Category' in row:
+        code = parse_category(row['Category'])
+        if code is None:
+            problems.append(f"unknown category {str(row['Category']).strip()!r}")
+            row['Category'] = ''
+        else:
+            row['Category'] = str(code)
+    return row, problems
+
+
+def repair_rows(rows, platform, singularize=False):
+    """``repair_row`` over a result set; returns the rows and ``[(filename, problems)]``"""
+    repaired = []
+    flagged = []
+    for row in rows:
+        row, problems = repair_row(row, platform, singularize)
+        repaired.append(row)
+        if problems:
+            flagged.append((row.get('Filename', ''), problems))
+    return repaired, flagged
+
+
+def flagged_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '_flagged.csv'
+
+
+def write_flagged(path, flagged):
+    """List the rows that need review, one per line with what is wrong"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(['Filename', 'Problems'])
+        for filename, problems in flagged:
+            writer.writerow([filename, '; '.join(problems)])
+
+
+def repair_csv(path, platform=None, singularize=False):
+    """Repair an exported CSV in place.
+
+    The platform and separator are taken from the header when not given:
+    Freepik files are separated by semicolons and have a Prompt column.
+    Rows that still need review are listed in ``<name>_flagged.csv``.
+    Returns the number of rows and the flagged ones.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = f.readline()
+        sep = ';' if header.count(';') > header.count(',') else ','
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=sep)
+        fieldnames = reader.fieldnames
+        if not fieldnames or 'Title' not in fieldnames or 'Keywords' not in fieldnames:
+            raise ValueError(f"{os.path.basename(path)} has no Title and Keywords columns")
+        rows = list(reader)
+    if platform is None:
+        platform = 'freepik' if 'Prompt' in fieldnames else 'adobe'
+
+    rows, flagged = repair_rows(rows, platform, singularize)
+    fd, temp_path = tempfile.mkstemp(suffix='.csv', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=sep, lineterminator=os.linesep)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    if flagged:
+        write_flagged(flagged_path(path), flagged)
+    return len(rows), flagged
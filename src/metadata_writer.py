@@ -0,0 +1,412 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import piexif
+from platform_limits import split_keywords
+
+# Files written at the same time; the work is disk I/O, so threads suffice
+DEFAULT_METADATA_WORKERS = 8
+# Bytes read to find the JPEG header segments, almost always enough
+HEADER_READ = 256 * 1024
+
+XMP_NAMESPACES = {
+    'x': 'adobe:ns:meta/',
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+}
+# Prefixes kept when existing XMP is written back; namespaces not listed
+# here are kept too, under generated ns0, ns1... prefixes
+KNOWN_XMP_NAMESPACES = {
+    'xmp': 'http://ns.adobe.com/xap/1.0/',
+    'xmpMM': 'http://ns.adobe.com/xap/1.0/mm/',
+    'xmpRights': 'http://ns.adobe.com/xap/1.0/rights/',
+    'xmpDM': 'http://ns.adobe.com/xmp/1.0/DynamicMedia/',
+    'stEvt': 'http://ns.adobe.com/xap/1.0/sType/ResourceEvent#',
+    'stRef': 'http://ns.adobe.com/xap/1.0/sType/ResourceRef#',
+    'photoshop': 'http://ns.adobe.com/photoshop/1.0/',
+    'tiff': 'http://ns.adobe.com/tiff/1.0/',
+    'exif': 'http://ns.adobe.com/exif/1.0/',
+    'exifEX': 'http://cipa.jp/exif/1.0/',
+    'aux': 'http://ns.adobe.com/exif/1.0/aux/',
+    'crs': 'http://ns.adobe.com/camera-raw-settings/1.0/',
+    'Iptc4xmpCore': 'http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/',
+    'Iptc4xmpExt': 'http://iptc.org/std/Iptc4xmpExt/2008-02-29/',
+    'plus': 'http://ns.useplus.org/ldf/xmp/1.0/',
+}
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+XMP_PACKET_BEGIN = '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+XMP_PACKET_END = '\n<?xpacket end="w"?>'
+PNG_XMP_KEYWORD = b'XML:com.adobe.xmp'
+
+PHOTOSHOP_HEADER = b'Photoshop 3.0\x00'
+IPTC_RESOURCE = 0x0404
+# IPTC-IIM datasets as (record, dataset), and the longest values allowed in bytes
+IPTC_CHARSET = (1, 90)
+IPTC_VERSION = (2, 0)
+IPTC_OBJECT_NAME = (2, 5)
+IPTC_KEYWORDS = (2, 25)
+IPTC_CAPTION = (2, 120)
+IPTC_LIMITS = {IPTC_OBJECT_NAME: 64, IPTC_KEYWORDS: 64, IPTC_CAPTION: 2000}
+
+APP1, APP13, SOS = 0xE1, 0xED, 0xDA
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Registered once: ElementTree's prefix map is global, shared by all threads
+for _prefix, _uri in {**XMP_NAMESPACES, **KNOWN_XMP_NAMESPACES}.items():
+    ET.register_namespace(_prefix, _uri)
+
+
+def qualified(name):
+    prefix, local = name.split(':')
+    return f'{{{XMP_NAMESPACES[prefix]}}}{local}'
+
+
+def build_xmp(title, keywords, existing=None):
+    """XMP packet with dc:title, dc:description and dc:subject set.
+
+    Everything else in ``existing`` (rights, camera data, edit history) is
+    kept; a packet that does not parse is replaced.
+    """
+    root = None
+    if existing:
+        try:
+            text = existing.decode('utf-8') if isinstance(existing, bytes) else existing
+            text = text[text.find('<x:xmpmeta'):text.rfind('</x:xmpmeta>') + len('</x:xmpmeta>')]
+            root = ET.fromstring(text)
+        except (ET.ParseError, UnicodeDecodeError):
+            root = None
+    if root is None or root.find(qualified('rdf:RDF')) is None:
+        root = ET.Element(qualified('x:xmpmeta'))
+        ET.SubElement(root, qualified('rdf:RDF'))
+    rdf = root.find(qualified('rdf:RDF'))
+
+    descriptions = rdf.findall(qualified('rdf:Description'))
+    for description in descriptions:
+        for name in ('dc:title', 'dc:description', 'dc:subject'):
+            for element in description.findall(qualified(name)):
+                description.remove(element)
+            description.attrib.pop(qualified(name), None)
+    if descriptions:
+        description = descriptions[0]
+    else:
+        description = ET.SubElement(rdf, qualified('rdf:Description'), {qualified('rdf:about'): ''})
+
+    for name in ('dc:title', 'dc:description'):
+        alt = ET.SubElement(ET.SubElement(description, qualified(name)), qualified('rdf:Alt'))
+        item = ET.SubElement(alt, qualified('rdf:li'), {'xml:lang': 'x-default'})
+        item.text = title
+    bag = ET.SubElement(ET.SubElement(description, qualified('dc:subject')), qualified('rdf:Bag'))
+    for keyword in keywords:
+        ET.SubElement(bag, qualified('rdf:li')).text = keyword
+
+    return XMP_PACKET_BEGIN + ET.tostring(root, encoding='unicode') + XMP_PACKET_END
+
+
+def truncate_utf8(text, limit):
+    """UTF-8 bytes of ``text``, cut to ``limit`` without splitting a character"""
+    return text.encode('utf-8')[:limit].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def iptc_dataset(record, dataset, value):
+    return struct.pack('>BBBH', 0x1C, record, dataset, len(value)) + value
+
+
+def parse_iptc(data):
+    """``((record, dataset), value)`` pairs of an IPTC-IIM block"""
+    datasets = []
+    position = 0
+    while position + 5 <= len(data) and data[position] == 0x1C:
+        record, dataset, length = struct.unpack('>BBH', data[position + 1:position + 5])
+        datasets.append(((record, dataset), data[position + 5:position + 5 + length]))
+        position += 5 + length
+    return datasets
+
+
+def build_iptc(title, keywords, existing=b''):
+    """IPTC-IIM block in UTF-8 with the title, caption and keywords replaced"""
+    replaced = {IPTC_CHARSET, IPTC_VERSION, IPTC_OBJECT_NAME, IPTC_KEYWORDS, IPTC_CAPTION}
+    datasets = [
+        (IPTC_CHARSET, b'\x1b%G'),
+        (IPTC_VERSION, b'\x00\x04'),
+        (IPTC_OBJECT_NAME, truncate_utf8(title, IPTC_LIMITS[IPTC_OBJECT_NAME])),
+        (IPTC_CAPTION, truncate_utf8(title, IPTC_LIMITS[IPTC_CAPTION])),
+    ]
+    datasets += [(IPTC_KEYWORDS, truncate_utf8(keyword, IPTC_LIMITS[IPTC_KEYWORDS])) for keyword in keywords]
+    datasets += [(key, value) for key, value in parse_iptc(existing) if key not in replaced]
+    # Datasets have to be in record order
+    datasets.sort(key=lambda item: item[0][0])
+    return b''.join(iptc_dataset(record, dataset, value) for (record, dataset), value in datasets)
+
+
+def parse_photoshop_resources(data):
+    """``(id, name, data)`` of every 8BIM image resource"""
+    resources = []
+    position = 0
+    while data[position:position + 4] == b'8BIM':
+        resource_id = struct.unpack('>H', data[position + 4:position + 6])[0]
+        name_length = data[position + 6]
+        # The Pascal name, length byte included, is padded to an even size
+        name_end = position + 6 + (name_length + 2) // 2 * 2
+        name = data[position + 6:name_end]
+        size = struct.unpack('>I', data[name_end:name_end + 4])[0]
+        resources.append((resource_id, name, data[name_end + 4:name_end + 4 + size]))
+        position = name_end + 4 + size + size % 2
+    return resources
+
+
+def build_photoshop_block(title, keywords, existing=b''):
+    """APP13 payload with the IPTC resource replaced, other resources kept"""
+    resources = parse_photoshop_resources(existing[len(PHOTOSHOP_HEADER):]) if existing else []
+    old_iptc = b''.join(data for resource_id, _, data in resources if resource_id == IPTC_RESOURCE)
+    iptc = build_iptc(title, keywords, old_iptc)
+    resources = [resource for resource in resources if resource[0] != IPTC_RESOURCE]
+    resources.append((IPTC_RESOURCE, b'\x00\x00', iptc))
+    block = [PHOTOSHOP_HEADER]
+    for resource_id, name, data in resources:
+        block.append(b'8BIM' + struct.pack('>H', resource_id) + name + struct.pack('>I', len(data)) + data)
+        if len(data) % 2:
+            block.append(b'\x00')
+    return b''.join(block)
+
+
+def build_exif(title, keywords, existing=None):
+    """EXIF block with ImageDescription and the Windows title and keywords set"""
+    exif = piexif.load(existing) if existing else {'0th': {}, 'Exif': {}, 'GPS': {}, '1st': {}, 'thumbnail': None}
+    exif['0th'][piexif.ImageIFD.ImageDescription] = title.encode('utf-8')
+    exif['0th'][piexif.ImageIFD.XPTitle] = (title + '\x00').encode('utf-16-le')
+    exif['0th'][piexif.ImageIFD.XPKeywords] = ('; '.join(keywords) + '\x00').encode('utf-16-le')
+    return piexif.dump(exif)
+
+
+def jpeg_segments(header):
+    """``(marker, payload, raw bytes)`` of the segments before the scan, and where the scan starts.
+
+    Raises IndexError or struct.error if ``header`` ends before the scan.
+    """
+    if header[:2] != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+    segments = []
+    position = 2
+    while True:
+        if header[position] != 0xFF:
+            raise ValueError("Corrupt JPEG header")
+        start = position
+        while header[position] == 0xFF:
+            position += 1
+        marker = header[position]
+        position += 1
+        if marker == SOS:
+            return segments, start
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # No length and no payload
+            segments.append((marker, b'', header[start:position]))
+            continue
+        length = struct.unpack('>H', header[position:position + 2])[0]
+        if position + length > len(header):
+            raise IndexError("JPEG header continues past the data read")
+        segments.append((marker, header[position + 2:position + length], header[start:position + length]))
+        position += length
+
+
+def jpeg_segment(marker, payload):
+    if len(payload) > 65533:
+        raise ValueError(f"Metadata segment too large ({len(payload)} bytes)")
+    return struct.pack('>BBH', 0xFF, marker, len(payload) + 2) + payload
+
+
+def replace_file(path, write, mode_source=None):
+    """Call ``write(file)`` on a temporary copy, then swap it in for ``path``.
+
+    The copy gets the permissions of ``mode_source`` (by default ``path``)
+    but a new modification time, so sync and backup tools see the change.
+    """
+    folder, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=folder or '.')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            write(out)
+        shutil.copymode(mode_source or path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def embed_jpeg(path, title, keywords):
+    """Set EXIF, IPTC and XMP of a JPEG, copying the compressed image data as is"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_READ)
+        try:
+            segments, scan_start = jpeg_segments(header)
+        except (IndexError, struct.error):
+            header += f.read()
+            segments, scan_start = jpeg_segments(header)
+
+    exif = xmp = photoshop = None
+    kept = []
+    for marker, payload, raw in segments:
+        if marker == APP1 and payload.startswith(b'Exif\x00\x00'):
+            exif = exif or payload
+        elif marker == APP1 and payload.startswith(XMP_HEADER):
+            xmp = xmp or payload[len(XMP_HEADER):]
+        elif marker == APP13 and payload.startswith(PHOTOSHOP_HEADER):
+            photoshop = photoshop or payload
+        else:
+            kept.append((marker, raw))
+
+    metadata = [
+        jpeg_segment(APP1, build_exif(title, keywords, exif)),
+        jpeg_segment(APP1, XMP_HEADER + build_xmp(title, keywords, xmp).encode('utf-8')),
+        jpeg_segment(APP13, build_photoshop_block(title, keywords, photoshop)),
+    ]
+    # A JFIF APP0 has to stay right after SOI
+    leading = [raw for marker, raw in kept[:1] if marker == 0xE0]
+    rest = [raw for _, raw in kept[len(leading):]]
+
+    def write(out):
+        out.write(b'\xff\xd8')
+        out.write(b''.join(leading + metadata + rest))
+        with open(path, 'rb') as f:
+            f.seek(scan_start)
+            shutil.copyfileobj(f, out, 1024 * 1024)
+
+    replace_file(path, write)
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def embed_png(path, title, keywords):
+    """Set the XMP iTXt chunk of a PNG, copying the image data chunks as is"""
+    chunks = []
+    existing = None
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        while True:
+            start = f.tell()
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("PNG file ends before the image data")
+            length, kind = struct.unpack('>I4s', header)
+            if kind == b'IDAT':
+                data_start = start
+                break
+            data = f.read(length)
+            f.read(4)
+            if kind == b'iTXt' and data.startswith(PNG_XMP_KEYWORD + b'\x00'):
+                # Keyword, compression flag and method, empty language and translation
+                existing = data[len(PNG_XMP_KEYWORD) + 5:] if data[len(PNG_XMP_KEYWORD) + 1] == 0 else None
+            else:
+                chunks.append(png_chunk(kind, data))
+
+    xmp = build_xmp(title, keywords, existing).encode('utf-8')
+    itxt = png_chunk(b'iTXt', PNG_XMP_KEYWORD + b'\x00\x00\x00\x00\x00' + xmp)
+
+    def write(out):
+        # IHDR first, then the metadata
+        out.write(PNG_SIGNATURE + b''.join(chunks[:1] + [itxt] + chunks[1:]))
+        with open(path, 'rb') as f:
+            f.seek(data_start)
+            shutil.copyfileobj(f, out, 1024 * 1024)
+
+    replace_file(path, write)
+
+
+def sidecar_path(path):
+    # name.ext.xmp next to the file, so clip.mp4 and clip.mov get one each
+    return path + '.xmp'
+
+
+def write_sidecar(path, title, keywords):
+    sidecar = sidecar_path(path)
+    existing = None
+    if os.path.exists(sidecar):
+        with open(sidecar, 'rb') as f:
+            existing = f.read()
+    xmp = build_xmp(title, keywords, existing).encode('utf-8')
+    # A new sidecar gets the permissions of the file it describes
+    replace_file(sidecar, lambda out: out.write(xmp), None if existing is not None else path)
+
+
+def embed_metadata(path, row):
+    """Write a result row's title and keywords into ``path``.
+
+    JPEGs get EXIF, IPTC and XMP and PNGs XMP, in place and without
+    re-encoding the pixels. Other files, videos included, get an XMP
+    sidecar. Returns 'embedded' or 'sidecar'.
+    """
+    title = row.get('Title', '') or ''
+    keywords = split_keywords(row.get('Keywords', '') or '')
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jpg', '.jpeg'):
+        embed_jpeg(path, title, keywords)
+        return 'embedded'
+    if extension == '.png':
+        embed_png(path, title, keywords)
+        return 'embedded'
+    write_sidecar(path, title, keywords)
+    return 'sidecar'
+
+
+class MetadataWriter:
+    """Embeds result rows into their source files on a thread pool.
+
+    ``submit`` hands a finished row over and returns, so the analysis does
+    not wait on the disk; it only blocks when ``workers * 4`` writes are
+    already queued. ``close`` waits for the queue and returns the counts.
+    Failures are passed to ``on_error(path, exception)``.
+    """
+
+    def __init__(self, workers=DEFAULT_METADATA_WORKERS, on_error=None, metrics=None):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='metadata')
+        self.queued = threading.BoundedSemaphore(max(1, workers) * 4)
+        self.on_error = on_error
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.counts = {'embedded': 0, 'sidecar': 0, 'failed': 0}
+
+    def submit(self, path, row):
+        self.queued.acquire()
+        try:
+            self.executor.submit(self.write, path, dict(row))
+        except BaseException:
+            self.queued.release()
+            raise
+
+    def write(self, path, row):
+        start = time.perf_counter()
+        try:
+            outcome = embed_metadata(path, row)
+        except Exception as e:
+            outcome = 'failed'
+            if self.on_error:
+                self.on_error(path, e)
+        finally:
+            self.queued.release()
+        with self.lock:
+            self.counts[outcome] += 1
+        if self.metrics is not None:
+            self.metrics.since('embed', start, [os.path.basename(path)])
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        return dict(self.counts)
+
+
+def open_metadata_writer(settings, on_error=None, metrics=None):
+    """Open the writer configured in settings, or return None if embedding is off"""
+    if not settings.get('embed_metadata', False):
+        return None
+    return MetadataWriter(
+        workers=settings.get('metadata_workers', DEFAULT_METADATA_WORKERS),
+        on_error=on_error,
+        metrics=metrics
+    )
@@ -0,0 +1,6 @@
+# Generators a Freepik upload can be credited to
+FREEPIK_MODEL_SOURCES = [
+    "Adobe Firefly", "Dall-e 1", "Dall-e 2", "Dall-e 3", "Freepik Classic", "Freepik Classic Fast", "Freepik Flux",
+    "Freepik Flux Fast", "Freepik Flux Realism", "Freepik Mystic 1.0", "Freepik Mystic 2.5", "Freepik Mystic 2.5 Flexible", "Freepik Pikaso",
+    "Ideogram 1.0","Leonardo","Midjourney 1","Midjourney 2","Midjourney 4","Midjourney 5","Midjourney 5.1", "Midjourney 5.2", "Midjourney 6",
+    "niji", "Stable Diffusion 1.4", "Stable Diffusion 1.5", "Stable Diffusion 2.0", "Stable Diffusion 2.1", "Stable Diffusion XL", "Wepik"]
@@ -0,0 +1,68 @@
+import re
+
+# "Filename: x.jpg", tolerating markdown emphasis, numbering and bullets
+FILENAME_LINE = re.compile(r'^[\s>*#\-\d.)]*filename[\s*_]*:\s*(.+)$', re.IGNORECASE)
+
+
+def multi_image_prompt(prompt, count):
+    """Wrap a single-file prompt so one request covers ``count`` files"""
+    return (
+        f"You are given images of {count} files. The images of each file follow "
+        "a line with its filename.\n"
+        "Answer with one block per file, in the same order. Start every block with "
+        "\"Filename: \" followed by the exact filename given for that file, then "
+        "follow the instructions below for that file only.\n\n" + prompt
+    )
+
+
+def build_multi_image_contents(prompt, named_payloads):
+    """Request contents: the prompt, then each filename line and its images.
+
+    A payload may be a list when one file is shown as several images, such
+    as frames sampled from a video.
+    """
+    contents = [multi_image_prompt(prompt, len(named_payloads))]
+    for filename, payload in named_payloads:
+        contents.append(f"Filename: {filename}")
+        for part in (payload if isinstance(payload, list) else [payload]):
+            contents.append(part.as_part())
+    return contents
+
+
+def clean_filename(value):
+    return value.strip().strip('*_`"\'[]').strip()
+
+
+def split_response_blocks(text, filenames):
+    """Split a multi-image response into ``{filename: block_text}``.
+
+    Blocks naming a file that was not in the request, or naming the same
+    file twice, are rejected and returned as the second value, so callers
+    can fall back to single-image requests for anything not mapped.
+    """
+    expected = {name.lower(): name for name in filenames}
+    blocks = {}
+    rejected = []
+    current = None
+    lines = []
+
+    def close_block():
+        if current is None:
+            return
+        name = expected.get(current.lower())
+        if name is None or name in blocks:
+            rejected.append(current)
+        else:
+            blocks[name] = '\n'.join(lines)
+
+    for line in text.split('\n'):
+        match = FILENAME_LINE.match(line.strip())
+        if match:
+            close_block()
+            current = clean_filename(match.group(1))
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    close_block()
+
+    return blocks, rejected
@@ -0,0 +1,146 @@
+import numpy as np
+from PIL import Image
+from large_images import (
+    open_image, is_large, reduce_large_image, large_image_slot, to_8bit,
+    DEFAULT_MEMORY_BUDGET_MB, DEFAULT_MAX_IMAGE_PIXELS
+)
+from image_preprocessing import MAX_IMAGE_SIZE
+from vector_images import is_vector, rasterize_cached
+
+# Side of the square grid each hash is computed from, giving 64-bit hashes
+HASH_SIZE = 8
+PHASH_SIZE = 32
+
+
+def load_gray(image_path, size, raster_cache=None,
+              memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_image_pixels=DEFAULT_MAX_IMAGE_PIXELS):
+    """Grayscale image shrunk to ``size``, decoding JPEGs at reduced scale.
+
+    Like preprocessing, images taking more than ``memory_budget_mb``
+    decoded are reduced band by band and images above ``max_image_pixels``
+    are refused.
+    """
+    if is_vector(image_path):
+        # Rendered at the request size, so preprocessing finds it in the cache
+        return shrink_gray(rasterize_cached(image_path, MAX_IMAGE_SIZE, raster_cache), size)
+    with open_image(image_path, max_image_pixels) as img:
+        if is_large(img, memory_budget_mb):
+            with large_image_slot():
+                img = reduce_large_image(img, (size[0] * 4, size[1] * 4), memory_budget_mb)
+        else:
+            img.draft('L', (size[0] * 4, size[1] * 4))
+        return shrink_gray(img, size)
+
+
+def shrink_gray(img, size):
+    return np.asarray(to_8bit(img).convert('L').resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def dhash(image_path, raster_cache=None, **limits):
+    """Difference hash: is each pixel brighter than its right neighbour"""
+    pixels = load_gray(image_path, (HASH_SIZE + 1, HASH_SIZE), raster_cache, **limits)
+    return bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def dct_matrix(size):
+    k = np.arange(size)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+DCT = dct_matrix(PHASH_SIZE)
+
+
+def phash(image_path, raster_cache=None, **limits):
+    """DCT hash: low frequencies above or below their median"""
+    pixels = load_gray(image_path, (PHASH_SIZE, PHASH_SIZE), raster_cache, **limits)
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only encodes overall brightness
+    return bits_to_int(low > np.median(low[1:]))
+
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+
+def image_hash(image_path, method='dhash', raster_cache=None,
+               memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_image_pixels=DEFAULT_MAX_IMAGE_PIXELS):
+    return HASH_FUNCTIONS[method](image_path, raster_cache,
+                                  memory_budget_mb=memory_budget_mb, max_image_pixels=max_image_pixels)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over hashes for "everything within distance d" queries.
+
+    Each child edge is labeled with its Hamming distance to the parent, so
+    a search only descends into edges within ``radius`` of the query's
+    distance to the node.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, radius):
+        """Items whose hash is within ``radius`` of ``value``"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.extend(items)
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def group_near_duplicates(hashes, threshold=6):
+    """Cluster ``[(item, hash)]`` into ``{representative: [members]}``.
+
+    Items are taken in order; the first unclustered item becomes the
+    representative of everything unclustered within ``threshold`` bits of
+    it. Every item appears exactly once, as a representative or a member.
+    """
+    tree = BKTree()
+    for position, (_, value) in enumerate(hashes):
+        tree.add(value, position)
+
+    assigned = set()
+    groups = {}
+    for position, (item, value) in enumerate(hashes):
+        if position in assigned:
+            continue
+        assigned.add(position)
+        members = []
+        for other in sorted(tree.search(value, threshold)):
+            if other not in assigned:
+                assigned.add(other)
+                members.append(hashes[other][0])
+        groups[item] = members
+    return groups
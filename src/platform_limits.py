@@ -0,0 +1,36 @@
+# Longest title and most keywords each platform accepts, and the fewest
+# keywords worth uploading
+PLATFORM_LIMITS = {
+    'adobe': {'title': 200, 'keywords': 49, 'min_keywords': 5},
+    'freepik': {'title': 100, 'keywords': 45, 'min_keywords': 5},
+}
+
+
+def trim_title(title, limit):
+    """Shorten a title to ``limit`` characters, at a word boundary if possible"""
+    title = ' '.join(title.split())
+    if len(title) <= limit:
+        return title
+    cut = title[:limit]
+    if title[limit] != ' ' and ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip(' ,;:-')
+
+
+def split_keywords(keywords):
+    return [keyword.strip() for keyword in keywords.split(',') if keyword.strip()]
+
+
+def limit_keywords(keywords, limit):
+    """Keep the first ``limit`` of a comma separated keyword list"""
+    return ', '.join(split_keywords(keywords)[:limit])
+
+
+def apply_limits(row, platform):
+    """Copy of a row with its title and keywords cut to the platform's limits"""
+    limits = PLATFORM_LIMITS[platform]
+    return dict(
+        row,
+        Title=trim_title(row.get('Title', ''), limits['title']),
+        Keywords=limit_keywords(row.get('Keywords', ''), limits['keywords'])
+    )
@@ -0,0 +1,141 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from image_preprocessing import prepare_payload, ImagePayload, MAX_IMAGE_SIZE
+from large_images import large_image_slots, set_large_image_slots, DEFAULT_LARGE_IN_FLIGHT
+
+
+def _preprocess_into_shared_memory(image_path, max_size, options, block_name):
+    # Runs in a worker process: decode, resize and encode, then copy the
+    # payload into the parent's block so only a few small values are pickled
+    payload = prepare_payload(image_path, max_size, **options)
+    data = payload.data
+    shm = shared_memory.SharedMemory(name=block_name)
+    try:
+        if len(data) > shm.size:
+            return payload.mime_type, payload.size, data, payload.timings
+        shm.buf[:len(data)] = data
+        return payload.mime_type, payload.size, len(data), payload.timings
+    finally:
+        shm.close()
+
+
+def process_ahead(func, items, args_for_item, workers=None, prefetch=None, initializer=None, initargs=()):
+    """Run ``func(*args_for_item(item))`` in a process pool ahead of the consumer.
+
+    Yields ``(item, result, error)`` in input order with at most
+    ``prefetch`` calls in flight. With ``workers`` set to 0 the calls run
+    inline. Results are pickled, so this suits small outputs such as
+    encoded frames. ``initializer(*initargs)`` runs in every worker.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 0:
+        for item in items:
+            try:
+                yield item, func(*args_for_item(item)), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    prefetch = prefetch or max(2, workers * 2)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+    queue = deque()
+    iterator = iter(items)
+    try:
+        while True:
+            while len(queue) < prefetch:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                queue.append((item, executor.submit(func, *args_for_item(item))))
+            if not queue:
+                return
+
+            item, future = queue.popleft()
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class PreprocessPipeline:
+    """Decode, resize and encode images in a process pool ahead of requests.
+
+    ``imap`` keeps at most ``prefetch`` images in flight and yields their
+    ImagePayload in input order. Each in-flight image gets one of
+    ``prefetch`` shared memory blocks owned by this process, so payloads are
+    never pickled. With ``workers`` set to 0 images are processed inline.
+    At most ``large_in_flight`` workers decode a large image at a time, so
+    many workers hitting a run of huge files cannot exhaust memory.
+    """
+
+    def __init__(self, workers=None, prefetch=None, max_size=MAX_IMAGE_SIZE, options=None,
+                 large_in_flight=DEFAULT_LARGE_IN_FLIGHT):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.prefetch = prefetch or max(2, self.workers * 2)
+        self.max_size = max_size
+        self.large_in_flight = large_in_flight
+        # Extra keyword arguments for prepare_payload
+        self.options = options or {}
+
+    def imap(self, items, path_for_item):
+        """Yield ``(item, payload, error)`` for every item, in order"""
+        if self.workers <= 0:
+            for item in items:
+                try:
+                    yield item, prepare_payload(path_for_item(item), self.max_size, **self.options), None
+                except Exception as e:
+                    yield item, None, e
+            return
+
+        block_size = self.max_size * self.max_size * 3
+        blocks = [shared_memory.SharedMemory(create=True, size=block_size)
+                  for _ in range(self.prefetch)]
+        free_blocks = list(blocks)
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=set_large_image_slots,
+            initargs=(large_image_slots(self.large_in_flight),)
+        )
+        queue = deque()
+        iterator = iter(items)
+        try:
+            while True:
+                # Keep the bounded queue topped up before waiting on its head
+                while free_blocks:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    block = free_blocks.pop()
+                    queue.append((item, block, executor.submit(
+                        _preprocess_into_shared_memory,
+                        path_for_item(item), self.max_size, self.options, block.name
+                    )))
+                if not queue:
+                    return
+
+                item, block, future = queue.popleft()
+                payload, error = None, None
+                start = time.perf_counter()
+                try:
+                    mime_type, size, data, timings = future.result()
+                    if isinstance(data, int):
+                        data = bytes(block.buf[:data])
+                    # Time the consumer was kept waiting for this image
+                    timings['preprocess_wait'] = time.perf_counter() - start
+                    payload = ImagePayload(data, mime_type, size, timings)
+                except Exception as e:
+                    error = e
+                free_blocks.append(block)
+                yield item, payload, error
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            for block in blocks:
+                block.close()
+                block.unlink()
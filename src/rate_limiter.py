@@ -0,0 +1,144 @@
+import threading
+import time
+
+# Gemini bills a small image, or each 768x768 tile of a larger one, as
+# a fixed number of tokens
+IMAGE_TOKENS = 258
+IMAGE_TILE_SIZE = 768
+SMALL_IMAGE_SIZE = 384
+# Rough allowance for the generated metadata block of one image
+RESPONSE_TOKENS = 400
+
+
+def estimate_request_tokens(prompt, image_count=1):
+    """Rough token cost of one request, used to reserve TPM before sending"""
+    return len(prompt) // 4 + image_count * (IMAGE_TOKENS + RESPONSE_TOKENS)
+
+
+def image_tokens(size):
+    """Tokens billed for one image of ``size`` (width, height)"""
+    width, height = size
+    if max(width, height) <= SMALL_IMAGE_SIZE:
+        return IMAGE_TOKENS
+    tiles = -(-width // IMAGE_TILE_SIZE) * -(-height // IMAGE_TILE_SIZE)
+    return tiles * IMAGE_TOKENS
+
+
+class RateLimiter:
+    """Token-bucket limiter for requests-per-minute and tokens-per-minute.
+
+    The effective rate is scaled with AIMD: every 429 halves it and each run
+    of ``increase_after`` successful requests adds ``increase_step`` back,
+    up to the configured quota. ``clock`` and ``sleep`` default to
+    ``time.monotonic`` and ``time.sleep``.
+    """
+
+    def __init__(self, requests_per_minute=15, tokens_per_minute=1000000,
+                 min_scale=0.05, increase_after=10, increase_step=0.1,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.lock = threading.Lock()
+        self.clock = clock
+        self.sleep = sleep
+        self.min_scale = min_scale
+        self.increase_after = increase_after
+        self.increase_step = increase_step
+        self.scale = 1.0
+        self.success_streak = 0
+        self.requests_per_minute = 0
+        self.tokens_per_minute = 0
+        self.configure(requests_per_minute, tokens_per_minute)
+        self.request_allowance = self.request_capacity()
+        self.token_allowance = self.token_capacity()
+        self.last_refill = self.clock()
+
+    def configure(self, requests_per_minute, tokens_per_minute):
+        with self.lock:
+            self.requests_per_minute = max(1, float(requests_per_minute))
+            self.tokens_per_minute = max(1, float(tokens_per_minute))
+
+    def request_rate(self):
+        return self.requests_per_minute * self.scale / 60
+
+    def token_rate(self):
+        return self.tokens_per_minute * self.scale / 60
+
+    def request_capacity(self):
+        # Allow at most one second worth of burst, but always one request
+        return max(1.0, self.request_rate())
+
+    def token_capacity(self):
+        return max(1.0, self.token_rate())
+
+    def refill(self):
+        now = self.clock()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.request_allowance = min(
+            self.request_capacity(),
+            self.request_allowance + elapsed * self.request_rate()
+        )
+        self.token_allowance = min(
+            self.token_capacity(),
+            self.token_allowance + elapsed * self.token_rate()
+        )
+
+    def acquire(self, tokens=0):
+        """Block until one request using ``tokens`` tokens may be sent"""
+        while True:
+            with self.lock:
+                self.refill()
+                # A request larger than the bucket only needs a full bucket
+                needed_tokens = min(tokens, self.token_capacity())
+                if self.request_allowance >= 1 and self.token_allowance >= needed_tokens:
+                    self.request_allowance -= 1
+                    self.token_allowance -= tokens
+                    return
+                wait = max(
+                    (1 - self.request_allowance) / self.request_rate(),
+                    (needed_tokens - self.token_allowance) / self.token_rate(),
+                    0.01
+                )
+            self.sleep(min(wait, 1.0))
+
+    def record_success(self, tokens_used=None, tokens_reserved=0):
+        """Settle the token reservation and slowly raise the rate again"""
+        with self.lock:
+            if tokens_used is not None:
+                self.token_allowance -= tokens_used - tokens_reserved
+            self.success_streak += 1
+            if self.success_streak >= self.increase_after and self.scale < 1.0:
+                self.scale = min(1.0, self.scale + self.increase_step)
+                self.success_streak = 0
+
+    def record_throttle(self):
+        """Back off after a 429: halve the rate and empty the buckets"""
+        with self.lock:
+            self.scale = max(self.min_scale, self.scale / 2)
+            self.success_streak = 0
+            self.refill()
+            self.request_allowance = min(self.request_allowance, 0.0)
+            self.token_allowance = min(self.token_allowance, 0.0)
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter(settings=None):
+    """Return the process-wide limiter, updated with the quota in settings"""
+    global _shared_limiter
+    settings = settings or {}
+    requests_per_minute = settings.get('requests_per_minute', 15)
+    tokens_per_minute = settings.get('tokens_per_minute', 1000000)
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        else:
+            _shared_limiter.configure(requests_per_minute, tokens_per_minute)
+        return _shared_limiter
+
+
+def response_token_count(response):
+    """Total tokens billed for a response, or None if the SDK did not report it"""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) if usage else None
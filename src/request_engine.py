@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class ConcurrentRequestEngine:
+    """Run a function over many items with a bounded number of calls in flight.
+
+    Items are pulled lazily from the iterable, so a slow producer (or a
+    stop request) never builds up more than ``max_workers`` pending calls.
+    """
+
+    def __init__(self, max_workers=1, stop_check=None):
+        self.max_workers = max(1, int(max_workers or 1))
+        self.stop_check = stop_check or (lambda: False)
+
+    def map(self, func, items):
+        """Yield ``(index, item, result)`` in completion order.
+
+        With a single worker the calls run inline on the caller's thread,
+        which keeps the old sequential behaviour exactly.
+        """
+        if self.max_workers == 1:
+            for index, item in enumerate(items):
+                if self.stop_check():
+                    return
+                yield index, item, func(item)
+            return
+
+        iterator = enumerate(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            def fill():
+                while len(pending) < self.max_workers and not self.stop_check():
+                    try:
+                        index, item = next(iterator)
+                    except StopIteration:
+                        return
+                    pending[executor.submit(func, item)] = (index, item)
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    yield index, item, future.result()
+                fill()
+
+
+def batched(items, size):
+    """Group an iterable into lists of at most ``size`` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,122 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """Persistent cache of parsed analysis rows, stored in SQLite.
+
+    Entries are keyed by a hash of the encoded image payload, the prompt and
+    the model name, so any change to one of them misses the cache.
+    """
+
+    def __init__(self, path, max_entries=200000, max_age_days=90):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.lock = threading.Lock()
+        self.puts_since_evict = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+        self.evict()
+
+    @staticmethod
+    def make_key(payload, prompt, model_name):
+        digest = hashlib.sha256()
+        digest.update(payload.mime_type.encode())
+        digest.update(payload.data)
+        digest.update(prompt.encode('utf-8'))
+        digest.update(model_name.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT result, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, result, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now)
+            )
+            self.puts_since_evict += 1
+            should_evict = self.puts_since_evict >= 1000
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used over max_entries"""
+        with self.lock, self.connection:
+            self.puts_since_evict = 0
+            self.connection.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def import_csv(self, csv_path, key_for_filename, sep=','):
+        """Seed the cache from a previously exported results CSV.
+
+        ``key_for_filename`` maps a CSV Filename to a cache key, or None if
+        the file is no longer available. Returns the number of rows imported.
+        """
+        imported = 0
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f, delimiter=sep):
+                if not row.get('Filename') or not row.get('Title'):
+                    continue
+                key = key_for_filename(row['Filename'])
+                if key:
+                    self.put(key, {name: value or '' for name, value in row.items()})
+                    imported += 1
+        return imported
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def open_response_cache(settings, folder):
+    """Open the cache configured in settings, or return None if it is disabled.
+
+    A relative ``cache_path`` is taken from ``folder`` (the output folder),
+    not from wherever the program was started.
+    """
+    if not settings.get('cache_enabled', True):
+        return None
+    path = os.path.join(folder, settings.get('cache_path', 'analysis_cache.db'))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return ResponseCache(
+        path,
+        max_entries=settings.get('cache_max_entries', 200000),
+        max_age_days=settings.get('cache_max_age_days', 90)
+    )
@@ -0,0 +1,49 @@
+import json
+import os
+
+
+class RunJournal:
+    """Append-only record of completed items, fsynced after every entry.
+
+    Each line is a JSON object holding the item key and its result row, so a
+    crashed run can be resumed without repeating finished work.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def load(self):
+        """Return ``{key: result}`` for every complete entry in the journal"""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash mid-write leaves a partial last line
+                    continue
+                completed[entry['key']] = entry['result']
+        return completed
+
+    def open(self, resume=False):
+        """Start appending; without resume any previous journal is discarded"""
+        self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self.file.tell() > 0:
+            # Terminate a partial last line so new entries stay readable
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def record(self, key, result):
+        self.file.write(json.dumps({'key': key, 'result': result}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
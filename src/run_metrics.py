@@ -0,0 +1,149 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from array import array
+
+# Latency quantiles reported for every stage
+QUANTILES = (0.5, 0.95, 0.99)
+# Files listed in the report as the slowest
+SLOWEST_FILES = 10
+# Prefix of the exported Prometheus metric names
+METRIC_PREFIX = 'stock_analyzer'
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    """Per-stage timers and counters of one analysis run.
+
+    ``observe`` records how long one pass through a stage took and charges
+    it to the files involved, ``count`` adds to a counter. Both only append
+    to memory under a lock, which is negligible next to decoding an image
+    or an API call, so metrics are always collected. ``write`` saves the
+    summary, with p50/p95/p99 per stage and the slowest files, as JSON and
+    in the Prometheus text format.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.start_clock = time.perf_counter()
+        self.samples = {}
+        self.counters = {}
+        self.file_seconds = {}
+
+    def observe(self, stage, seconds, files=()):
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = array('d')
+            samples.append(seconds)
+            for filename in files:
+                self.file_seconds[filename] = self.file_seconds.get(filename, 0.0) + seconds
+
+    def observe_all(self, timings, files=()):
+        """Record a ``{stage: seconds}`` dict, e.g. from a worker process"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds, files)
+
+    def since(self, stage, start, files=()):
+        """Record the time since ``start`` (a perf_counter value)"""
+        self.observe(stage, time.perf_counter() - start, files)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def counter(self, name):
+        return self.counters.get(name, 0)
+
+    def report(self):
+        with self.lock:
+            samples = {stage: sorted(values) for stage, values in self.samples.items()}
+            counters = dict(self.counters)
+            slowest = heapq.nlargest(SLOWEST_FILES, self.file_seconds.items(), key=lambda item: item[1])
+
+        stages = {}
+        for stage, values in samples.items():
+            summary = {
+                'count': len(values),
+                'total_seconds': sum(values),
+                'mean_seconds': sum(values) / len(values),
+            }
+            for q in QUANTILES:
+                summary[f'p{int(q * 100)}_seconds'] = percentile(values, q)
+            summary['max_seconds'] = values[-1]
+            stages[stage] = summary
+
+        return {
+            'pipeline': self.pipeline,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': time.perf_counter() - self.start_clock,
+            'stages': stages,
+            'counters': counters,
+            'slowest_files': [{'file': filename, 'seconds': seconds} for filename, seconds in slowest],
+        }
+
+    def prometheus(self, report):
+        """The report in the Prometheus text exposition format"""
+        pipeline = label_value(self.pipeline)
+        name = f'{METRIC_PREFIX}_stage_seconds'
+        lines = [
+            f'# HELP {name} Time spent in each stage of the analysis pipeline',
+            f'# TYPE {name} summary',
+        ]
+        for stage, summary in report['stages'].items():
+            labels = f'pipeline="{pipeline}",stage="{label_value(stage)}"'
+            for q in QUANTILES:
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {summary[f"p{int(q * 100)}_seconds"]:.6f}')
+            lines.append(f'{name}_sum{{{labels}}} {summary["total_seconds"]:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {summary["count"]}')
+
+        for counter, value in sorted(report['counters'].items()):
+            name = f'{METRIC_PREFIX}_{counter}_total'
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{{pipeline="{pipeline}"}} {value}')
+
+        name = f'{METRIC_PREFIX}_run_seconds'
+        lines.append(f'# HELP {name} Wall time of the run')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name}{{pipeline="{pipeline}"}} {report["wall_seconds"]:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, folder):
+        """Save ``<pipeline>_metrics.json`` and ``.prom``, return the report"""
+        report = self.report()
+        path = os.path.join(folder, f'{self.pipeline}_metrics')
+        with open(path + '.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        with open(path + '.prom', 'w') as f:
+            f.write(self.prometheus(report))
+        return report
+
+
+def stage_summary(report):
+    """One line with the p95 of every stage, for the progress log"""
+    return "p95 per stage: " + ", ".join(
+        f"{stage} {summary['p95_seconds'] * 1000:.0f} ms" for stage, summary in report['stages'].items()
+    )
+
+
+def record_retry(retry_state):
+    """tenacity ``before_sleep`` hook, counts retries of an engine method"""
+    metrics = retry_state.args[0].metrics
+    metrics.count('retries')
+    metrics.observe('retry_backoff', retry_state.next_action.sleep)
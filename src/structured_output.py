@@ -0,0 +1,133 @@
+import json
+from metadata_repair import parse_category
+
+# JSON schema of each kind of output field
+FIELD_SCHEMAS = {
+    'title': {'type': 'string'},
+    'keywords': {'type': 'array', 'items': {'type': 'string'}},
+    'category': {'type': 'integer'},
+    'text': {'type': 'string'},
+    'optional': {'type': 'string'},
+}
+
+JSON_INSTRUCTIONS = (
+    "\nRespond only with JSON matching the response schema. "
+    "Give Keywords as a list of separate keywords."
+)
+
+
+class StructuredOutputError(ValueError):
+    """A JSON response that does not match the expected fields"""
+
+
+def structured_prompt(prompt):
+    return prompt + JSON_INSTRUCTIONS
+
+
+def response_schema(fields, multi=False):
+    """Response schema for ``fields`` (``{name: kind}``).
+
+    A multi-image request answers with a list of objects, each naming the
+    file it describes.
+    """
+    properties = {name: dict(FIELD_SCHEMAS[kind]) for name, kind in fields.items()}
+    required = [name for name, kind in fields.items() if kind != 'optional']
+    if multi:
+        properties = {'Filename': {'type': 'string'}, **properties}
+        required = ['Filename'] + required
+    schema = {'type': 'object', 'properties': properties, 'required': required}
+    if multi:
+        return {'type': 'array', 'items': schema}
+    return schema
+
+
+def generation_config(fields, multi=False):
+    return {
+        'response_mime_type': 'application/json',
+        'response_schema': response_schema(fields, multi),
+    }
+
+
+def decode_response(text):
+    """Decode a JSON response, tolerating a surrounding markdown fence"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Response is not valid JSON: {e.msg}")
+
+
+def validate_fields(data, fields):
+    """Check one decoded object and convert it to a CSV row.
+
+    Raises StructuredOutputError naming every field that is missing or
+    invalid, so nothing is silently written out empty. Values that are
+    only too long, repeated or oddly written are left to
+    ``metadata_repair``.
+    """
+    if not isinstance(data, dict):
+        raise StructuredOutputError("Response is not a JSON object")
+
+    row = {}
+    problems = []
+    for name, kind in fields.items():
+        value = data.get(name)
+        if kind == 'keywords':
+            if isinstance(value, str):
+                value = value.split(',')
+            if not isinstance(value, list):
+                problems.append(f"{name} is not a list")
+                continue
+            keywords = [str(keyword).strip() for keyword in value if str(keyword).strip()]
+            if not keywords:
+                problems.append(f"{name} is empty")
+            row[name] = ', '.join(keywords)
+        elif kind == 'category':
+            if value is None or str(value).strip() == '':
+                problems.append(f"{name} is missing")
+                continue
+            # A name or "8. Graphic Resources" is as good as the number
+            code = parse_category(value)
+            row[name] = str(code) if code else str(value).strip()
+        else:
+            if value is None:
+                value = ''
+            if not isinstance(value, (str, int, float)):
+                problems.append(f"{name} is not text")
+                continue
+            value = ' '.join(str(value).split())
+            if not value and kind != 'optional':
+                problems.append(f"{name} is empty")
+            row[name] = value
+
+    if problems:
+        raise StructuredOutputError(', '.join(problems))
+    return row
+
+
+def split_json_rows(text, filenames):
+    """Split a multi-image JSON response into ``{filename: object}``.
+
+    Like ``multi_image.split_response_blocks``, objects naming an unknown
+    or repeated file are returned as rejected.
+    """
+    data = decode_response(text)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise StructuredOutputError("Response is not a JSON list")
+
+    expected = {name.lower(): name for name in filenames}
+    rows = {}
+    rejected = []
+    for item in data:
+        named = str(item.get('Filename', '')).strip() if isinstance(item, dict) else ''
+        name = expected.get(named.lower())
+        if name is None or name in rows:
+            rejected.append(named or '(unnamed)')
+        else:
+            rows[name] = item
+    return rows, rejected
@@ -1,14 +1,11 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QMessageBox, QDialog, QLineEdit,
-                            QDialogButtonBox, QCheckBox, QTabWidget)
+                            QDialogButtonBox, QCheckBox, QTabWidget, QSpinBox,
+                            QFormLayout, QComboBox)
 from PyQt6.QtGui import QAction
 import os
 import json
-import google.generativeai as genai
-from UI.ui_image_analysis import ImageAnalysisTab
-from UI.ui_video_analysis import VideoAnalysisTab
 from UI.model_selection_dialog import ModelSelectionDialog
-from UI.ui_freepik_image_analysis import FreepikImageAnalysisTab
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -29,26 +26,45 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
 
-        # Create tab widget
+        # Create tab widget, each tab is built the first time it is shown
         self.tab_widget = QTabWidget()
-        
-        # Add Image Analysis tab
-        self.image_tab = ImageAnalysisTab(self)
-        self.tab_widget.addTab(self.image_tab, "Image Analysis")
-        
-        # Add Video Analysis tab
-        self.video_tab = VideoAnalysisTab(self)
-        self.tab_widget.addTab(self.video_tab, "Video Analysis")
-        
-        # Add Image Analysis tab
-        self.image_tab = FreepikImageAnalysisTab(self)
-        self.tab_widget.addTab(self.image_tab, "Freepik Image Analysis")
-        
+        self.tab_factories = [
+            self.create_image_tab,
+            self.create_video_tab,
+            self.create_freepik_tab,
+        ]
+        for title in ["Image Analysis", "Video Analysis", "Freepik Image Analysis"]:
+            page = QWidget()
+            QVBoxLayout(page).setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(page, title)
+        self.tab_widget.currentChanged.connect(self.load_tab)
+        self.load_tab(0)
+
         main_layout.addWidget(self.tab_widget)
 
         # Status bar
         self.statusBar().showMessage('Ready')
 
+    def load_tab(self, index):
+        page = self.tab_widget.widget(index)
+        if page is not None and page.layout().count() == 0:
+            page.layout().addWidget(self.tab_factories[index]())
+
+    def create_image_tab(self):
+        from UI.ui_image_analysis import ImageAnalysisTab
+        self.image_tab = ImageAnalysisTab(self)
+        return self.image_tab
+
+    def create_video_tab(self):
+        from UI.ui_video_analysis import VideoAnalysisTab
+        self.video_tab = VideoAnalysisTab(self)
+        return self.video_tab
+
+    def create_freepik_tab(self):
+        from UI.ui_freepik_image_analysis import FreepikImageAnalysisTab
+        self.freepik_tab = FreepikImageAnalysisTab(self)
+        return self.freepik_tab
+
     def create_menu_bar(self):
         menubar = self.menuBar()
         
@@ -72,6 +88,12 @@ class MainWindow(QMainWindow):
         select_model_action.setStatusTip('Change Another Models')
         select_model_action.triggered.connect(self.show_model_dialog)
         settings_menu.addAction(select_model_action)
+
+        # Performance Settings action
+        performance_settings_action = QAction('Performance Settings', self)
+        performance_settings_action.setStatusTip('Change request concurrency and quota settings')
+        performance_settings_action.triggered.connect(self.performance_show_settings_dialog)
+        settings_menu.addAction(performance_settings_action)
         
     def show_model_dialog(self):
         dialog = ModelSelectionDialog(self)
@@ -83,6 +105,8 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Warning", "Please Set API Key first to load Models.")
                 return
             
+            import google.generativeai as genai
+
             #Konfigurasi API
             genai.configure(api_key=self.api_key)
             
@@ -160,6 +184,150 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Warning", 
                                   "API Key cannot be empty!")
 
+    def performance_show_settings_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Performance Settings")
+        dialog.setMinimumWidth(400)
+        layout = QVBoxLayout()
+        form_layout = QFormLayout()
+
+        # Number of API requests in flight at once
+        concurrency_input = QSpinBox()
+        concurrency_input.setRange(1, 64)
+        concurrency_input.setValue(self.settings.get('max_concurrent_requests', 1))
+        form_layout.addRow("Concurrent Requests:", concurrency_input)
+
+        # Several images per request, answered in one block per filename
+        multi_checkbox = QCheckBox("Multi-image requests")
+        multi_checkbox.setChecked(self.settings.get('multi_image_requests', False))
+        form_layout.addRow(multi_checkbox)
+
+        batch_input = QSpinBox()
+        batch_input.setRange(1, 20)
+        batch_input.setValue(self.settings.get('batch_size', 5))
+        form_layout.addRow("Images per Request:", batch_input)
+
+        # Schema-constrained JSON answers instead of "Field: value" lines
+        structured_checkbox = QCheckBox("Structured JSON output")
+        structured_checkbox.setChecked(self.settings.get('structured_output', False))
+        form_layout.addRow(structured_checkbox)
+
+        # Worker processes decoding images ahead of the requests, 0 = inline
+        workers_input = QSpinBox()
+        workers_input.setRange(0, 64)
+        workers_input.setValue(self.settings.get('preprocess_workers', os.cpu_count() or 1))
+        form_layout.addRow("Preprocess Workers:", workers_input)
+
+        # Draft JPEG decoding and a cheaper resampler for the 1024 px request
+        fast_checkbox = QCheckBox("Fast preprocessing (draft JPEG decoding)")
+        fast_checkbox.setChecked(self.settings.get('fast_preprocess', False))
+        form_layout.addRow(fast_checkbox)
+
+        # Images decoding to more than this are reduced band by band
+        memory_budget_input = QSpinBox()
+        memory_budget_input.setRange(64, 65536)
+        memory_budget_input.setSingleStep(64)
+        memory_budget_input.setSuffix(" MB")
+        memory_budget_input.setValue(self.settings.get('memory_budget_mb', 512))
+        form_layout.addRow("Memory Budget per Image:", memory_budget_input)
+
+        large_in_flight_input = QSpinBox()
+        large_in_flight_input.setRange(1, 64)
+        large_in_flight_input.setValue(self.settings.get('large_images_in_flight', 2))
+        form_layout.addRow("Large Images at Once:", large_in_flight_input)
+
+        backend_combo = QComboBox()
+        backend_combo.addItems(['pillow', 'opencv'])
+        backend_combo.setCurrentText(self.settings.get('resize_backend', 'pillow'))
+        form_layout.addRow("Fast Resize Backend:", backend_combo)
+
+        # Encoding of the image bytes sent with each request
+        format_combo = QComboBox()
+        format_combo.addItems(['JPEG', 'WEBP', 'PNG'])
+        format_combo.setCurrentText(self.settings.get('payload_format', 'JPEG'))
+        form_layout.addRow("Payload Format:", format_combo)
+
+        quality_input = QSpinBox()
+        quality_input.setRange(10, 100)
+        quality_input.setValue(self.settings.get('payload_quality', 90))
+        form_layout.addRow("Payload Quality:", quality_input)
+
+        # API quota shared by all analyzers
+        rpm_input = QSpinBox()
+        rpm_input.setRange(1, 100000)
+        rpm_input.setValue(self.settings.get('requests_per_minute', 15))
+        form_layout.addRow("Requests per Minute:", rpm_input)
+
+        tpm_input = QSpinBox()
+        tpm_input.setRange(1000, 100000000)
+        tpm_input.setSingleStep(1000)
+        tpm_input.setValue(self.settings.get('tokens_per_minute', 1000000))
+        form_layout.addRow("Tokens per Minute:", tpm_input)
+        # Analyze one image per group of near-duplicates, copy its metadata
+        dedupe_checkbox = QCheckBox("Group near-duplicate images")
+        dedupe_checkbox.setChecked(self.settings.get('dedupe_enabled', False))
+        form_layout.addRow(dedupe_checkbox)
+
+        dedupe_hash_combo = QComboBox()
+        dedupe_hash_combo.addItems(['dhash', 'phash'])
+        dedupe_hash_combo.setCurrentText(self.settings.get('dedupe_hash', 'dhash'))
+        form_layout.addRow("Duplicate Hash:", dedupe_hash_combo)
+
+        # Maximum differing bits of the 64-bit hashes
+        dedupe_threshold_input = QSpinBox()
+        dedupe_threshold_input.setRange(0, 32)
+        dedupe_threshold_input.setValue(self.settings.get('dedupe_threshold', 6))
+        form_layout.addRow("Duplicate Threshold:", dedupe_threshold_input)
+
+        # Persistent cache of analysis results
+        cache_checkbox = QCheckBox("Reuse cached results for unchanged images")
+        cache_checkbox.setChecked(self.settings.get('cache_enabled', True))
+        form_layout.addRow(cache_checkbox)
+
+        # Title and keywords into EXIF/IPTC/XMP, XMP sidecars for videos
+        embed_checkbox = QCheckBox("Write metadata into the analyzed files")
+        embed_checkbox.setChecked(self.settings.get('embed_metadata', False))
+        form_layout.addRow(embed_checkbox)
+
+        # Keywords are always deduplicated and limited, this merges plurals too
+        singular_checkbox = QCheckBox("Use singular keywords (cats becomes cat)")
+        singular_checkbox.setChecked(self.settings.get('singularize_keywords', False))
+        form_layout.addRow(singular_checkbox)
+        layout.addLayout(form_layout)
+
+        # Buttons
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Save | 
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+
+        dialog.setLayout(layout)
+
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.settings['max_concurrent_requests'] = concurrency_input.value()
+            self.settings['multi_image_requests'] = multi_checkbox.isChecked()
+            self.settings['batch_size'] = batch_input.value()
+            self.settings['structured_output'] = structured_checkbox.isChecked()
+            self.settings['preprocess_workers'] = workers_input.value()
+            self.settings['fast_preprocess'] = fast_checkbox.isChecked()
+            self.settings['resize_backend'] = backend_combo.currentText()
+            self.settings['memory_budget_mb'] = memory_budget_input.value()
+            self.settings['large_images_in_flight'] = large_in_flight_input.value()
+            self.settings['payload_format'] = format_combo.currentText()
+            self.settings['payload_quality'] = quality_input.value()
+            self.settings['requests_per_minute'] = rpm_input.value()
+            self.settings['tokens_per_minute'] = tpm_input.value()
+            self.settings['dedupe_enabled'] = dedupe_checkbox.isChecked()
+            self.settings['dedupe_hash'] = dedupe_hash_combo.currentText()
+            self.settings['dedupe_threshold'] = dedupe_threshold_input.value()
+            self.settings['cache_enabled'] = cache_checkbox.isChecked()
+            self.settings['embed_metadata'] = embed_checkbox.isChecked()
+            self.settings['singularize_keywords'] = singular_checkbox.isChecked()
+            self.save_settings()
+
     def load_settings(self):
         try:
             if os.path.exists('settings.json'):
@@ -171,9 +339,24 @@ class MainWindow(QMainWindow):
                 self.settings = {
                     'api_key': '',
                     'selected_model': 'gemini-1.5-flash',
-                    'request_delay': 2,
+                    'requests_per_minute': 15,
+                    'tokens_per_minute': 1000000,
                     'batch_size': 5,
-                    'max_retries': 3
+                    'max_retries': 3,
+                    'max_concurrent_requests': 1,
+                    'multi_image_requests': False,
+                    'structured_output': False,
+                    'preprocess_workers': os.cpu_count() or 1,
+                    'fast_preprocess': False,
+                    'resize_backend': 'pillow',
+                    'memory_budget_mb': 512,
+                    'large_images_in_flight': 2,
+                    'payload_format': 'JPEG',
+                    'payload_quality': 90,
+                    'dedupe_enabled': False,
+                    'cache_enabled': True,
+                    'embed_metadata': False,
+                    'singularize_keywords': False
                 }
                 self.save_settings()
         except Exception as e:
@@ -0,0 +1,133 @@
+import hashlib
+import math
+import os
+import tempfile
+import time
+from PIL import Image
+
+VECTOR_EXTENSIONS = ('.svg', '.eps', '.ai', '.pdf')
+# Everything the image analyzers accept
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp') + VECTOR_EXTENSIONS
+
+# Folder of rasterized vector files, keyed by file hash and size, in the output folder
+DEFAULT_RASTER_CACHE = 'raster_cache'
+
+
+def is_vector(image_path):
+    return image_path.lower().endswith(VECTOR_EXTENSIONS)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_pdf(path):
+    # Illustrator files are PDF inside since CS, PostScript before
+    with open(path, 'rb') as f:
+        return b'%PDF' in f.read(1024)
+
+
+def flatten(img):
+    """RGB on a white background, transparent artwork would turn black"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+
+def rasterize_svg(path, max_size):
+    from svglib.svglib import svg2rlg
+    from reportlab.graphics import renderPM
+
+    drawing = svg2rlg(path)
+    if drawing is None:
+        raise ValueError(f"Could not parse SVG file {os.path.basename(path)}")
+    scale = max_size / max(drawing.width, drawing.height)
+    drawing.scale(scale, scale)
+    drawing.width, drawing.height = drawing.width * scale, drawing.height * scale
+    return renderPM.drawToPIL(drawing, dpi=72, bg=0xFFFFFF)
+
+
+def rasterize_postscript(path, max_size):
+    # Needs Ghostscript; the size Pillow reports is the bounding box at 72 dpi
+    img = Image.open(path)
+    img.load(scale=max(1, math.ceil(max_size / max(img.size))))
+    return img
+
+
+def rasterize_pdf(path, max_size):
+    try:
+        from pdf2image import convert_from_path
+    except ImportError:
+        raise ImportError("PDF and Illustrator files need pdf2image and poppler installed")
+    # First page only, its longest side rendered at max_size
+    return convert_from_path(path, first_page=1, last_page=1, scale_to=max_size)[0]
+
+
+def rasterize(path, max_size):
+    """Render a vector file so its longest side is ``max_size``"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.svg':
+        img = rasterize_svg(path, max_size)
+    elif extension == '.pdf' or (extension == '.ai' and is_pdf(path)):
+        img = rasterize_pdf(path, max_size)
+    else:
+        img = rasterize_postscript(path, max_size)
+    img = flatten(img)
+    img.thumbnail((max_size, max_size), Image.LANCZOS)
+    return img
+
+
+def raster_cache_dir(settings, folder):
+    """Raster cache folder from settings; a relative one is taken from ``folder``"""
+    return os.path.join(folder, settings.get('raster_cache_path', DEFAULT_RASTER_CACHE))
+
+
+def rasterize_cached(path, max_size, cache_dir=None, timings=None):
+    """``rasterize``, reusing earlier renders of the same file from ``cache_dir``.
+
+    Renders are stored as PNG under the SHA-256 of the file, so renamed or
+    moved files still hit and edited ones miss. Ghostscript and poppler
+    take seconds per file, hashing it takes milliseconds. Seconds spent
+    are stored in ``timings`` under 'rasterize' or 'raster_cache'.
+    Without ``cache_dir`` every call renders.
+    """
+    start = time.perf_counter()
+    if not cache_dir:
+        img = rasterize(path, max_size)
+        if timings is not None:
+            timings['rasterize'] = time.perf_counter() - start
+        return img
+
+    cached_path = os.path.join(cache_dir, f"{file_digest(path)}_{max_size}.png")
+    if os.path.exists(cached_path):
+        img = Image.open(cached_path)
+        img.load()
+        if timings is not None:
+            timings['raster_cache'] = time.perf_counter() - start
+        return img
+
+    img = rasterize(path, max_size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Other workers may render the same file, so replace atomically
+        fd, temp_path = tempfile.mkstemp(suffix='.png', dir=cache_dir)
+        os.close(fd)
+        try:
+            img.save(temp_path, 'PNG')
+            os.replace(temp_path, cached_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    except OSError:
+        # Not cached then, the render itself is fine
+        pass
+    if timings is not None:
+        timings['rasterize'] = time.perf_counter() - start
+    return img
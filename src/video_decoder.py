@@ -0,0 +1,182 @@
+import time
+import cv2
+
+# Keyframe spacing assumed until the first seek has been timed, in seconds
+DEFAULT_KEYFRAME_SECONDS = 2.0
+
+# Until a seek has been timed, jumps longer than this are done by seeking,
+# which also measures what a seek costs on this file
+PROBE_SEEK_SECONDS = 1.0
+
+
+class VideoDecoder:
+    """One open video file, read at any number of frame positions.
+
+    Opening probes fps, size, codec and frame count. Sequential grab()
+    calls are timed as they happen, and so is every seek; the ratio gives
+    an estimate of the keyframe spacing. For each requested frame the
+    decoder grabs forward or seeks, whichever is estimated to be cheaper,
+    and checks where a seek landed from the first frame decoded after it.
+
+    Use it as a context manager so the capture is released on every path.
+    """
+
+    def __init__(self, video_path):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise Exception("Error opening video file")
+        # Index of the frame the next grab() decodes, and of the last one grabbed
+        self.position = 0
+        self.grabbed = None
+        self.grab_cost = None
+        self.seek_cost = None
+        self.info = self.probe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def probe(self):
+        cap = self.cap
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        return {
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': frame_count / fps,
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'codec': ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 '),
+        }
+
+    @property
+    def keyframe_interval(self):
+        """Estimated frames between keyframes, from seek and grab timings"""
+        if self.seek_cost is None or not self.grab_cost:
+            return int(self.info['fps'] * DEFAULT_KEYFRAME_SECONDS)
+        # A seek decodes on average half a GOP from the previous keyframe
+        return max(1, int(2 * self.seek_cost / self.grab_cost))
+
+    def grab(self):
+        start = time.perf_counter()
+        grabbed = self.cap.grab()
+        elapsed = time.perf_counter() - start
+        # Running average, the first grabs after open are the probe
+        self.grab_cost = elapsed if self.grab_cost is None else 0.9 * self.grab_cost + 0.1 * elapsed
+        if grabbed:
+            self.grabbed = self.position
+            self.position += 1
+        return grabbed
+
+    def grabbed_frame(self):
+        """Index of the frame the last grab decoded, from its timestamp"""
+        msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0:
+            return int(round(msec * self.info['fps'] / 1000))
+        # No timestamps from this backend, trust its frame counter
+        return int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+
+    def seek(self, frame_number):
+        """Seek to ``frame_number``, or before it, and grab the frame landed on.
+
+        Most backends report the requested index right after a seek, so
+        where it landed is only known once a frame is decoded. A seek that
+        overshot, as on some long-GOP files, is repeated a keyframe
+        interval earlier, and read() grabs forward from there.
+        """
+        start = time.perf_counter()
+        target = frame_number
+        while True:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            if not self.cap.grab():
+                # Past the end of the file
+                self.position = target
+                self.grabbed = None
+                break
+            self.grabbed = self.grabbed_frame()
+            self.position = self.grabbed + 1
+            if self.grabbed <= frame_number or target == 0:
+                break
+            target = max(0, target - self.keyframe_interval)
+        elapsed = time.perf_counter() - start
+        self.seek_cost = elapsed if self.seek_cost is None else 0.8 * self.seek_cost + 0.2 * elapsed
+
+    def should_seek(self, frame_number):
+        distance = frame_number - self.position
+        if distance < 0:
+            return True
+        if self.seek_cost is None or not self.grab_cost:
+            return distance > self.info['fps'] * PROBE_SEEK_SECONDS
+        return distance * self.grab_cost > self.seek_cost
+
+    def read(self, frame_number):
+        """Decode one frame (BGR), or None past the end of the file"""
+        if self.grabbed != frame_number and self.should_seek(frame_number):
+            self.seek(frame_number)
+        while self.grabbed != frame_number and self.position <= frame_number:
+            if not self.grab():
+                return None
+        if self.grabbed is None:
+            return None
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+    def read_frames(self, frame_numbers):
+        """Decode several frames, returned in the order they were asked for.
+
+        Frames are visited in file order, so nearby requests share one
+        forward pass. Unreadable frames come back as None.
+        """
+        frames = {}
+        for frame_number in sorted(set(frame_numbers)):
+            frames[frame_number] = self.read(frame_number)
+        return [frames[frame_number] for frame_number in frame_numbers]
+
+    def frame_at(self, position):
+        """Frame number at ``position`` (0.0 - 1.0) of the clip"""
+        last = max(0, self.info['frame_count'] - 1)
+        return min(last, max(0, int(self.info['frame_count'] * position)))
+
+    def read_positions(self, positions):
+        """Decode the frames at several positions (0.0 - 1.0) of the clip"""
+        frames = self.read_frames([self.frame_at(position) for position in positions])
+        # Frame counts from the container can overstate the real length
+        return [
+            frame if frame is not None else self.read_last()
+            for frame in frames
+        ]
+
+    def read_last(self):
+        frame_number = self.frame_at(1.0)
+        while frame_number > 0:
+            frame_number = max(0, frame_number - self.keyframe_interval)
+            frame = self.read(frame_number)
+            if frame is not None:
+                return frame
+        return self.read(0)
+
+    def scan(self, step=1):
+        """Yield ``(frame_number, frame)`` for every ``step``-th frame to the end"""
+        frame_number = 0
+        while True:
+            frame = self.read(frame_number)
+            if frame is None:
+                return
+            yield frame_number, frame
+            frame_number += step
+
+
+def probe_video(video_path):
+    """Metadata of a video file, opening it once"""
+    with VideoDecoder(video_path) as decoder:
+        return dict(decoder.info)
@@ -0,0 +1,527 @@
+import io
+import os
+import time
+from PIL import Image
+import google.generativeai as genai
+from google.generativeai import GenerativeModel
+from analysis_engine import AnalysisEngine
+from rate_limiter import get_rate_limiter
+from run_journal import RunJournal
+from csv_writer import StreamingCSVWriter, OrderedRowWriter
+from image_preprocessing import encode_payload
+from multi_image import build_multi_image_contents
+from structured_output import structured_prompt
+from request_engine import ConcurrentRequestEngine, batched
+from frame_sampling import (
+    extract_position_frame, sample_video_frames, layout_frames, image_token_estimates,
+    sample_video_payloads
+)
+from contact_sheet import CONTACT_SHEET_PROMPT
+from preprocess_pool import process_ahead
+from video_decoder import probe_video
+from events import Signal
+from run_metrics import RunMetrics, stage_summary
+from metadata_writer import embed_metadata, open_metadata_writer
+from metadata_repair import flagged_path, write_flagged
+
+VIDEO_ANALYSIS_PROMPT = """Analyze this video frame and provide details in the exact format below:
+Filename: [original video filename]
+Title: [descriptive title for the video, max 200 characters]
+Keywords: [relevant keywords, minimum 35 keywords and max 50 keywords, separated by commas]
+Category: [numerical category code based on:
+1. Animals
+2. Buildings and Architecture
+3. Business
+4. Drinks
+5. The Environment
+6. States of Mind
+7. Food
+8. Graphic Resources
+9. Hobbies and Leisure
+10. Industry
+11. Landscape
+12. Lifestyle
+13. People
+14. Plants and Flowers
+15. Culture and Religion
+16. Science
+17. Social Issues
+18. Sports
+19. Technology
+20. Transport
+21. Travel]
+Scene Description: [brief description of the scene]
+Releases: [leave empty if no model/property releases needed]
+"""
+
+VIDEO_CSV_COLUMNS = ['Filename', 'Title', 'Keywords', 'Category', 'Scene Description', 'Releases']
+
+# Output fields and their kind, for structured JSON output
+VIDEO_FIELDS = {
+    'Title': 'title',
+    'Keywords': 'keywords',
+    'Category': 'category',
+    'Scene Description': 'text',
+    'Releases': 'optional',
+}
+
+
+def preview_path(output_folder, video_path, settings):
+    # The contact sheet is saved under its own name, not as the video's frame
+    suffix = 'contact_sheet' if settings.get('frame_layout', 'separate') == 'contact_sheet' else 'frame'
+    return os.path.join(output_folder, f"{os.path.basename(video_path)}_{suffix}.jpg")
+
+
+def token_report(estimates, videos, tokens_used=0):
+    """Summary of image tokens per video for each way of sending frames"""
+    if not videos:
+        return "No videos analyzed"
+    report = (
+        "Image tokens per video: "
+        f"single frame {estimates['single_frame'] / videos:.0f}, "
+        f"separate frames {estimates['multi_image'] / videos:.0f}, "
+        f"contact sheet {estimates['contact_sheet'] / videos:.0f}"
+    )
+    if tokens_used:
+        report += f". Billed tokens per video: {tokens_used / videos:.0f}"
+    return report
+
+
+class VideoAnalysisEngine(AnalysisEngine):
+    """Analyzes one video, and holds the model client for batches, without Qt"""
+
+    fields = VIDEO_FIELDS
+    subject = 'frame'
+
+    progress_updated = Signal()
+    analysis_complete = Signal()
+    error_occurred = Signal()
+
+    def __init__(self, input_video, output_folder, api_key=None, settings=None):
+        self.input_video = input_video
+        self.output_folder = output_folder
+        self.api_key = api_key or ""
+        self.settings = settings or {
+            'frame_position': 0.5,  # Posisi frame (0.0 - 1.0)
+            'requests_per_minute': 15,
+            'tokens_per_minute': 1000000,
+            'max_retries': 3
+        }
+        self.stop_requested = False
+        self.model = None
+        # Rows the local repair could not fix, by filename
+        self.flagged = {}
+        # Stage timings and counters, saved next to the CSV
+        self.metrics = RunMetrics('video_analysis')
+        # JSON output constrained by a response schema instead of free text
+        self.structured_output = self.settings.get('structured_output', False)
+        self.prompt = structured_prompt(VIDEO_ANALYSIS_PROMPT) if self.structured_output else VIDEO_ANALYSIS_PROMPT
+        self.rate_limiter = get_rate_limiter(self.settings)
+        self.setup_api()
+
+    def setup_api(self):
+        try:
+            if not self.api_key:
+                raise ValueError("API Key tidak ditemukan!")
+            
+            genai.configure(api_key=self.api_key)
+            self.model = GenerativeModel(self.settings.get('selected_model', 'gemini-1.5-flash'))
+            self.progress_updated.emit(0, "API initialized successfully")
+        except Exception as e:
+            self.error_occurred.emit(f"API Setup Error: {str(e)}")
+
+    def extract_frame(self, video_path, position=0.5):
+        try:
+            return extract_position_frame(
+                video_path, position, fast=self.settings.get('fast_preprocess', False)
+            )
+        except Exception as e:
+            self.error_occurred.emit(f"Error extracting frame: {str(e)}")
+            return None
+
+    def encode_frame(self, frame):
+        # Encode once, the same bytes are reused by every retry
+        return encode_payload(
+            frame,
+            self.settings.get('payload_format', 'JPEG'),
+            self.settings.get('payload_quality', 90)
+        )
+
+    def percent_done(self):
+        # Responses are parsed at this point of a single video's progress
+        return 70
+
+    def sample_frames(self, video_path):
+        """Images to send for a video and their image token estimates"""
+        try:
+            timed_frames = sample_video_frames(video_path, self.settings)
+            images = layout_frames(timed_frames, self.settings)
+            return images, image_token_estimates(timed_frames, self.settings)
+        except Exception as e:
+            self.error_occurred.emit(f"Error extracting frame: {str(e)}")
+            return [], None
+
+    def video_prompt(self, frame_count):
+        if self.settings.get('frame_layout', 'separate') == 'contact_sheet':
+            return CONTACT_SHEET_PROMPT + self.prompt
+        if frame_count == 1:
+            return self.prompt
+        return (
+            f"Each video is shown as up to {frame_count} frames from different scenes, "
+            "in playback order. Describe the video as a whole.\n" + self.prompt
+        )
+
+    def analyze_video(self, filename, payloads):
+        contents = [self.video_prompt(len(payloads))] + [payload.as_part() for payload in payloads]
+        return self.request_analysis(contents, payloads, [filename])
+
+    def analyze_videos(self, named_payloads):
+        """One request for frames of several videos, answered per filename"""
+        frame_count = max(len(payloads) for _, payloads in named_payloads)
+        contents = build_multi_image_contents(self.video_prompt(frame_count), named_payloads)
+        return self.request_analysis(
+            contents, [payload for _, payloads in named_payloads for payload in payloads],
+            [filename for filename, _ in named_payloads]
+        )
+
+    def run(self):
+        try:
+            # Create output folder if it doesn't exist
+            os.makedirs(self.output_folder, exist_ok=True)
+
+            # Extract filename
+            video_filename = os.path.basename(self.input_video)
+            self.metrics = RunMetrics(f"{video_filename}_analysis")
+            
+            self.progress_updated.emit(10, "Extracting frame from video...")
+            
+            # Extract frames
+            start = time.perf_counter()
+            frames, estimates = self.sample_frames(self.input_video)
+            self.metrics.since('decode', start, [video_filename])
+            
+            if not frames:
+                self.error_occurred.emit("Failed to extract frame from video")
+                return
+
+            self.progress_updated.emit(40, "Analyzing frame...")
+
+            # Analyze frames
+            start = time.perf_counter()
+            payloads = [self.encode_frame(frame) for frame in frames]
+            self.metrics.since('encode', start, [video_filename])
+            analysis = self.analyze_video(video_filename, payloads)
+            if not analysis:
+                self.error_occurred.emit("Failed to analyze frame")
+                return
+
+            self.progress_updated.emit(70, "Processing analysis results...")
+
+            # Parse results
+            start = time.perf_counter()
+            result = self.parse_response(video_filename, analysis)
+            self.metrics.since('parse', start, [video_filename])
+            if not result:
+                self.error_occurred.emit("Failed to parse analysis results")
+                return
+            if video_filename in self.flagged:
+                self.metrics.count('rows_flagged')
+                self.progress_updated.emit(
+                    70, f"Needs review: {'; '.join(self.flagged[video_filename])}"
+                )
+
+            # Save frame, or contact sheet
+            frames[0].save(preview_path(self.output_folder, self.input_video, self.settings))
+
+            # Save results
+            csv_path = os.path.join(self.output_folder, f"{video_filename}_analysis.csv")
+            writer = StreamingCSVWriter(csv_path, VIDEO_CSV_COLUMNS)
+            writer.write(result)
+            writer.close()
+
+            if self.settings.get('embed_metadata', False):
+                try:
+                    embed_metadata(self.input_video, result)
+                except Exception as e:
+                    self.error_occurred.emit(f"Error writing metadata sidecar: {str(e)}")
+
+            self.progress_updated.emit(100, token_report(estimates, 1, self.metrics.counter('tokens')))
+            try:
+                self.progress_updated.emit(100, stage_summary(self.metrics.write(self.output_folder)))
+            except OSError as e:
+                self.error_occurred.emit(f"Error saving metrics: {str(e)}")
+            self.progress_updated.emit(100, "Analysis completed successfully!")
+            self.analysis_complete.emit(csv_path)
+
+        except Exception as e:
+            self.error_occurred.emit(f"An error occurred: {str(e)}")
+
+    def get_supported_formats(self):
+        return ('.mp4', '.avi', '.mov', '.mkv')
+
+    def validate_video(self, video_path):
+        try:
+            probe_video(video_path)
+            return True
+        except Exception:
+            return False
+
+class VideoBatchEngine:
+    """Analyzes a list of videos into one CSV, without Qt.
+
+    Progress and errors are reported through the signals, and
+    ``iter_results`` yields each row as it completes. The GUI runs it in a
+    QThread through ``video_analyzer.VideoBatchAnalyzer``.
+    """
+
+    overall_progress_updated = Signal()
+    current_progress_updated = Signal()
+    status_updated = Signal()
+    analysis_complete = Signal()
+    error_occurred = Signal()
+
+    def __init__(self, video_files, output_folder, api_key=None, settings=None, resume=False):
+        self.video_files = video_files
+        self.output_folder = output_folder
+        self.api_key = api_key
+        self.settings = settings or {}
+        self.resume = resume
+        self.stop_requested = False
+        self.completed_files = []
+
+    def analyze_batch(self, analyzer, batch):
+        """Analyze ``((index, video_file), (payloads, estimates, timings), error)`` entries.
+
+        Returns one result (or None) per entry. Frames of a multi-video
+        batch share one request; videos whose answer cannot be mapped back
+        by filename are analyzed on their own. The current video progress
+        is 40 once its frames are sampled and 70 once it is answered.
+        """
+        results = [None] * len(batch)
+        sampled = []
+        for position, ((_, video_file), sampled_video, error) in enumerate(batch):
+            name = os.path.basename(video_file)
+            if error:
+                self.error_occurred.emit(f"Error extracting frame from {name}: {str(error)}")
+            else:
+                # Sampling and encoding ran in a worker process
+                analyzer.metrics.observe_all(sampled_video[2], [name])
+                sampled.append((position, name, sampled_video[0]))
+        if sampled:
+            self.current_progress_updated.emit(40)
+
+        blocks = {}
+        names = [name for _, name, _ in sampled]
+        # Blocks are matched by basename, so it has to be unique in the request
+        if len(sampled) > 1 and len(set(name.lower() for name in names)) == len(names):
+            try:
+                self.status_updated.emit(f"Analyzing {len(sampled)} videos in one request...")
+                analysis = analyzer.analyze_videos([(name, payloads) for _, name, payloads in sampled])
+                self.current_progress_updated.emit(70)
+                start = time.perf_counter()
+                blocks, rejected = analyzer.split_response(analysis or '', names)
+                analyzer.metrics.since('parse', start, names)
+                if rejected:
+                    self.status_updated.emit(f"Ignored response blocks for unexpected files: {', '.join(rejected)}")
+            except Exception as e:
+                self.error_occurred.emit(f"Error analyzing videos: {str(e)}")
+
+        for position, name, payloads in sampled:
+            try:
+                result = None
+                if name in blocks:
+                    start = time.perf_counter()
+                    result = analyzer.parse_response(name, blocks[name])
+                    analyzer.metrics.since('parse', start, [name])
+                if not (result and result['Title'] and result['Keywords']):
+                    # Fall back to a request for this video alone
+                    self.status_updated.emit(f"Analyzing {name}...")
+                    analysis = analyzer.analyze_video(name, payloads)
+                    self.current_progress_updated.emit(70)
+                    start = time.perf_counter()
+                    result = analyzer.parse_response(name, analysis) if analysis else None
+                    analyzer.metrics.since('parse', start, [name])
+                results[position] = result
+            except Exception as e:
+                self.error_occurred.emit(f"Error processing {name}: {str(e)}")
+        return results
+
+    def save_frame(self, video_file, payload):
+        # The encoded request frame is saved as is when it is already a JPEG
+        frame_path = preview_path(self.output_folder, video_file, self.settings)
+        if payload.mime_type == 'image/jpeg':
+            payload.save(frame_path)
+        else:
+            Image.open(io.BytesIO(payload.data)).convert('RGB').save(frame_path)
+
+    def run(self):
+        for _ in self.iter_results():
+            pass
+
+    def iter_results(self):
+        """Analyze the videos, yielding each newly analyzed row.
+
+        Rows come in completion order and are also written to the CSV and
+        journal. Set ``stop_requested`` to stop after the requests in
+        flight; closing the generator early discards the CSV, but the
+        journal keeps every finished row for a resumed run.
+        """
+        journal = None
+        writer = None
+        try:
+            total_videos = len(self.video_files)
+            os.makedirs(self.output_folder, exist_ok=True)
+
+            # Every finished video is journaled, so a crashed batch can resume
+            journal = RunJournal(os.path.join(self.output_folder, 'batch_video_analysis.journal'))
+            completed = journal.load() if self.resume else {}
+            journal.open(resume=self.resume)
+
+            # Rows are streamed to the CSV in input order as videos finish
+            csv_path = os.path.join(self.output_folder, 'batch_video_analysis.csv')
+            writer = StreamingCSVWriter(csv_path, VIDEO_CSV_COLUMNS)
+            ordered = OrderedRowWriter(writer)
+            finished = 0
+
+            pending = []
+            for index, video_file in enumerate(self.video_files):
+                if video_file in completed:
+                    ordered.add(index, completed[video_file])
+                    self.completed_files.append(video_file)
+                    finished += 1
+                    self.status_updated.emit(f"Skipping {os.path.basename(video_file)}: already analyzed")
+                    self.overall_progress_updated.emit(int((finished / total_videos) * 100))
+                else:
+                    pending.append((index, video_file))
+
+            # One analyzer, and so one model client, is shared by all requests
+            analyzer = VideoAnalysisEngine(
+                input_video=None,
+                output_folder=self.output_folder,
+                api_key=self.api_key,
+                settings=self.settings
+            )
+            analyzer.error_occurred.connect(self.error_occurred.emit)
+            analyzer.metrics = RunMetrics('batch_video_analysis')
+
+            # In multi-image mode one request covers batch_size videos
+            batch_size = 1
+            if self.settings.get('multi_image_requests', False):
+                batch_size = max(1, self.settings.get('batch_size', 5))
+            concurrency = max(1, self.settings.get('max_concurrent_requests', 1))
+            engine = ConcurrentRequestEngine(
+                max_workers=concurrency,
+                stop_check=lambda: self.stop_requested
+            )
+
+            # Frames are extracted and encoded in worker processes ahead of the requests
+            workers = min(self.settings.get('preprocess_workers', os.cpu_count() or 1), len(pending))
+
+            def sampling_args(item):
+                index, video_file = item
+                self.status_updated.emit(
+                    f"\nProcessing video {index + 1}/{total_videos}: {os.path.basename(video_file)}"
+                )
+                # Frames of this video are being sampled
+                self.current_progress_updated.emit(10)
+                return video_file, self.settings
+
+            sampled = process_ahead(
+                sample_video_payloads, pending, sampling_args,
+                workers=workers,
+                prefetch=concurrency * batch_size + 2 * workers
+            )
+
+            # XMP sidecars next to the videos, written as rows finish
+            embedder = open_metadata_writer(
+                self.settings,
+                on_error=lambda path, e: self.error_occurred.emit(
+                    f"Error writing metadata sidecar of {os.path.basename(path)}: {str(e)}"
+                ),
+                metrics=analyzer.metrics
+            )
+
+            # Image token estimates summed over the analyzed videos
+            token_totals = {}
+            analyzed = 0
+            try:
+                for _, batch, batch_results in engine.map(
+                        lambda batch: self.analyze_batch(analyzer, batch),
+                        batched(sampled, batch_size)):
+                    for ((index, video_file), sampled_video, _), result in zip(batch, batch_results):
+                        start = time.perf_counter()
+                        ordered.add(index, result)
+                        finished += 1
+                        if result:
+                            payloads, estimates, _ = sampled_video
+                            journal.record(video_file, result)
+                            if embedder:
+                                embedder.submit(video_file, result)
+                            analyzer.metrics.since('write', start, [os.path.basename(video_file)])
+                            analyzer.metrics.count('files_analyzed')
+                            self.completed_files.append(video_file)
+                            analyzed += 1
+                            for mode, tokens in estimates.items():
+                                token_totals[mode] = token_totals.get(mode, 0) + tokens
+                            try:
+                                self.save_frame(video_file, payloads[0])
+                            except Exception as e:
+                                self.error_occurred.emit(
+                                    f"Error saving frame of {os.path.basename(video_file)}: {str(e)}"
+                                )
+                            self.status_updated.emit(f"Finished {os.path.basename(video_file)}")
+                        else:
+                            analyzer.metrics.count('files_failed')
+                        self.current_progress_updated.emit(100)
+                        self.overall_progress_updated.emit(int((finished / total_videos) * 100))
+                        if result:
+                            yield result
+                ordered.finish()
+            finally:
+                sampled.close()
+                embedded = embedder.close() if embedder else None
+
+            if self.stop_requested:
+                self.status_updated.emit("Analysis stopped by user")
+            self.status_updated.emit(token_report(token_totals, analyzed, analyzer.metrics.counter('tokens')))
+            if embedded:
+                self.status_updated.emit(
+                    f"Metadata written to {embedded['sidecar']} XMP sidecars, {embedded['failed']} failed"
+                )
+
+            # Rows the local repair could not fix, for a look before uploading
+            if analyzer.flagged:
+                analyzer.metrics.count('rows_flagged', len(analyzer.flagged))
+                try:
+                    write_flagged(flagged_path(csv_path), sorted(analyzer.flagged.items()))
+                    self.status_updated.emit(
+                        f"{len(analyzer.flagged)} videos need review, listed in {os.path.basename(flagged_path(csv_path))}"
+                    )
+                except OSError as e:
+                    self.error_occurred.emit(f"Error saving flagged rows: {str(e)}")
+
+            # Stage timings as JSON and for Prometheus (node exporter textfile)
+            try:
+                report = analyzer.metrics.write(self.output_folder)
+                if report['stages']:
+                    self.status_updated.emit(stage_summary(report))
+            except OSError as e:
+                self.error_occurred.emit(f"Error saving metrics: {str(e)}")
+
+            # Save final results
+            if writer.rows_written:
+                writer.close()
+                writer = None
+                self.analysis_complete.emit(self.completed_files)
+            else:
+                writer.abort()
+                writer = None
+                self.error_occurred.emit("No data was processed successfully")
+
+        except Exception as e:
+            self.error_occurred.emit(f"An error occurred during batch processing: {str(e)}")
+        finally:
+            if writer:
+                writer.abort()
+            if journal:
+                journal.close()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The modules are run from src, not installed; the fake API lives in benchmarks
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Make the engines talk to a FakeBackend, retrying without waiting.
+
+    Returns a function taking the FakeBackend options and returning it.
+    """
+    pytest.importorskip('google.generativeai')
+    import fake_gemini
+    from analysis_engine import AnalysisEngine
+
+    for name in fake_gemini.ENGINE_MODULES:
+        module = __import__(name)
+        monkeypatch.setattr(module, 'GenerativeModel', module.GenerativeModel)
+    monkeypatch.setattr(AnalysisEngine.request_analysis.retry, 'sleep', lambda seconds: None)
+
+    def install(**options):
+        backend = fake_gemini.FakeBackend(**dict({'latency': 'fixed:0', 'per_image': 0}, **options))
+        backend.install()
+        return backend
+    return install
@@ -0,0 +1,51 @@
+import pytest
+
+from cli import apply_overrides, parse_args
+
+SETTINGS = {
+    'max_concurrent_requests': 5,
+    'include_patterns': '*.jpg',
+    'exclude_patterns': 'raw',
+    'recursive_input': False,
+}
+
+
+def test_settings_file_values_are_kept():
+    settings = apply_overrides(SETTINGS, parse_args(['images', 'in', '-o', 'out']))
+    assert settings == SETTINGS
+
+
+def test_options_given_override_settings():
+    args = parse_args(['images', 'in', '-o', 'out', '--concurrency', '2',
+                       '--include', '*.png', '--exclude', 'tmp', '--exclude', 'old'])
+    settings = apply_overrides(SETTINGS, args)
+    assert settings['max_concurrent_requests'] == 2
+    assert settings['include_patterns'] == ['*.png']
+    assert settings['exclude_patterns'] == ['tmp', 'old']
+
+
+def test_no_recursive():
+    args = parse_args(['videos', 'in', '-o', 'out', '--no-recursive'])
+    assert apply_overrides({}, args)['recursive_input'] is False
+
+
+def test_videos_exit_1_without_a_csv(fake_gemini, tmp_path, capsys, monkeypatch):
+    cv2 = pytest.importorskip('cv2')
+    np = pytest.importorskip('numpy')
+    import cli
+    path = str(tmp_path / 'clip.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (160, 90))
+    for index in range(30):
+        writer.write(np.full((90, 160, 3), index * 8, np.uint8))
+    writer.release()
+    # Every answer is malformed JSON, so no video gets a row
+    fake_gemini(malformed_rate=1.0)
+    output = tmp_path / 'out'
+    # Keep pytest's own SIGINT handling
+    monkeypatch.setattr(cli.signal, 'signal', lambda signum, handler: None)
+
+    status = cli.main(['videos', path, '-o', str(output), '--api-key', 'key', '--settings', '',
+                       '--structured', '--workers', '0', '--rpm', '100000', '-q'])
+    assert status == 1
+    assert not (output / 'batch_video_analysis.csv').exists()
+    assert 'No data was processed successfully' in capsys.readouterr().err
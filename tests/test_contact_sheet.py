@@ -0,0 +1,15 @@
+import pytest
+
+from contact_sheet import format_timestamp
+
+
+@pytest.mark.parametrize('seconds, label', [
+    (0, '0:00.0'),
+    (5.04, '0:05.0'),
+    (59.94, '0:59.9'),
+    (59.96, '1:00.0'),
+    (119.99, '2:00.0'),
+    (3600, '60:00.0'),
+])
+def test_format_timestamp(seconds, label):
+    assert format_timestamp(seconds) == label
@@ -0,0 +1,85 @@
+import csv
+import os
+
+import pytest
+
+from csv_writer import MultiCSVWriter, OrderedRowWriter, StreamingCSVWriter
+
+COLUMNS = ['Filename', 'Title']
+
+
+def read_rows(path, sep=','):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f, delimiter=sep))
+
+
+def test_file_appears_only_when_closed(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    writer = StreamingCSVWriter(path, COLUMNS, flush_every=1)
+    writer.write({'Filename': 'a.jpg', 'Title': 'A, with a comma'})
+    assert not os.path.exists(path)
+    writer.close()
+    assert read_rows(path) == [{'Filename': 'a.jpg', 'Title': 'A, with a comma'}]
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_abort_keeps_an_existing_file(tmp_path):
+    path = tmp_path / 'out.csv'
+    path.write_text('Filename,Title\nold.jpg,Old\n', encoding='utf-8')
+    writer = StreamingCSVWriter(str(path), COLUMNS)
+    writer.write({'Filename': 'new.jpg', 'Title': 'New'})
+    writer.abort()
+    assert read_rows(str(path)) == [{'Filename': 'old.jpg', 'Title': 'Old'}]
+    assert not os.path.exists(str(path) + '.tmp')
+
+
+def test_extra_fields_are_ignored(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    writer = StreamingCSVWriter(path, COLUMNS)
+    writer.write({'Filename': 'a.jpg', 'Title': 'A', 'Prompt': 'not a column'})
+    writer.close()
+    assert read_rows(path) == [{'Filename': 'a.jpg', 'Title': 'A'}]
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+
+def test_ordered_writer_restores_input_order():
+    target = ListWriter()
+    ordered = OrderedRowWriter(target)
+    ordered.add(2, 'c')
+    ordered.add(1, None)
+    assert target.rows == []
+    ordered.add(0, 'a')
+    assert target.rows == ['a', 'c']
+    ordered.add(3, 'd')
+    assert target.rows == ['a', 'c', 'd']
+
+
+def test_ordered_writer_finish_flushes_after_gaps():
+    target = ListWriter()
+    ordered = OrderedRowWriter(target)
+    ordered.add(3, 'd')
+    ordered.add(1, 'b')
+    ordered.finish()
+    assert target.rows == ['b', 'd']
+
+
+@pytest.mark.parametrize('sep', [',', ';'])
+def test_multi_writer_applies_each_transform(tmp_path, sep):
+    first = str(tmp_path / 'first.csv')
+    second = str(tmp_path / 'second.csv')
+    writer = MultiCSVWriter([
+        (StreamingCSVWriter(first, COLUMNS), lambda row: row),
+        (StreamingCSVWriter(second, COLUMNS, sep=sep), lambda row: dict(row, Title=row['Title'].upper())),
+    ])
+    writer.write({'Filename': 'a.jpg', 'Title': 'a cat'})
+    writer.close()
+    assert writer.rows_written == 1
+    assert read_rows(first) == [{'Filename': 'a.jpg', 'Title': 'a cat'}]
+    assert read_rows(second, sep) == [{'Filename': 'a.jpg', 'Title': 'A CAT'}]
@@ -0,0 +1,80 @@
+import os
+import pytest
+from file_discovery import FileDiscovery, matches, parse_patterns, walk_files
+
+IMAGES = ('.jpg', '.png')
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for path in ('a.jpg', 'b.PNG', 'notes.txt', 'sub/c.jpg', 'sub/deep/d.png',
+                 'raw/e.jpg', 'sub/raw/f.jpg'):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_bytes(b'')
+    return str(tmp_path)
+
+
+def test_parse_patterns():
+    assert parse_patterns(None) == []
+    assert parse_patterns('*.jpg, sub/*;  ,raw') == ['*.jpg', 'sub/*', 'raw']
+    assert parse_patterns(['*.jpg', ' ']) == ['*.jpg']
+
+
+def test_matches_path_or_name():
+    assert matches('sub/c.jpg', ['sub/*'])
+    assert matches('sub/c.jpg', ['c.*'])
+    assert not matches('sub/c.jpg', ['other/*'])
+
+
+def test_walks_subfolders_with_forward_slashes(tree):
+    assert sorted(walk_files(tree, IMAGES)) == [
+        'a.jpg', 'b.PNG', 'raw/e.jpg', 'sub/c.jpg', 'sub/deep/d.png', 'sub/raw/f.jpg'
+    ]
+
+
+def test_not_recursive(tree):
+    assert sorted(walk_files(tree, IMAGES, recursive=False)) == ['a.jpg', 'b.PNG']
+
+
+def test_include_and_exclude(tree):
+    assert sorted(walk_files(tree, IMAGES, include='*.jpg')) == [
+        'a.jpg', 'raw/e.jpg', 'sub/c.jpg', 'sub/raw/f.jpg'
+    ]
+    # Excluded folders are skipped at any depth
+    assert sorted(walk_files(tree, IMAGES, exclude=['raw'])) == [
+        'a.jpg', 'b.PNG', 'sub/c.jpg', 'sub/deep/d.png'
+    ]
+    assert sorted(walk_files(tree, IMAGES, include='sub/*', exclude='*.png')) == [
+        'sub/c.jpg', 'sub/raw/f.jpg'
+    ]
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='no symlinks')
+def test_symlinked_folders_are_not_followed(tree):
+    try:
+        os.symlink(tree, os.path.join(tree, 'sub', 'loop'), target_is_directory=True)
+    except OSError:
+        pytest.skip('symlinks not permitted')
+    assert len(list(walk_files(tree, IMAGES))) == 6
+
+
+def test_unreadable_root_is_reported(tmp_path):
+    errors = []
+    missing = str(tmp_path / 'missing')
+    assert list(walk_files(missing, IMAGES, onerror=lambda path, e: errors.append(path))) == []
+    assert errors == [missing]
+
+
+def test_discovery_streams_everything(tree):
+    discovery = FileDiscovery(tree, IMAGES)
+    assert sorted(discovery) == sorted(walk_files(tree, IMAGES))
+    assert discovery.finished
+    assert discovery.found == discovery.total == 6
+
+
+def test_discovery_raises_walk_errors(tree):
+    def fail(path, error):
+        raise error
+
+    with pytest.raises(OSError):
+        list(FileDiscovery(os.path.join(tree, 'missing'), IMAGES, onerror=fail))
@@ -0,0 +1,129 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from file_discovery import walk_files
+
+SETTINGS = {
+    'requests_per_minute': 100000,
+    'tokens_per_minute': 100000000,
+    'max_concurrent_requests': 4,
+    'preprocess_workers': 0,
+    'cache_enabled': False,
+}
+
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / 'in'
+    rng = np.random.default_rng(1)
+    for index in range(8):
+        path = folder / ('sub' if index % 3 == 0 else '') / f'img{index}.jpg'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)).save(path)
+    return str(folder)
+
+
+def run(input_folder, output_folder, settings=None, resume=False, rows=None):
+    """Rows yielded by an image engine run, stopping after ``rows`` if given"""
+    from image_engine import ImageAnalysisEngine
+    engine = ImageAnalysisEngine(input_folder, output_folder, 'key', dict(SETTINGS, **(settings or {})),
+                                 resume=resume)
+    errors = []
+    completed = []
+    engine.error_occurred.connect(errors.append)
+    engine.analysis_complete.connect(completed.append)
+    results = engine.iter_results()
+    yielded = []
+    for row in results:
+        yielded.append(row)
+        if rows is not None and len(yielded) == rows:
+            results.close()
+            break
+    return engine, yielded, errors, completed
+
+
+def csv_filenames(output_folder):
+    with open(os.path.join(output_folder, 'analysis_results.csv'), encoding='utf-8', newline='') as f:
+        return [row['Filename'] for row in csv.DictReader(f)]
+
+
+def input_order(folder):
+    # The CSV lists files from subfolders by name
+    return [os.path.basename(path) for path in walk_files(folder, ('.jpg',))]
+
+
+def test_rows_are_written_in_input_order(fake_gemini, images, tmp_path):
+    # Requests finish out of order
+    backend = fake_gemini(latency='uniform:0,0.02')
+    output = str(tmp_path / 'out')
+    engine, rows, errors, completed = run(images, output)
+    assert errors == []
+    assert completed == [os.path.join(output, 'analysis_results.csv')]
+    assert backend.calls == 8
+    assert csv_filenames(output) == input_order(images)
+    assert sorted(row['Filename'] for row in rows) == sorted(csv_filenames(output))
+
+
+def test_resume_from_the_journal(fake_gemini, images, tmp_path):
+    backend = fake_gemini()
+    output = str(tmp_path / 'out')
+    _, first, _, completed = run(images, output, {'max_concurrent_requests': 1}, rows=3)
+    assert completed == []
+    calls = backend.calls
+
+    _, rest, errors, completed = run(images, output, resume=True)
+    assert errors == []
+    assert completed
+    # Only the files the first run did not finish are requested again
+    assert backend.calls - calls == 8 - len(first)
+    assert not {row['Filename'] for row in first} & {row['Filename'] for row in rest}
+    assert csv_filenames(output) == input_order(images)
+
+
+def test_quota_errors_are_retried(fake_gemini, images, tmp_path):
+    backend = fake_gemini(throttle_rate=0.3, seed=4)
+    output = str(tmp_path / 'out')
+    engine, rows, errors, _ = run(images, output, {'max_concurrent_requests': 1})
+    assert backend.throttled > 0
+    assert engine.metrics.counter('throttled_429') == backend.throttled
+    assert len(rows) == 8
+    assert len(csv_filenames(output)) == 8
+    assert all('quota' in error for error in errors)
+
+
+def test_multi_image_requests_in_a_pool(fake_gemini, images, tmp_path):
+    backend = fake_gemini(latency='uniform:0,0.02')
+    output = str(tmp_path / 'out')
+    _, rows, errors, _ = run(images, output, {
+        'multi_image_requests': True, 'batch_size': 3, 'preprocess_workers': 2
+    })
+    assert errors == []
+    assert backend.calls == 3
+    assert csv_filenames(output) == input_order(images)
+
+
+def test_combined_run_lists_flagged_rows_under_its_own_name(fake_gemini, images, tmp_path, monkeypatch):
+    import fake_gemini as fake
+    from combined_engine import CombinedAnalysisEngine
+    # Too few keywords for either site
+    field_value = fake.FakeGenerativeModel.field_value
+    monkeypatch.setattr(fake.FakeGenerativeModel, 'field_value', staticmethod(
+        lambda name, index: 'one, two' if name == 'Keywords' else field_value(name, index)
+    ))
+    fake_gemini()
+    output = tmp_path / 'out'
+    output.mkdir()
+    (output / 'analysis_results_flagged.csv').write_text('from an Adobe Stock run\n', encoding='utf-8')
+
+    engine = CombinedAnalysisEngine(images, str(output), 'Midjourney 6', 'key', dict(SETTINGS))
+    rows = list(engine.iter_results())
+    assert len(rows) == 8
+    assert (output / 'analysis_results_flagged.csv').read_text(encoding='utf-8') == 'from an Adobe Stock run\n'
+    with open(output / 'combined_analysis_flagged.csv', encoding='utf-8', newline='') as f:
+        flagged = list(csv.DictReader(f))
+    assert len(flagged) == 8
+    assert flagged[0]['Problems'] == '2 keywords'
@@ -0,0 +1,138 @@
+import warnings
+
+import numpy as np
+import pytest
+from PIL import Image, ImageChops, ImageStat
+from large_images import (
+    MB, decoded_bytes, is_large, open_image, reduce_large_image, reduction_factor, to_rgb
+)
+
+SIZE = (1200, 700)
+MIN_SIZE = (150, 80)
+# 1 MB bands are a few dozen rows of a 1200 px wide image
+BUDGET_MB = 1
+
+
+def photo(mode='RGB'):
+    # Smooth content, so JPEG and box reduction differences stay small
+    rng = np.random.default_rng(3)
+    small = Image.fromarray(rng.integers(0, 256, (7, 12, 3), dtype=np.uint8), 'RGB')
+    img = small.resize(SIZE, Image.Resampling.BICUBIC)
+    if mode == 'I;16':
+        pixels = np.asarray(img.convert('L')).astype(np.uint16) * 257
+        return Image.fromarray(pixels)
+    return img.convert(mode)
+
+
+def mean_difference(a, b):
+    assert a.size == b.size
+    return max(ImageStat.Stat(ImageChops.difference(a, b)).mean)
+
+
+def full_decode(path, factor):
+    with Image.open(path) as img:
+        return to_rgb(img).reduce(factor)
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P', 'I;16'])
+def test_banded_png_matches_full_decode(tmp_path, mode):
+    path = str(tmp_path / 'large.png')
+    photo(mode).save(path)
+    factor = reduction_factor(SIZE, MIN_SIZE)
+    with open_image(path) as img:
+        banded = reduce_large_image(img, MIN_SIZE, BUDGET_MB)
+    assert banded.mode == 'RGB'
+    assert mean_difference(banded, full_decode(path, factor)) < 0.5
+
+
+@pytest.mark.parametrize('compression', ['raw', 'tiff_lzw', 'tiff_deflate'])
+def test_banded_tiff_matches_full_decode(tmp_path, compression):
+    path = str(tmp_path / 'large.tif')
+    photo().save(path, compression=compression)
+    factor = reduction_factor(SIZE, MIN_SIZE)
+    with open_image(path) as img:
+        banded = reduce_large_image(img, MIN_SIZE, BUDGET_MB)
+    assert mean_difference(banded, full_decode(path, factor)) < 0.5
+
+
+def test_jpeg_is_scaled_while_decoding(tmp_path):
+    path = str(tmp_path / 'large.jpg')
+    photo().save(path, quality=95)
+    # The drafted image is read lazily, from the still open file
+    reduced = reduce_large_image(open_image(path), MIN_SIZE, BUDGET_MB)
+    # At least twice the minimum size, within JPEG and rounding error
+    assert reduced.width >= 2 * MIN_SIZE[0] and reduced.height >= 2 * MIN_SIZE[1]
+    expected = full_decode(path, 1).resize(reduced.size, Image.Resampling.BOX)
+    assert mean_difference(reduced, expected) < 3
+
+
+def test_reduction_factor():
+    assert reduction_factor((1200, 700), (150, 80)) == 4
+    assert reduction_factor((200, 200), (150, 80)) == 1
+    assert reduction_factor((40000, 8000), (1024, 1024)) == 3
+
+
+def test_decoded_bytes_and_is_large():
+    assert decoded_bytes(Image.new('RGB', (1000, 1000))) == 4_000_000
+    # Gray images count the RGB copy too
+    assert decoded_bytes(Image.new('L', (1000, 1000))) == 5_000_000
+    assert is_large(Image.new('RGB', (1024, 1024)), memory_budget_mb=3)
+    assert not is_large(Image.new('RGB', (1024, 1024)), memory_budget_mb=4)
+    assert decoded_bytes(Image.new('RGB', (512, 512))) == MB
+
+
+def test_pixel_limit_is_per_call(tmp_path):
+    path = str(tmp_path / 'small.png')
+    photo().save(path)
+    with pytest.raises(Image.DecompressionBombError):
+        open_image(path, max_pixels=1000)
+    with open_image(path, max_pixels=None) as img:
+        assert img.size == SIZE
+    # Pillow's own limit is left on for everything else
+    assert Image.MAX_IMAGE_PIXELS is not None
+
+
+def test_images_above_pillows_limit_open(tmp_path, monkeypatch):
+    path = str(tmp_path / 'panorama.png')
+    photo().save(path)
+    # Pretend the image is more than twice Pillow's limit
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with open_image(path) as img:
+            assert img.format == 'PNG' and img.size == SIZE
+            assert mean_difference(to_rgb(img), photo()) == 0
+    with pytest.raises(Image.DecompressionBombError):
+        open_image(path, max_pixels=1000)
+
+
+def gray16():
+    # Gradient over the whole 16-bit range
+    return (np.arange(64 * 48, dtype=np.uint32).reshape(48, 64) * 21).astype(np.uint16)
+
+
+@pytest.mark.parametrize('name, dtype', [
+    ('gray.png', np.uint16), ('gray.tif', np.uint16), ('gray_big_endian.tif', '>u2')
+])
+def test_16_bit_grayscale_files_are_scaled(tmp_path, name, dtype):
+    path = str(tmp_path / name)
+    Image.fromarray(gray16().astype(dtype)).save(path)
+    with open_image(path) as img:
+        assert img.mode.startswith('I;16')
+        rgb = to_rgb(img)
+    assert rgb.mode == 'RGB'
+    expected = (gray16() >> 8).astype(np.uint8)
+    assert (np.asarray(rgb)[:, :, 0] == expected).all()
+
+
+def test_32_bit_grayscale_is_taken_as_16_bit(tmp_path):
+    path = str(tmp_path / 'gray.png')
+    Image.fromarray(gray16()).save(path)
+    # How other Pillow versions and formats open 16-bit grayscale
+    with Image.open(path) as img:
+        rgb = to_rgb(img.convert('I'))
+    assert (np.asarray(rgb)[:, :, 0] == (gray16() >> 8)).all()
+    clipped = to_rgb(Image.fromarray(np.array([[-5, 70000]], dtype=np.int32)))
+    assert np.asarray(clipped)[0, :, 0].tolist() == [0, 255]
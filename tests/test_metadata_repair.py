@@ -0,0 +1,98 @@
+import csv
+import os
+import pytest
+
+from metadata_repair import (
+    flagged_path, normalize_keyword, parse_category, repair_csv, repair_keywords, repair_row,
+    repair_title, singular
+)
+
+KEYWORDS = 'car, night, street, city, light'
+
+
+@pytest.mark.parametrize('plural, expected', [
+    ('cats', 'cat'), ('boxes', 'box'), ('berries', 'berry'), ('beaches', 'beach'),
+    ('cookies', 'cookie'), ('leaves', 'leaf'), ('children', 'child'), ('gases', 'gas'),
+    ('kiwis', 'kiwi'), ('buses', 'bus'), ('potatoes', 'potato'),
+])
+def test_singular_of_known_nouns(plural, expected):
+    assert singular(plural) == expected
+
+
+@pytest.mark.parametrize('word', [
+    # Verbs, words that are not plurals and plurals with more than one singular
+    'does', 'goes', 'axes', 'news', 'glasses', 'analysis', 'bus', 'sports', 'texas', 'thanks',
+])
+def test_other_words_are_kept(word):
+    assert singular(word) == word
+
+
+@pytest.mark.parametrize('keyword', [
+    'los angeles', 'united states', 'New York', 'Horses', 'Paris', 'Los Angeles',
+])
+def test_phrases_and_capitalized_words_are_never_singularized(keyword):
+    assert normalize_keyword(keyword, singularize=True) == keyword
+
+
+def test_singular_keywords_are_opt_in():
+    assert repair_keywords('cats, dogs', 49) == 'cats, dogs'
+    assert repair_keywords('cats, dogs', 49, singularize=True) == 'cat, dog'
+
+
+def test_keywords_keep_case_and_drop_case_insensitive_duplicates():
+    keywords = '1. New York, new york, "Eiffel Tower", - sunset., #Sunset, , NASA'
+    assert repair_keywords(keywords, 49) == 'New York, Eiffel Tower, sunset, NASA'
+
+
+def test_keywords_from_lists_lines_and_semicolons():
+    assert repair_keywords(['a', 'b', 'a'], 49) == 'a, b'
+    assert repair_keywords('a; b\nc', 49) == 'a, b, c'
+    assert repair_keywords(','.join(str(n) for n in range(60)), 49).count(',') == 48
+
+
+def test_title_is_cleaned_and_cut_at_a_word():
+    assert repair_title('  "**Red car** at  night"  ', 200) == 'Red car at night'
+    assert repair_title('one two three', 9) == 'one two'
+
+
+@pytest.mark.parametrize('value, code', [
+    (8, 8), ('8', 8), ('8. Graphic Resources', 8), ('graphic resources', 8),
+    ('Plants & Flowers', 14), ('environment', 5), ('Unknown', None), (99, None), (True, None),
+])
+def test_parse_category(value, code):
+    assert parse_category(value) == code
+
+
+def test_repair_row_lists_what_it_could_not_fix():
+    row, problems = repair_row({'Title': '', 'Keywords': 'a, b', 'Category': 'Gardening'}, 'adobe')
+    assert problems == ['empty title', '2 keywords', "unknown category 'Gardening'"]
+    assert row['Category'] == ''
+
+    row, problems = repair_row({'Title': 'x' * 150, 'Keywords': KEYWORDS}, 'freepik')
+    assert problems == []
+    assert len(row['Title']) == 100
+
+
+def test_repair_csv_in_place(tmp_path):
+    path = str(tmp_path / 'Freepik_Image_analysis.csv')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Filename', 'Title', 'Keywords', 'Prompt'])
+        writer.writerow(['a.jpg', '"Red car"', f'{KEYWORDS}, Car', 'a prompt'])
+        writer.writerow(['b.jpg', '', 'cats, dogs', ''])
+
+    count, flagged = repair_csv(path, singularize=True)
+    assert count == 2
+    assert flagged == [('b.jpg', ['empty title', '2 keywords'])]
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f, delimiter=';'))
+    assert rows[0] == {'Filename': 'a.jpg', 'Title': 'Red car', 'Keywords': KEYWORDS, 'Prompt': 'a prompt'}
+    assert rows[1]['Keywords'] == 'cat, dog'
+    assert os.path.exists(flagged_path(path))
+
+
+def test_repair_csv_needs_title_and_keywords(tmp_path):
+    path = tmp_path / 'other.csv'
+    path.write_text('Filename,Notes\na.jpg,x\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        repair_csv(str(path))
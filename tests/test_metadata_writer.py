@@ -0,0 +1,54 @@
+import os
+import xml.etree.ElementTree as ET
+from PIL import Image
+from metadata_writer import build_xmp, embed_metadata, qualified, sidecar_path
+
+ROW = {'Title': 'Red car at night', 'Keywords': 'car, night, street'}
+
+
+def test_sidecars_of_same_named_files_do_not_collide(tmp_path):
+    for name in ('clip.mp4', 'clip.mov'):
+        (tmp_path / name).write_bytes(b'video')
+        assert embed_metadata(str(tmp_path / name), dict(ROW, Title=name)) == 'sidecar'
+    assert sidecar_path(str(tmp_path / 'clip.mp4')) == str(tmp_path / 'clip.mp4.xmp')
+    assert 'clip.mp4' in (tmp_path / 'clip.mp4.xmp').read_text(encoding='utf-8')
+    assert 'clip.mov' in (tmp_path / 'clip.mov.xmp').read_text(encoding='utf-8')
+
+
+def test_sidecar_is_replaced_without_leftovers(tmp_path):
+    video = tmp_path / 'clip.mp4'
+    video.write_bytes(b'video')
+    embed_metadata(str(video), ROW)
+    embed_metadata(str(video), dict(ROW, Title='Blue car'))
+    assert sorted(os.listdir(tmp_path)) == ['clip.mp4', 'clip.mp4.xmp']
+    text = (tmp_path / 'clip.mp4.xmp').read_text(encoding='utf-8')
+    assert 'Blue car' in text and 'Red car' not in text
+
+
+def test_embedding_keeps_mode_but_updates_mtime(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    Image.new('RGB', (32, 32), 'red').save(path)
+    os.chmod(path, 0o640)
+    os.utime(path, (1_000_000, 1_000_000))
+    assert embed_metadata(str(path), ROW) == 'embedded'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.stat(path).st_mtime > 1_000_000
+    with Image.open(path) as img:
+        assert img.size == (32, 32)
+
+
+def test_existing_xmp_prefixes_are_not_registered():
+    namespace_map = dict(ET._namespace_map)
+    existing = (
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+        '<rdf:Description rdf:about="" xmlns:ns0="http://example.com/custom/"'
+        ' xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmp:Rating="4">'
+        '<ns0:Shot>42</ns0:Shot></rdf:Description></rdf:RDF></x:xmpmeta>'
+    )
+    packet = build_xmp(ROW['Title'], ['car'], existing)
+    assert ET._namespace_map == namespace_map
+    root = ET.fromstring(packet[packet.index('<x:xmpmeta'):packet.rindex('</x:xmpmeta>') + 12])
+    description = root.find(qualified('rdf:RDF')).find(qualified('rdf:Description'))
+    assert description.find('{http://example.com/custom/}Shot').text == '42'
+    assert description.get('{http://ns.adobe.com/xap/1.0/}Rating') == '4'
+    assert 'xmp:Rating="4"' in packet
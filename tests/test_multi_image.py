@@ -0,0 +1,58 @@
+from multi_image import build_multi_image_contents, split_response_blocks
+
+
+class Part:
+    def __init__(self, name):
+        self.name = name
+
+    def as_part(self):
+        return {'mime_type': 'image/jpeg', 'data': self.name}
+
+
+def test_blocks_map_to_requested_files():
+    text = (
+        "Filename: a.jpg\nTitle: A\nKeywords: x\n\n"
+        "**Filename:** B.JPG\nTitle: B\n"
+    )
+    blocks, rejected = split_response_blocks(text, ['a.jpg', 'b.jpg'])
+    assert blocks == {'a.jpg': 'Title: A\nKeywords: x\n', 'b.jpg': 'Title: B\n'}
+    assert rejected == []
+
+
+def test_missing_file_is_left_out():
+    blocks, rejected = split_response_blocks("Filename: a.jpg\nTitle: A", ['a.jpg', 'b.jpg'])
+    assert set(blocks) == {'a.jpg'}
+    assert rejected == []
+
+
+def test_unexpected_and_duplicated_files_are_rejected():
+    text = (
+        "Filename: a.jpg\nTitle: first\n"
+        "Filename: a.jpg\nTitle: second\n"
+        "Filename: c.jpg\nTitle: not asked for\n"
+    )
+    blocks, rejected = split_response_blocks(text, ['a.jpg', 'b.jpg'])
+    assert blocks == {'a.jpg': 'Title: first'}
+    assert rejected == ['a.jpg', 'c.jpg']
+
+
+def test_numbered_and_quoted_filename_lines():
+    text = '1. Filename: "a.jpg"\nTitle: A\n- filename: `b.jpg`\nTitle: B'
+    blocks, _ = split_response_blocks(text, ['a.jpg', 'b.jpg'])
+    assert blocks == {'a.jpg': 'Title: A', 'b.jpg': 'Title: B'}
+
+
+def test_text_before_the_first_block_is_ignored():
+    blocks, rejected = split_response_blocks("Here you go:\nFilename: a.jpg\nTitle: A", ['a.jpg'])
+    assert blocks == {'a.jpg': 'Title: A'}
+    assert rejected == []
+
+
+def test_contents_put_each_filename_before_its_images():
+    contents = build_multi_image_contents('PROMPT', [('a.jpg', Part('a')), ('v.mp4', [Part('f1'), Part('f2')])])
+    assert contents[0].endswith('PROMPT')
+    assert 'images of 2 files' in contents[0]
+    assert contents[1:] == [
+        'Filename: a.jpg', {'mime_type': 'image/jpeg', 'data': 'a'},
+        'Filename: v.mp4', {'mime_type': 'image/jpeg', 'data': 'f1'}, {'mime_type': 'image/jpeg', 'data': 'f2'},
+    ]
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from near_duplicates import BKTree, group_near_duplicates, hamming, image_hash
+
+
+def test_bk_tree_finds_the_same_as_a_linear_scan():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Some near copies, a few bits apart
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:50]]
+    tree = BKTree()
+    for position, value in enumerate(values):
+        tree.add(value, position)
+    for query in values[::17]:
+        expected = {position for position, value in enumerate(values) if hamming(query, value) <= 6}
+        assert set(tree.search(query, 6)) == expected
+
+
+def test_groups_cover_every_item_once():
+    hashes = [('a', 0b0000), ('b', 0b0001), ('c', 0xFFFF), ('d', 0b0011), ('e', 0xFFFE)]
+    groups = group_near_duplicates(hashes, threshold=1)
+    assert groups == {'a': ['b'], 'c': ['e'], 'd': []}
+    members = [item for representative, group in groups.items() for item in [representative] + group]
+    assert sorted(members) == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_threshold_zero_only_groups_identical_hashes():
+    groups = group_near_duplicates([('a', 5), ('b', 5), ('c', 4)], threshold=0)
+    assert groups == {'a': ['b'], 'c': []}
+
+
+def smooth_image(path, size, seed):
+    # Random blobs, smooth like a photo at hash resolution
+    rng = np.random.default_rng(seed)
+    small = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+    small.resize(size, Image.BICUBIC).save(path, quality=90)
+
+
+@pytest.mark.parametrize('method', ['dhash', 'phash'])
+def test_rescaled_copy_is_near_and_other_image_is_far(tmp_path, method):
+    original = str(tmp_path / 'original.jpg')
+    rescaled = str(tmp_path / 'rescaled.png')
+    other = str(tmp_path / 'other.jpg')
+    smooth_image(original, (640, 480), seed=1)
+    Image.open(original).resize((500, 375), Image.BILINEAR).save(rescaled)
+    smooth_image(other, (640, 480), seed=2)
+    assert hamming(image_hash(original, method), image_hash(rescaled, method)) <= 6
+    assert hamming(image_hash(original, method), image_hash(other, method)) > 6
+
+
+def test_hashing_follows_the_memory_budget_and_pixel_limit(tmp_path, monkeypatch):
+    import near_duplicates
+    path = str(tmp_path / 'large.png')
+    smooth_image(path, (1200, 900), seed=1)
+    budgets = []
+    reduce = near_duplicates.reduce_large_image
+    monkeypatch.setattr(near_duplicates, 'reduce_large_image',
+                        lambda img, size, budget: budgets.append(budget) or reduce(img, size, budget))
+    small_budget = image_hash(path, 'phash', memory_budget_mb=1)
+    assert budgets == [1]
+    assert hamming(small_budget, image_hash(path, 'phash')) <= 2
+    assert budgets == [1]
+    with pytest.raises(Image.DecompressionBombError):
+        image_hash(path, max_image_pixels=1000)
+
+
+def test_16_bit_grayscale_hashes_like_8_bit(tmp_path):
+    rng = np.random.default_rng(4)
+    small = Image.fromarray(rng.integers(0, 256, (6, 8), dtype=np.uint8))
+    gray = np.asarray(small.resize((320, 240), Image.BICUBIC))
+    Image.fromarray(gray).save(tmp_path / 'gray8.png')
+    Image.fromarray(gray.astype(np.uint16) * 257).save(tmp_path / 'gray16.png')
+    assert image_hash(str(tmp_path / 'gray8.png')) == image_hash(str(tmp_path / 'gray16.png'))
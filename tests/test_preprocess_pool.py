@@ -0,0 +1,112 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import preprocess_pool
+from image_preprocessing import prepare_payload
+from preprocess_pool import PreprocessPipeline, process_ahead
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(6):
+        # Different sizes, so workers finish out of order
+        size = (40 + 150 * (index % 3), 30 + 100 * (index % 2))
+        pixels = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        path = str(tmp_path / f'img{index}.png')
+        Image.fromarray(pixels).save(path)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def created_blocks(monkeypatch):
+    """Names of the shared memory blocks the pipeline creates"""
+    names = []
+
+    class RecordingSharedMemory(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name=name, create=create, size=size)
+            if create:
+                names.append(self.name)
+
+    monkeypatch.setattr(preprocess_pool.shared_memory, 'SharedMemory', RecordingSharedMemory)
+    return names
+
+
+def assert_unlinked(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_payloads_in_input_order_and_intact(images, created_blocks):
+    pipeline = PreprocessPipeline(workers=2, prefetch=3, max_size=256)
+    results = list(pipeline.imap(images, lambda path: path))
+    assert [item for item, _, _ in results] == images
+    for path, payload, error in results:
+        assert error is None
+        assert payload.data == prepare_payload(path, 256).data
+        assert 'preprocess_wait' in payload.timings
+    assert_unlinked(created_blocks)
+
+
+def test_payload_larger_than_its_block_is_not_truncated(images, created_blocks):
+    # 8x8x3 bytes per block, less than the headers of an 8 px JPEG
+    pipeline = PreprocessPipeline(workers=1, prefetch=2, max_size=8)
+    for path, payload, error in pipeline.imap(images[:2], lambda path: path):
+        assert error is None
+        assert len(payload.data) > 8 * 8 * 3
+        assert payload.data == prepare_payload(path, 8).data
+    assert_unlinked(created_blocks)
+
+
+def test_unreadable_file_is_reported_in_place(images, tmp_path, created_blocks):
+    missing = str(tmp_path / 'missing.png')
+    items = images[:2] + [missing] + images[2:4]
+    results = list(PreprocessPipeline(workers=2, max_size=128).imap(items, lambda path: path))
+    assert [item for item, _, _ in results] == items
+    assert [error is not None for _, _, error in results] == [False, False, True, False, False]
+    assert_unlinked(created_blocks)
+
+
+def test_blocks_are_unlinked_when_the_consumer_stops(images, created_blocks):
+    results = PreprocessPipeline(workers=2, prefetch=4, max_size=128).imap(images, lambda path: path)
+    next(results)
+    results.close()
+    assert_unlinked(created_blocks)
+
+
+def test_blocks_are_unlinked_when_submitting_fails(images, created_blocks):
+    def path_for_item(item):
+        if item == images[3]:
+            raise RuntimeError("no path")
+        return item
+
+    with pytest.raises(RuntimeError):
+        list(PreprocessPipeline(workers=2, prefetch=2, max_size=128).imap(images, path_for_item))
+    assert_unlinked(created_blocks)
+
+
+def test_inline_pipeline(images):
+    results = list(PreprocessPipeline(workers=0, max_size=128).imap(images[:2], lambda path: path))
+    assert [payload.data for _, payload, _ in results] == [prepare_payload(path, 128).data for path in images[:2]]
+
+
+def square(value):
+    if value == 3:
+        raise ValueError("three")
+    return value * value
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_process_ahead_keeps_order_and_errors(workers):
+    results = list(process_ahead(square, range(6), lambda value: (value,), workers=workers, prefetch=3))
+    assert [item for item, _, _ in results] == list(range(6))
+    assert [value for _, value, _ in results] == [0, 1, 4, None, 16, 25]
+    assert isinstance(results[3][2], ValueError)
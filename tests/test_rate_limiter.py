@@ -0,0 +1,115 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, get_rate_limiter, image_tokens
+
+
+class FakeClock:
+    """Time that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+def limiter(rpm=60, tpm=1000000, **kwargs):
+    clock = FakeClock()
+    return RateLimiter(rpm, tpm, clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+def test_slow_quota_still_allows_one_request():
+    # 30 RPM is half a request a second, the bucket still holds one
+    limit, clock = limiter(rpm=30)
+    assert limit.request_capacity() == 1.0
+    limit.acquire()
+    assert clock.slept == 0
+    limit.acquire()
+    assert clock.slept == pytest.approx(2.0)
+
+
+def test_burst_of_one_second():
+    limit, clock = limiter(rpm=600)
+    for _ in range(10):
+        limit.acquire()
+    assert clock.slept == 0
+    limit.acquire()
+    assert clock.slept == pytest.approx(0.1)
+
+
+def test_request_larger_than_the_token_bucket():
+    # 10 tokens a second: 50 tokens need only a full bucket, then are paid back
+    limit, clock = limiter(rpm=6000, tpm=600)
+    limit.acquire(50)
+    assert clock.slept == 0
+    limit.acquire(1)
+    assert clock.slept == pytest.approx(4.1)
+
+
+def test_token_reservation_is_settled():
+    limit, clock = limiter(rpm=6000, tpm=600)
+    limit.acquire(5)
+    # 8 more tokens were used than reserved
+    limit.record_success(tokens_used=13, tokens_reserved=5)
+    limit.acquire(1)
+    # Rounding can cost one more of the 10 ms minimum waits
+    assert clock.slept == pytest.approx(0.4, abs=0.011)
+
+
+def test_throttle_halves_the_rate_and_empties_the_buckets():
+    limit, clock = limiter(rpm=600, min_scale=0.2)
+    limit.record_throttle()
+    assert limit.scale == 0.5
+    assert limit.request_rate() == pytest.approx(5)
+    limit.acquire()
+    assert clock.slept == pytest.approx(0.2)
+    for _ in range(5):
+        limit.record_throttle()
+    assert limit.scale == 0.2
+
+
+def test_successes_raise_the_rate_back_to_the_quota():
+    limit, _ = limiter(increase_after=3, increase_step=0.25)
+    limit.record_throttle()
+    limit.record_throttle()
+    assert limit.scale == 0.25
+    for _ in range(2):
+        limit.record_success()
+    assert limit.scale == 0.25
+    limit.record_success()
+    assert limit.scale == 0.5
+    for _ in range(30):
+        limit.record_success()
+    assert limit.scale == 1.0
+
+
+def test_throttle_resets_the_success_streak():
+    limit, _ = limiter(increase_after=3, increase_step=0.25)
+    limit.record_throttle()
+    limit.record_success()
+    limit.record_success()
+    limit.record_throttle()
+    limit.record_success()
+    assert limit.scale == 0.25
+
+
+def test_shared_limiter_is_reconfigured(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_shared_limiter', None)
+    first = get_rate_limiter({'requests_per_minute': 10})
+    second = get_rate_limiter({'requests_per_minute': 20, 'tokens_per_minute': 500})
+    assert first is second
+    assert second.requests_per_minute == 20
+    assert second.tokens_per_minute == 500
+    assert get_rate_limiter().requests_per_minute == 15
+
+
+def test_image_tokens():
+    assert image_tokens((384, 200)) == 258
+    assert image_tokens((1024, 768)) == 2 * 258
+    assert image_tokens((1536, 1537)) == 6 * 258
@@ -0,0 +1,81 @@
+import os
+import time
+from types import SimpleNamespace
+
+from response_cache import ResponseCache, open_response_cache
+
+
+def payload(data=b'pixels', mime_type='image/jpeg'):
+    return SimpleNamespace(data=data, mime_type=mime_type)
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    key = cache.make_key(payload(), 'prompt', 'model')
+    cache.put(key, {'Filename': 'a.jpg', 'Title': 'A cat'})
+    assert cache.get(key) == {'Filename': 'a.jpg', 'Title': 'A cat'}
+    assert cache.get('missing') is None
+
+
+def test_key_depends_on_payload_prompt_and_model():
+    keys = {
+        ResponseCache.make_key(payload(), 'prompt', 'model'),
+        ResponseCache.make_key(payload(b'other'), 'prompt', 'model'),
+        ResponseCache.make_key(payload(mime_type='image/png'), 'prompt', 'model'),
+        ResponseCache.make_key(payload(), 'other prompt', 'model'),
+        ResponseCache.make_key(payload(), 'prompt', 'other model'),
+    }
+    assert len(keys) == 5
+
+
+def test_entries_persist_across_connections(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path)
+    cache.put('key', {'Title': 'Kept'})
+    cache.close()
+    assert ResponseCache(path).get('key') == {'Title': 'Kept'}
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, {'Title': key})
+        time.sleep(0.01)
+    cache.get('a')
+    time.sleep(0.01)
+    cache.evict()
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_age_days=0)
+    cache.put('key', {'Title': 'Old'})
+    time.sleep(0.01)
+    assert cache.get('key') is None
+
+
+def test_import_csv_skips_unknown_files_and_empty_titles(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    csv_path.write_text(
+        'Filename,Title,Keywords\n'
+        'a.jpg,A cat,"cat, pet"\n'
+        'gone.jpg,Gone,x\n'
+        'b.jpg,,y\n',
+        encoding='utf-8'
+    )
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    keys = {'a.jpg': 'key-a', 'b.jpg': 'key-b'}
+    assert cache.import_csv(str(csv_path), keys.get) == 1
+    assert cache.get('key-a') == {'Filename': 'a.jpg', 'Title': 'A cat', 'Keywords': 'cat, pet'}
+    assert cache.get('key-b') is None
+
+
+def test_open_response_cache_is_relative_to_the_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output = tmp_path / 'output'
+    cache = open_response_cache({}, str(output))
+    assert os.path.dirname(os.path.abspath(cache.path)) == str(output)
+    assert not (tmp_path / 'analysis_cache.db').exists()
+    assert open_response_cache({'cache_enabled': False}, str(output)) is None
@@ -0,0 +1,54 @@
+from run_journal import RunJournal
+
+
+def test_records_are_loaded_back(tmp_path):
+    path = str(tmp_path / 'run.journal')
+    journal = RunJournal(path)
+    journal.open()
+    journal.record('a.jpg', {'Title': 'A'})
+    journal.record('sub/b.jpg', {'Title': 'B'})
+    journal.close()
+    assert RunJournal(path).load() == {'a.jpg': {'Title': 'A'}, 'sub/b.jpg': {'Title': 'B'}}
+
+
+def test_missing_journal_loads_empty(tmp_path):
+    assert RunJournal(str(tmp_path / 'none.journal')).load() == {}
+
+
+def test_resume_after_a_partial_line(tmp_path):
+    path = tmp_path / 'run.journal'
+    journal = RunJournal(str(path))
+    journal.open()
+    journal.record('a.jpg', {'Title': 'A'})
+    journal.close()
+    # A crash in the middle of writing the next entry
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "b.jpg", "res')
+
+    resumed = RunJournal(str(path))
+    assert resumed.load() == {'a.jpg': {'Title': 'A'}}
+    resumed.open(resume=True)
+    resumed.record('c.jpg', {'Title': 'C'})
+    resumed.close()
+    assert RunJournal(str(path)).load() == {'a.jpg': {'Title': 'A'}, 'c.jpg': {'Title': 'C'}}
+
+
+def test_open_without_resume_discards_the_old_journal(tmp_path):
+    path = str(tmp_path / 'run.journal')
+    journal = RunJournal(path)
+    journal.open()
+    journal.record('a.jpg', {'Title': 'A'})
+    journal.close()
+    journal.open(resume=False)
+    journal.close()
+    assert RunJournal(path).load() == {}
+
+
+def test_later_entries_win(tmp_path):
+    path = str(tmp_path / 'run.journal')
+    journal = RunJournal(path)
+    journal.open()
+    journal.record('a.jpg', {'Title': 'First'})
+    journal.record('a.jpg', {'Title': 'Second'})
+    journal.close()
+    assert RunJournal(path).load() == {'a.jpg': {'Title': 'Second'}}
@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+from run_metrics import RunMetrics, percentile, record_retry, stage_summary
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert [percentile(values, q) for q in (0.5, 0.95, 0.99)] == [50, 95, 99]
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_report_summarizes_stages_counters_and_slowest_files():
+    metrics = RunMetrics('analysis_results')
+    for index in range(20):
+        metrics.observe('api', index / 10, [f'img{index}.jpg'])
+    metrics.observe_all({'decode': 0.5, 'encode': 0.25}, ['img0.jpg'])
+    metrics.count('requests')
+    metrics.count('requests')
+    metrics.count('tokens', 700)
+
+    report = metrics.report()
+    api = report['stages']['api']
+    assert api['count'] == 20
+    assert api['total_seconds'] == sum(index / 10 for index in range(20))
+    assert (api['p50_seconds'], api['p95_seconds'], api['p99_seconds'], api['max_seconds']) == (0.9, 1.8, 1.9, 1.9)
+    assert report['counters'] == {'requests': 2, 'tokens': 700}
+    assert metrics.counter('missing') == 0
+    slowest = report['slowest_files']
+    assert len(slowest) == 10
+    assert slowest[0] == {'file': 'img19.jpg', 'seconds': 1.9}
+    # Stage times add up per file
+    assert {'file': 'img0.jpg', 'seconds': 0.75} not in slowest
+    assert metrics.file_seconds['img0.jpg'] == 0.75
+
+
+def test_prometheus_text_format():
+    report = {
+        'stages': {'api': {'count': 2, 'total_seconds': 3.0, 'p50_seconds': 1.0,
+                           'p95_seconds': 2.0, 'p99_seconds': 2.0}},
+        'counters': {'throttled_429': 3, 'requests': 5},
+        'wall_seconds': 12.5,
+    }
+    text = RunMetrics('analysis_results').prometheus(report)
+    assert text == '\n'.join([
+        '# HELP stock_analyzer_stage_seconds Time spent in each stage of the analysis pipeline',
+        '# TYPE stock_analyzer_stage_seconds summary',
+        'stock_analyzer_stage_seconds{pipeline="analysis_results",stage="api",quantile="0.5"} 1.000000',
+        'stock_analyzer_stage_seconds{pipeline="analysis_results",stage="api",quantile="0.95"} 2.000000',
+        'stock_analyzer_stage_seconds{pipeline="analysis_results",stage="api",quantile="0.99"} 2.000000',
+        'stock_analyzer_stage_seconds_sum{pipeline="analysis_results",stage="api"} 3.000000',
+        'stock_analyzer_stage_seconds_count{pipeline="analysis_results",stage="api"} 2',
+        '# TYPE stock_analyzer_requests_total counter',
+        'stock_analyzer_requests_total{pipeline="analysis_results"} 5',
+        '# TYPE stock_analyzer_throttled_429_total counter',
+        'stock_analyzer_throttled_429_total{pipeline="analysis_results"} 3',
+        '# HELP stock_analyzer_run_seconds Wall time of the run',
+        '# TYPE stock_analyzer_run_seconds gauge',
+        'stock_analyzer_run_seconds{pipeline="analysis_results"} 12.500000',
+    ]) + '\n'
+
+
+def test_prometheus_labels_are_escaped():
+    report = {'stages': {}, 'counters': {}, 'wall_seconds': 0}
+    text = RunMetrics('clip "a"\\b\n.mp4_analysis').prometheus(report)
+    assert 'pipeline="clip \\"a\\"\\\\b\\n.mp4_analysis"' in text
+
+
+def test_write_saves_json_and_prom(tmp_path):
+    metrics = RunMetrics('batch_video_analysis')
+    metrics.observe('decode', 0.2, ['clip.mp4'])
+    report = metrics.write(str(tmp_path))
+    with open(tmp_path / 'batch_video_analysis_metrics.json') as f:
+        assert json.load(f)['stages'] == report['stages']
+    prom = (tmp_path / 'batch_video_analysis_metrics.prom').read_text()
+    assert 'stage="decode"' in prom
+
+
+def test_stage_summary():
+    metrics = RunMetrics('analysis_results')
+    metrics.observe('decode', 0.012)
+    metrics.observe('api', 0.8)
+    assert stage_summary(metrics.report()) == "p95 per stage: decode 12 ms, api 800 ms"
+
+
+def test_record_retry_counts_and_times_the_backoff():
+    engine = SimpleNamespace(metrics=RunMetrics('analysis_results'))
+    record_retry(SimpleNamespace(args=(engine,), next_action=SimpleNamespace(sleep=4.0)))
+    record_retry(SimpleNamespace(args=(engine,), next_action=SimpleNamespace(sleep=8.0)))
+    report = engine.metrics.report()
+    assert report['counters'] == {'retries': 2}
+    assert report['stages']['retry_backoff']['total_seconds'] == 12.0
@@ -0,0 +1,70 @@
+import pytest
+
+from structured_output import (
+    StructuredOutputError, decode_response, response_schema, split_json_rows, validate_fields
+)
+
+FIELDS = {'Title': 'title', 'Keywords': 'keywords', 'Category': 'category', 'Releases': 'optional'}
+
+
+def test_schema_requires_all_but_optional_fields():
+    schema = response_schema(FIELDS)
+    assert schema['required'] == ['Title', 'Keywords', 'Category']
+    assert schema['properties']['Keywords'] == {'type': 'array', 'items': {'type': 'string'}}
+
+
+def test_multi_schema_is_a_list_naming_each_file():
+    schema = response_schema(FIELDS, multi=True)
+    assert schema['type'] == 'array'
+    assert schema['items']['required'][0] == 'Filename'
+
+
+def test_decode_tolerates_a_markdown_fence():
+    assert decode_response('```json\n{"Title": "A"}\n```') == {'Title': 'A'}
+
+
+def test_decode_rejects_invalid_json():
+    with pytest.raises(StructuredOutputError):
+        decode_response('{"Title": "cut off')
+
+
+def test_valid_object_becomes_a_row():
+    row = validate_fields(
+        {'Title': '  A   cat ', 'Keywords': ['cat', ' pet ', ''], 'Category': 1}, FIELDS
+    )
+    assert row == {'Title': 'A cat', 'Keywords': 'cat, pet', 'Category': '1', 'Releases': ''}
+
+
+def test_category_names_are_accepted():
+    row = validate_fields({'Title': 'A', 'Keywords': ['a'], 'Category': '8. Graphic Resources'}, FIELDS)
+    assert row['Category'] == '8'
+
+
+def test_every_problem_is_reported():
+    with pytest.raises(StructuredOutputError) as error:
+        validate_fields({'Title': '', 'Keywords': 5}, FIELDS)
+    message = str(error.value)
+    assert 'Title is empty' in message
+    assert 'Keywords is not a list' in message
+    assert 'Category is missing' in message
+
+
+def test_rejects_non_objects():
+    with pytest.raises(StructuredOutputError):
+        validate_fields(['Title'], FIELDS)
+
+
+def test_split_json_rows_matches_filenames():
+    text = (
+        '[{"Filename": "A.jpg", "Title": "a"}, {"Filename": "a.jpg", "Title": "again"},'
+        ' {"Filename": "c.jpg", "Title": "c"}, {"Title": "unnamed"}]'
+    )
+    rows, rejected = split_json_rows(text, ['a.jpg', 'b.jpg'])
+    assert rows == {'a.jpg': {'Filename': 'A.jpg', 'Title': 'a'}}
+    assert rejected == ['a.jpg', 'c.jpg', '(unnamed)']
+
+
+def test_split_json_rows_accepts_a_single_object():
+    rows, rejected = split_json_rows('{"Filename": "a.jpg", "Title": "a"}', ['a.jpg'])
+    assert list(rows) == ['a.jpg']
+    assert rejected == []
@@ -0,0 +1,159 @@
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from frame_sampling import extract_position_frames  # noqa: E402
+from video_decoder import VideoDecoder  # noqa: E402
+
+
+class FakeCapture:
+    """cv2.VideoCapture over numbered frames, with a configurable seek.
+
+    With ``keyframe`` set, a seek lands on the next keyframe at or after
+    the requested frame, as inaccurate long-GOP seeks do. Like most
+    backends, CAP_PROP_POS_FRAMES just counts on from the requested index.
+    """
+
+    def __init__(self, frame_count=100, fps=25.0, keyframe=None, timestamps=True, opened=True):
+        self.frame_count = frame_count
+        self.fps = fps
+        self.keyframe = keyframe
+        self.timestamps = timestamps
+        self.opened = opened
+        self.next_frame = 0
+        self.current = None
+        self.reported = 0
+        self.seeks = []
+        self.grabs = 0
+        self.released = False
+        self.fail_retrieve = False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.released = True
+
+    def set(self, prop, value):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        self.seeks.append(value)
+        self.reported = value
+        if self.keyframe:
+            value = -(-value // self.keyframe) * self.keyframe
+        self.next_frame = value
+
+    def grab(self):
+        if self.next_frame >= self.frame_count:
+            return False
+        self.current = self.next_frame
+        self.next_frame += 1
+        self.reported += 1
+        self.grabs += 1
+        return True
+
+    def retrieve(self):
+        if self.fail_retrieve:
+            raise RuntimeError("decoder error")
+        return True, np.full((4, 6, 3), self.current, np.uint8)
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_COUNT: self.frame_count,
+            cv2.CAP_PROP_FRAME_WIDTH: 6,
+            cv2.CAP_PROP_FRAME_HEIGHT: 4,
+            cv2.CAP_PROP_FOURCC: 0,
+            cv2.CAP_PROP_POS_FRAMES: self.reported,
+            cv2.CAP_PROP_POS_MSEC: self.current * 1000 / self.fps if self.timestamps and self.current else 0,
+        }[prop]
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    """Make VideoDecoder open the FakeCapture built by the returned function"""
+    captures = []
+
+    def open_fake(**options):
+        monkeypatch.setattr(cv2, 'VideoCapture', lambda path: captures[-1])
+        captures.append(FakeCapture(**options))
+        return captures[-1]
+    return open_fake
+
+
+def frame_index(frame):
+    return int(frame[0, 0, 0])
+
+
+def test_nearby_frames_are_grabbed_far_ones_sought(capture):
+    cap = capture()
+    with VideoDecoder('clip.mp4') as decoder:
+        assert frame_index(decoder.read(2)) == 2
+        assert frame_index(decoder.read(10)) == 10
+        assert cap.seeks == []
+        assert frame_index(decoder.read(80)) == 80
+        assert cap.seeks == [80]
+        # Backwards always seeks
+        assert frame_index(decoder.read(40)) == 40
+        assert cap.seeks == [80, 40]
+
+
+def test_choice_follows_measured_costs(capture):
+    capture()
+    with VideoDecoder('clip.mp4') as decoder:
+        decoder.grab_cost, decoder.seek_cost = 1.0, 10.0
+        assert not decoder.should_seek(9)
+        assert decoder.should_seek(11)
+        assert decoder.keyframe_interval == 20
+
+
+def test_overshooting_seek_lands_early_and_grabs_forward(capture):
+    cap = capture(keyframe=12)
+    with VideoDecoder('clip.mp4') as decoder:
+        decoder.grab_cost, decoder.seek_cost = 1.0, 5.0
+        # Lands on 36, retried 10 frames earlier at 20, which lands on 24
+        assert frame_index(decoder.read(30)) == 30
+        assert cap.seeks == [30, 20]
+        assert cap.grabs == 2 + 6
+
+
+def test_accurate_seek_is_not_repeated(capture):
+    cap = capture()
+    with VideoDecoder('clip.mp4') as decoder:
+        assert frame_index(decoder.read(50)) == 50
+        assert cap.seeks == [50]
+        assert cap.grabs == 1
+        # The frame the seek grabbed is not decoded again
+        assert frame_index(decoder.read(50)) == 50
+        assert cap.grabs == 1
+
+
+def test_reads_past_the_end(capture):
+    capture(frame_count=60)
+    with VideoDecoder('clip.mp4') as decoder:
+        assert decoder.read(200) is None
+        assert decoder.read(61) is None
+        assert frame_index(decoder.read(59)) == 59
+        assert [number for number, _ in decoder.scan(20)] == [0, 20, 40]
+
+
+def test_unopened_capture_is_released(capture):
+    cap = capture(opened=False)
+    with pytest.raises(Exception):
+        VideoDecoder('missing.mp4')
+    assert cap.released
+
+
+def test_capture_is_released_when_decoding_fails(capture):
+    cap = capture()
+    cap.fail_retrieve = True
+    with pytest.raises(RuntimeError):
+        extract_position_frames('clip.mp4', [0.1, 0.9])
+    assert cap.released
+
+
+def test_capture_is_released_after_use(capture):
+    cap = capture()
+    frames = extract_position_frames('clip.mp4', [0.9, 0.1])
+    assert [timestamp for timestamp, _ in frames] == [90 / 25, 10 / 25]
+    assert cap.released
@@ -0,0 +1,90 @@
+import os
+import re
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+SETTINGS = {
+    'requests_per_minute': 100000,
+    'tokens_per_minute': 100000000,
+    'max_concurrent_requests': 1,
+    'preprocess_workers': 0,
+}
+
+
+@pytest.fixture
+def videos(tmp_path):
+    """Three short videos, each cutting from red to blue half way"""
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    paths = []
+    for index in range(3):
+        path = str(folder / f'clip{index}.mp4')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (320, 180))
+        for frame_index in range(60):
+            frame = np.full((180, 320, 3), (frame_index * 4 + index * 40) % 255, np.uint8)
+            frame[:, :160] = (0, 0, 255) if frame_index < 30 else (255, 0, 0)
+            writer.write(frame)
+        writer.release()
+        paths.append(path)
+    return paths
+
+
+def run_batch(video_files, output_folder, settings=None):
+    from video_engine import VideoBatchEngine
+    engine = VideoBatchEngine(video_files, output_folder, 'key', dict(SETTINGS, **(settings or {})))
+    events = {'progress': [], 'status': [], 'errors': [], 'complete': []}
+    engine.current_progress_updated.connect(events['progress'].append)
+    engine.status_updated.connect(events['status'].append)
+    engine.error_occurred.connect(events['errors'].append)
+    engine.analysis_complete.connect(events['complete'].append)
+    rows = list(engine.iter_results())
+    return rows, events
+
+
+def test_current_video_progress_steps(fake_gemini, videos, tmp_path):
+    fake_gemini()
+    rows, events = run_batch(videos[:1], str(tmp_path / 'out'))
+    assert len(rows) == 1
+    assert events['errors'] == []
+    assert events['progress'] == [10, 40, 70, 100]
+
+
+def test_every_video_reports_its_steps(fake_gemini, videos, tmp_path):
+    fake_gemini()
+    rows, events = run_batch(videos, str(tmp_path / 'out'), {'max_concurrent_requests': 2})
+    assert len(rows) == 3
+    for value in (10, 40, 70, 100):
+        assert events['progress'].count(value) == 3
+
+
+def token_numbers(status):
+    """Per-video numbers of the token report among the status messages"""
+    report = next(message for message in status if message.startswith('Image tokens per video'))
+    return [int(number) for number in re.findall(r'(\d+)(?=,|\.|$)', report)]
+
+
+@pytest.mark.parametrize('layout, preview', [
+    ({}, 'frame'),
+    ({'frame_sampling': 'scenes', 'scene_frames': 2}, 'frame'),
+    ({'frame_sampling': 'scenes', 'scene_frames': 2, 'frame_layout': 'contact_sheet'}, 'contact_sheet'),
+])
+def test_token_report_and_preview_per_mode(fake_gemini, videos, tmp_path, layout, preview):
+    backend = fake_gemini()
+    output = str(tmp_path / 'out')
+    rows, events = run_batch(videos[:2], output, layout)
+    assert len(rows) == 2
+
+    single, separate, sheet, billed = token_numbers(events['status'])
+    # 320x180 frames and the contact sheet each fit in one tile
+    assert single == 258
+    assert sheet == 258
+    frames = separate // single
+    assert frames == (1 if not layout else 2)
+    assert billed == round(backend.tokens / 2)
+
+    assert sorted(name for name in os.listdir(output) if name.endswith('.jpg')) == [
+        f'clip{index}.mp4_{preview}.jpg' for index in range(2)
+    ]